@@ -1 +1 @@
-from fbmc_quality.dataframe_schemas.schemas import BiddingZones, CnecData, JaoData, NetPosition
+from fbmc_quality.dataframe_schemas.schemas import BiddingZones, CnecData, CompactJaoData, JaoData, NetPosition
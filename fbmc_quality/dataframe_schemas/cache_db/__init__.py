@@ -1,12 +1,17 @@
-import multiprocessing
 import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 
+import duckdb
 from sqlalchemy import create_engine
 
-from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_df_in_table
+from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import backfill_coverage, store_df_in_table
 from fbmc_quality.dataframe_schemas.schemas import Base
 
+DEFAULT_MAX_IDLE_CURSORS = 16
+
 
 def create_default_folder(default_folder_path: Path):
     try:
@@ -15,23 +20,143 @@ def create_default_folder(default_folder_path: Path):
         raise FileExistsError(f"Error creating default folder: {e}") from e
 
 
-path_to_db = os.getenv("DB_PATH")
+def _resolve_db_path(path_to_db: str | Path | None) -> Path:
+    if path_to_db is None:
+        default_folder_path = Path.home() / Path(".flowbased_data")
+        create_default_folder(default_folder_path)
+        return default_folder_path / "linearisation_analysis.duckdb"
 
-if path_to_db is None:
-    default_folder_path = Path.home() / Path(".flowbased_data")
-    create_default_folder(default_folder_path)
-    path_to_db = default_folder_path / "linearisation_analysis.duckdb"
-else:
-    if not path_to_db.endswith("db"):
-        raise EnvironmentError("Misconfigured env-var, DB_PATH must end with 'db' or 'duckdb'")
+    if not str(path_to_db).endswith("db"):
+        raise EnvironmentError("Misconfigured DB_PATH, the path must end with 'db' or 'duckdb'")
 
     path_to_db = Path(path_to_db)
     if not path_to_db.parent.exists():
         raise FileNotFoundError(f"No folder named {path_to_db.parent}")
+    return path_to_db
+
+
+class CacheDatabase:
+    """Handle to the duckdb database the fetched data is cached in, and process-wide connection manager.
+
+    Nothing is touched on disk before the handle is used. The path is resolved on first use, from the path
+    given to `configure`, the `DB_PATH` environment variable or `~/.flowbased_data`, in that order.
+    The schema is created at most once per process and path.
+
+    The process holds a single duckdb connection to the cache. All reads and writes go through cursors
+    on that connection, handed out by `cursor` and kept in a pool when they are returned.
+    """
+
+    def __init__(self, path: str | Path | None = None, read_only: bool = False):
+        self._configured_path = path
+        self._read_only = read_only
+        self._path: Path | None = None
+        self._schema_created = False
+        self._connection: duckdb.DuckDBPyConnection | None = None
+        self._idle_cursors: list[duckdb.DuckDBPyConnection] = []
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+
+    def configure(self, path: str | Path | None, read_only: bool = False):
+        """Points the handle to a different database file. `None` falls back to `DB_PATH` or the default folder.
+        Closes the connection to the previous database.
+
+        Args:
+            path (str | Path | None): path of the duckdb file
+            read_only (bool, optional): open the cache read only, i.e. in worker processes. Defaults to False.
+        """
+        with self._lock:
+            self.close()
+            self._configured_path = path
+            self._read_only = read_only
+            self._path = None
+            self._schema_created = False
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            with self._lock:
+                if self._path is None:
+                    configured_path = self._configured_path
+                    self._path = _resolve_db_path(
+                        configured_path if configured_path is not None else os.getenv("DB_PATH")
+                    )
+        return self._path
+
+    @property
+    def read_only(self) -> bool:
+        return self._read_only
+
+    def ensure_schema(self):
+        if self._schema_created or self._read_only:
+            return
+
+        with self._lock:
+            if self._schema_created:
+                return
+            engine = create_engine("duckdb:///" + str(self.path))
+            Base.metadata.create_all(engine)
+            engine.dispose()
+            self._schema_created = True
+
+    def _get_connection(self) -> duckdb.DuckDBPyConnection:
+        if self._pid != os.getpid():
+            # a forked child must not reuse the connection of its parent
+            self._connection = None
+            self._idle_cursors = []
+            self._pid = os.getpid()
+
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self.ensure_schema()
+                    connection = duckdb.connect(str(self.path), read_only=self._read_only)
+                    if not self._read_only:
+                        backfill_coverage(connection)
+                    self._connection = connection
+        return self._connection
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Borrows a cursor on the shared connection. A cursor must only be used by one thread at a time.
+
+        Yields:
+            duckdb.DuckDBPyConnection: cursor to the cache database
+        """
+        connection = self._get_connection()
+        with self._lock:
+            cursor = self._idle_cursors.pop() if self._idle_cursors else connection.cursor()
+
+        try:
+            yield cursor
+        finally:
+            with self._lock:
+                if self._connection is connection and len(self._idle_cursors) < DEFAULT_MAX_IDLE_CURSORS:
+                    self._idle_cursors.append(cursor)
+                else:
+                    cursor.close()
+
+    def close(self):
+        """Closes the pooled cursors and the shared connection. The next use opens a new connection"""
+        with self._lock:
+            if self._pid == os.getpid():
+                for cursor in self._idle_cursors:
+                    cursor.close()
+                if self._connection is not None:
+                    self._connection.close()
+            self._idle_cursors = []
+            self._connection = None
+
+
+CACHE_DB = CacheDatabase()
+
+
+def configure_cache_db(path: str | Path | None, read_only: bool = False):
+    """Sets the path of the duckdb cache at runtime, see `CacheDatabase`"""
+    CACHE_DB.configure(path, read_only)
 
-DB_PATH = path_to_db
 
-if multiprocessing.current_process().name == "MainProcess":
-    engine = create_engine("duckdb:///" + str(DB_PATH))
-    Base.metadata.create_all(engine)
-    engine.dispose()
+def __getattr__(name: str):
+    # `DB_PATH` is resolved lazily, so importing this module has no side effects
+    if name == "DB_PATH":
+        return CACHE_DB.path
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
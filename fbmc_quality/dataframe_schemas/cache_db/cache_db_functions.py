@@ -1,23 +1,210 @@
+import uuid
+from contextlib import suppress
+from typing import Iterable
+
+import duckdb
 import pandas
-from sqlalchemy import Engine, text
+import pyarrow
+
+from fbmc_quality.datetime_handlers.handle_timezones import convert_series_to_utc
+
+# tables computed from a cached source, their hours are recomputed when the source stores the same hours again
+MATERIALIZED_TABLES: dict[str, list[str]] = {
+    "JAO": ["JAO_NET_POSITION"],
+    "ENTSOE": ["ENTSOE_NET_POSITION"],
+}
+
+
+def _frame_to_arrow(df: pandas.DataFrame) -> pyarrow.Table:
+    try:
+        return pyarrow.Table.from_pandas(df, preserve_index=False)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        # mixed python objects, e.g. nested JSON payloads, are stored as their string representation
+        object_columns = df.select_dtypes("object").columns
+        return pyarrow.Table.from_pandas(
+            df.astype({col: pandas.StringDtype() for col in object_columns}), preserve_index=False
+        )
+
+
+def store_df_in_table(table_name: str, df: pandas.DataFrame, connection: duckdb.DuckDBPyConnection):
+    """Upserts the rows of `df` into `table_name`, replacing rows with the same primary key.
+
+    The frame is handed to DuckDB as an Arrow table, registered as a view and upserted in one statement.
+    The rows of `df` must be unique on the primary key of the table.
+
+    Args:
+        table_name (str): table to upsert the rows into, i.e. `JAO` or `ENTSOE`
+        df (pandas.DataFrame): rows to upsert, columns must match the table columns by name
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+    """
+    if df.empty:
+        return
+
+    arrow_table = _frame_to_arrow(df)
+    view_name = f"staged_{table_name}_{uuid.uuid4().hex}"
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+
+    connection.register(view_name, arrow_table)
+    try:
+        connection.execute(f"INSERT OR REPLACE INTO {table_name} ({columns}) SELECT {columns} FROM {view_name}")
+    finally:
+        connection.unregister(view_name)
+
+
+def store_coverage(source: str, key: str, times: Iterable[pandas.Timestamp], connection: duckdb.DuckDBPyConnection):
+    """Records the hours in `times` as cached for `source` and `key` in the `CACHE_COVERAGE` table.
+    The same hours of the tables materialized from `source` are marked as out of date.
+
+    Args:
+        source (str): name of the cached table, i.e. `JAO` or `ENTSOE`
+        key (str): sub key of the source, i.e. the border for `ENTSOE`
+        times (Iterable[pandas.Timestamp]): tz-aware hours that have been stored
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+    """
+    hours = pandas.DatetimeIndex(times)
+    hours = hours.tz_localize("UTC") if hours.tz is None else hours.tz_convert("UTC")
+    coverage = pandas.DataFrame({"time": hours.unique()})
+    coverage["source"] = source
+    coverage["key"] = key
+    store_df_in_table("CACHE_COVERAGE", coverage, connection)
+
+    materialized_tables = MATERIALIZED_TABLES.get(source, [])
+    if materialized_tables and not coverage.empty:
+        connection.execute(
+            "DELETE FROM CACHE_COVERAGE WHERE source IN (SELECT UNNEST(?)) AND time IN (SELECT UNNEST(?))",
+            [materialized_tables, [time.to_pydatetime() for time in coverage["time"]]],
+        )
+
 
+def get_cached_hours(
+    source: str, key: str, start: pandas.Timestamp, end: pandas.Timestamp, connection: duckdb.DuckDBPyConnection
+) -> pandas.DatetimeIndex:
+    """Looks up the hours in `[start, end)` stored in the cache for `source` and `key`, without touching any payload
 
-def store_df_in_table(table_name: str, df: pandas.DataFrame, engine: Engine):
-    # Convert the DataFrame to a list of dictionaries
-    data_list = df.to_dict(orient="records")
+    Args:
+        source (str): name of the cached table, i.e. `JAO` or `ENTSOE`
+        key (str): sub key of the source, i.e. the border for `ENTSOE`
+        start (pandas.Timestamp): tz-aware start of the range
+        end (pandas.Timestamp): tz-aware end of the range, exclusive
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
 
-    # Generate the column names and placeholders dynamically
-    columns = ", ".join(df.columns)
-    placeholders = ", ".join(f":{col}" for col in df.columns)
+    Returns:
+        pandas.DatetimeIndex: sorted UTC hours in the cache
+    """
+    cached = connection.execute(
+        "SELECT time FROM CACHE_COVERAGE WHERE source = ? AND key = ? AND time >= ? AND time < ? ORDER BY time",
+        [source, key, start.to_pydatetime(), end.to_pydatetime()],
+    ).df()
+    return pandas.DatetimeIndex(cached["time"]).tz_convert("UTC")
+
+
+def get_missing_intervals(
+    source: str, key: str, start: pandas.Timestamp, end: pandas.Timestamp, connection: duckdb.DuckDBPyConnection
+) -> list[tuple[pandas.Timestamp, pandas.Timestamp]]:
+    """Finds the contiguous hourly intervals in `[start, end)` that are not stored in the cache
+
+    Args:
+        source (str): name of the cached table, i.e. `JAO` or `ENTSOE`
+        key (str): sub key of the source, i.e. the border for `ENTSOE`
+        start (pandas.Timestamp): tz-aware start of the range
+        end (pandas.Timestamp): tz-aware end of the range, exclusive
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+
+    Returns:
+        list[tuple[pandas.Timestamp, pandas.Timestamp]]: sorted, half open `[from, to)` intervals of missing hours
+    """
+    expected_hours = pandas.date_range(start, end, freq="h", inclusive="left").tz_convert("UTC")
+    missing_hours = expected_hours.difference(get_cached_hours(source, key, start, end, connection))
+    return hours_to_intervals(missing_hours)
+
+
+def refresh_materialized_table(
+    table_name: str,
+    select_query: str,
+    parameters: list,
+    start: pandas.Timestamp,
+    end: pandas.Timestamp,
+    connection: duckdb.DuckDBPyConnection,
+):
+    """Recomputes the hours in `[start, end)` of a materialized table that are missing or out of date.
+    Hours that are up to date are not touched.
+
+    Args:
+        table_name (str): materialized table, i.e. `ENTSOE_NET_POSITION`
+        select_query (str): query selecting the rows of the table for the hours between two trailing
+            `?` placeholders, taking the half open `[from, to)` bounds
+        parameters (list): parameters of `select_query`, before the two time bounds
+        start (pandas.Timestamp): tz-aware start of the range
+        end (pandas.Timestamp): tz-aware end of the range, exclusive
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+    """
+    for interval_start, interval_end in get_missing_intervals(table_name, "", start, end, connection):
+        bounds = [interval_start.to_pydatetime(), interval_end.to_pydatetime()]
+        # rows the query no longer selects, i.e. of a zone that is now incomplete, must not be kept
+        connection.execute(f"DELETE FROM {table_name} WHERE time >= ? AND time < ?", bounds)
+        connection.execute(f"INSERT OR REPLACE INTO {table_name} {select_query}", parameters + bounds)
+        computed_hours = connection.execute(
+            f"SELECT DISTINCT time FROM {table_name} WHERE time >= ? AND time < ?", bounds
+        ).df()
+        store_coverage(table_name, "", computed_hours["time"], connection)
+
+
+def read_net_positions(
+    table_name: str,
+    zones: list[str],
+    start: pandas.Timestamp,
+    end: pandas.Timestamp,
+    connection: duckdb.DuckDBPyConnection,
+) -> pandas.DataFrame:
+    """Reads a materialized net position table, pivoted to one column per zone in DuckDB
 
-    # Define the dynamic SQL statement for "INSERT OR REPLACE INTO"
-    insert_sql = text(
-        f"""
-        INSERT OR REPLACE INTO {table_name} ({columns})
-        VALUES ({placeholders})
+    Args:
+        table_name (str): materialized table, i.e. `ENTSOE_NET_POSITION`
+        zones (list[str]): zones to read, in the order of the returned columns
+        start (pandas.Timestamp): tz-aware start of the range
+        end (pandas.Timestamp): tz-aware end of the range, exclusive
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+
+    Returns:
+        pandas.DataFrame: Frame with UTC time as index and one column per zone, NaN where a zone has no value
     """
-    )
+    pivot_columns = "".join(f', max(net_position) FILTER (WHERE zone = ?) AS "{zone}"' for zone in zones)
+    # timestamps are read as naive UTC wall time, so no DST-ambiguous local times reach pandas
+    net_positions = connection.execute(
+        f"SELECT timezone('UTC', time) AS time{pivot_columns} FROM {table_name} "
+        "WHERE time >= ? AND time < ? AND zone IN (SELECT UNNEST(?)) GROUP BY time ORDER BY time",
+        zones + [start.to_pydatetime(), end.to_pydatetime(), zones],
+    ).df()
+
+    net_positions["time"] = convert_series_to_utc(net_positions["time"])
+    net_positions = net_positions.set_index("time").astype(float)
+    with suppress(ValueError):
+        net_positions.index.freq = pandas.infer_freq(net_positions.index)  # type: ignore
+    return net_positions
 
-    with engine.connect() as connection:
-        connection.execute(insert_sql, data_list)
-        connection.commit()
+
+def hours_to_intervals(hours: pandas.DatetimeIndex) -> list[tuple[pandas.Timestamp, pandas.Timestamp]]:
+    hour = pandas.Timedelta(hours=1)
+    intervals: list[tuple[pandas.Timestamp, pandas.Timestamp]] = []
+    for time in hours.sort_values():
+        if intervals and intervals[-1][1] == time:
+            intervals[-1] = (intervals[-1][0], time + hour)
+        else:
+            intervals.append((time, time + hour))
+    return intervals
+
+
+def backfill_coverage(connection: duckdb.DuckDBPyConnection):
+    """Fills the `CACHE_COVERAGE` table from the `JAO` and `ENTSOE` tables, for caches created before
+    the coverage table existed. Does nothing for a source that already has coverage rows.
+    """
+    backfill_queries = {
+        "JAO": "SELECT DISTINCT 'JAO', '', time FROM JAO",
+        "ENTSOE": "SELECT DISTINCT 'ENTSOE', area_from || '_' || area_to, time FROM ENTSOE",
+    }
+    for source, query in backfill_queries.items():
+        has_coverage = connection.execute(
+            "SELECT count(*) FROM (SELECT 1 FROM CACHE_COVERAGE WHERE source = ? LIMIT 1)", [source]
+        ).fetchone()
+        if has_coverage is not None and not has_coverage[0]:
+            connection.execute(f"INSERT OR REPLACE INTO CACHE_COVERAGE (source, key, time) {query}")
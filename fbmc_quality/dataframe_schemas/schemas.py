@@ -1,5 +1,6 @@
 from typing import Annotated, Optional
 
+import numpy as np
 import pandas as pd
 import pandera as pa
 import pydantic
@@ -21,6 +22,38 @@ class CorridorFlowModel(Base):
     flow = Column(Float)
 
 
+class CacheCoverageModel(Base):
+    __tablename__ = "CACHE_COVERAGE"
+
+    source = Column(String, primary_key=True)  #: name of the cached table, JAO or ENTSOE
+    key = Column(String, primary_key=True)  #: sub key of the source, the border for ENTSOE and empty for JAO
+    time = Column(TIMESTAMP(timezone=True), primary_key=True)  #: hour that is stored in the cache
+
+
+class EntsoeNetPositionModel(Base):
+    __tablename__ = "ENTSOE_NET_POSITION"
+
+    zone = Column(String, primary_key=True)  #: bidding zone the net position is for
+    time = Column(TIMESTAMP(timezone=True), primary_key=True)  #: Index value
+    net_position = Column(Float)  #: sum of the observed flows out of the zone
+
+
+class JaoNetPositionModel(Base):
+    __tablename__ = "JAO_NET_POSITION"
+
+    zone = Column(String, primary_key=True)  #: bidding zone the net position is for
+    time = Column(TIMESTAMP(timezone=True), primary_key=True)  #: Index value
+    net_position = Column(Float)  #: basecase net position, from the fref of the border CNECs
+
+
+class CnecIdModel(Base):
+    __tablename__ = "CNEC_ID"
+
+    cnec_id = Column(String, primary_key=True)  #: id generated from the cnecName and contName
+    cnecName = Column(String)  #: JAO field value
+    contName = Column(String)  #: JAO field value
+
+
 class JaoModel(Base):  # type: ignore
     __tablename__ = "JAO"
 
@@ -202,6 +235,79 @@ class JaoData(JaoBase, BiddingZones, CnecMultiindex):
     ...
 
 
+class CompactJaoBase(JaoBase):
+    """`JaoBase` with dictionary encoded strings and float32 values, and `contingencies` only when it is asked for"""
+
+    id: Series[pd.Int32Dtype] = pa.Field(coerce=True)  #: JAO field value
+
+    tso: Series[pd.CategoricalDtype] = pa.Field(coerce=True)  #: JAO field value
+    cnecName: Series[pd.CategoricalDtype] = pa.Field(coerce=True)  #: JAO field value
+    cnecType: Series[pd.CategoricalDtype] = pa.Field(coerce=True)  #: JAO field value
+    cneName: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    cneType: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    cneStatus: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    cneEic: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    substationFrom: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    substationTo: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    contName: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    contStatus: Series[pd.CategoricalDtype] = pa.Field(coerce=True, nullable=True)  #: JAO field value
+    imaxMethod: Series[pd.CategoricalDtype] = pa.Field(coerce=True)  #: JAO field value
+    contingencies: Optional[Series[pd.CategoricalDtype]] = pa.Field(coerce=True)  #: JAO field value
+    ram: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    minFlow: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    maxFlow: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    u: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    imax: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    fmax: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    frm: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    fnrao: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    fref: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    fall: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    amr: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    aac: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+    iva: Series[np.float32] = pa.Field(coerce=True)  #: JAO field value
+
+
+class CompactBiddingZones(BiddingZones):
+    """`BiddingZones` with float32 PTDFs"""
+
+    DK1: Optional[Series[np.float32]] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    DK1_CO: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    DK1_DE: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    DK1_KS: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    DK1_SK: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    DK2: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    DK2_KO: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    FI: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    FI_EL: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    FI_FS: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO1: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO2: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO2_ND: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO2_SK: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO2_NK: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO3: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO4: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    NO5: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE1: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE2: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE3: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE3_FS: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE3_KS: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE4: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE4_BC: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE4_NB: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+    SE4_SP: Series[np.float32] = pa.Field(nullable=True, coerce=True)  #: value of bidding zone
+
+
+class CompactJaoData(CompactJaoBase, CompactBiddingZones, CnecMultiindex):
+    """Schema describing the flow based market clearing data coming from JAO, in the compact representation.
+    See `make_compact_jao_frame`.
+    """
+
+    ...
+
+
 class CnecData(JaoBase, BiddingZones):
     """Schema describing the flow based market clearing data coming from JAO.
     For a single CNEC
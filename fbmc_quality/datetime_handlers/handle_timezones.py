@@ -27,3 +27,33 @@ def convert_date_to_utc_pandas(date_obj: pd.Timestamp | datetime) -> pd.Timestam
         )
 
     return pd.Timestamp(date_obj).tz_convert("UTC")
+
+
+def convert_series_to_utc(times: pd.Series) -> pd.Series:
+    """Converts a series of timestamps to `datetime64[ns, UTC]` in one vectorized pass.
+    Naive timestamps are taken to be UTC wall time, and are never localized through a DST-observing zone.
+    """
+    if getattr(times.dtype, "tz", None) is None:
+        return pd.to_datetime(times).dt.tz_localize("UTC").astype(pd.DatetimeTZDtype("ns", "UTC"))
+    return times.dt.tz_convert("UTC").astype(pd.DatetimeTZDtype("ns", "UTC"))
+
+
+def split_period(
+    start: datetime | date | pd.Timestamp,
+    end: datetime | date | pd.Timestamp,
+    chunk_size: pd.Timedelta,
+) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """Splits `[start, end)` into consecutive `[from, to)` chunks of at most `chunk_size`
+
+    Args:
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+        chunk_size (pd.Timedelta): length of a chunk
+
+    Returns:
+        list[tuple[pd.Timestamp, pd.Timestamp]]: UTC chunks covering the period
+    """
+    start_pd = convert_date_to_utc_pandas(start)
+    end_pd = convert_date_to_utc_pandas(end)
+    chunk_starts = pd.date_range(start_pd, end_pd, freq=chunk_size, inclusive="left")
+    return [(chunk_start, min(chunk_start + chunk_size, end_pd)) for chunk_start in chunk_starts]
@@ -1,29 +1,40 @@
 import logging
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import suppress
 from datetime import datetime
-from typing import Sequence, TypeVar
+from functools import lru_cache
+from typing import Callable, Iterable, TypeVar
 
 import duckdb
 import Levenshtein
-import numpy as np
 import pandas as pd
 from entsoe import Area, EntsoePandasClient
 from pandera.typing import DataFrame
 from requests import Session
-from sqlalchemy import Engine, create_engine
 
-from fbmc_quality.dataframe_schemas.cache_db import DB_PATH
-from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_df_in_table
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import (
+    get_missing_intervals,
+    read_net_positions,
+    refresh_materialized_table,
+    store_coverage,
+    store_df_in_table,
+)
 from fbmc_quality.dataframe_schemas.schemas import NetPosition
-from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
+from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas, convert_series_to_utc
 from fbmc_quality.enums.bidding_zones import ALT_NAME_MAP, BIDDING_ZONE_CNEC_MAP, AltBiddingZonesEnum, BiddingZonesEnum
 from fbmc_quality.exceptions.fbmc_exceptions import ENTSOELookupException
 from fbmc_quality.jao_data.analyse_jao_data import is_elements_equal_to_target
 
 pandasDtypes = TypeVar("pandasDtypes", pd.DataFrame, pd.Series)
 
+DEFAULT_MAX_CONCURRENT_BORDERS = 8
+DEFAULT_REQUESTS_PER_MINUTE = 300
+
 ENSTOE_BIDDING_ZONE_MAP: dict[BiddingZonesEnum, Area] = {
     BiddingZonesEnum.NO1: Area.NO_1,
     BiddingZonesEnum.NO2: Area.NO_2,
@@ -75,13 +86,76 @@ ENTSOE_HVDC_ZONE_MAP: dict[BiddingZonesEnum, tuple[Area, Area]] = {
 }
 
 
+ALL_NAME_BIDDING_ZONES: list[BiddingZonesEnum | AltBiddingZonesEnum] = [bz for bz in BiddingZonesEnum] + [
+    bz for bz in AltBiddingZonesEnum
+]
+DEFAULT_BZ_NAME_CACHE_SIZE = 4096
+
+# one pass over a name finds the longest zone starting at every position, longer alternatives are tried first
+_BZ_NAME_PATTERN = re.compile(
+    "(?=("
+    + "|".join(re.escape(bz.value) for bz in sorted(ALL_NAME_BIDDING_ZONES, key=lambda bz: -len(bz.value)))
+    + "))"
+)
+# zones starting where a longer zone starts are exactly its prefixes, i.e. `DK1` for `DK1_SB`
+_BZ_PREFIXES: dict[str, list[BiddingZonesEnum | AltBiddingZonesEnum]] = {
+    bz.value: [prefix for prefix in ALL_NAME_BIDDING_ZONES if bz.value.startswith(prefix.value)]
+    for bz in ALL_NAME_BIDDING_ZONES
+}
+
+
+def _to_bidding_zone(bz: BiddingZonesEnum | AltBiddingZonesEnum) -> BiddingZonesEnum:
+    return BiddingZonesEnum(bz) if bz not in AltBiddingZonesEnum else ALT_NAME_MAP[bz]  # type: ignore
+
+
+def _find_bidding_zones(cnecName: str) -> dict[BiddingZonesEnum | AltBiddingZonesEnum, tuple[int, int]]:
+    """Finds the first and last start position of every bidding zone in `cnecName`, in one scan"""
+    positions: dict[BiddingZonesEnum | AltBiddingZonesEnum, tuple[int, int]] = {}
+    for match in _BZ_NAME_PATTERN.finditer(cnecName):
+        for bz in _BZ_PREFIXES[match.group(1)]:
+            first, _ = positions.get(bz, (match.start(), match.start()))
+            positions[bz] = (first, match.start())
+    return positions
+
+
+@lru_cache(maxsize=DEFAULT_BZ_NAME_CACHE_SIZE)
 def get_from_to_bz_from_name(cnecName: str) -> tuple[BiddingZonesEnum, BiddingZonesEnum] | tuple[None, None]:
-    bz1, bz2 = regex_get_from_to_bz_from_name(cnecName)
-    if bz1 is None or bz2 is None:
-        return substring_get_from_to_bz_from_name(cnecName)
-    else:
+    """Resolves the bidding zones a CNEC goes from and to, from its name. Gives the same answer as
+    `regex_get_from_to_bz_from_name`, falling back to `substring_get_from_to_bz_from_name`, but scans the name once
+    with a precompiled pattern and remembers the most recent names.
+
+    Args:
+        cnecName (str): name of the CNEC, i.e. `NO2->NO1`
+
+    Returns:
+        tuple[BiddingZonesEnum, BiddingZonesEnum] | tuple[None, None]: from and to zone, or Nones if not found
+    """
+    if "\n" in cnecName:
+        # `.` in the regex lookup does not match line breaks, which the position scan does not model
+        bz1, bz2 = regex_get_from_to_bz_from_name(cnecName)
+        if bz1 is None or bz2 is None:
+            return substring_get_from_to_bz_from_name(cnecName)
         return bz1, bz2
 
+    positions = _find_bidding_zones(cnecName)
+    found_zones = [bz for bz in ALL_NAME_BIDDING_ZONES if bz in positions]
+
+    # `from.+to` matches when `to` starts at least one character after the first `from` ends
+    for bz_from in found_zones:
+        for bz_to in found_zones:
+            if bz_from != bz_to and positions[bz_to][1] > positions[bz_from][0] + len(bz_from.value):
+                return _to_bidding_zone(bz_from), _to_bidding_zone(bz_to)
+
+    if len(found_zones) < 2:
+        return (None, None)
+
+    bz_from, bz_to = found_zones[0], found_zones[1]
+    dist1 = Levenshtein.distance(f"{bz_from.value} {bz_to.value}", cnecName)
+    dist2 = Levenshtein.distance(f"{bz_to.value} {bz_from.value}", cnecName)
+    if dist1 < dist2:
+        return _to_bidding_zone(bz_from), _to_bidding_zone(bz_to)
+    return _to_bidding_zone(bz_to), _to_bidding_zone(bz_from)
+
 
 def substring_get_from_to_bz_from_name(cnecName: str) -> tuple[BiddingZonesEnum, BiddingZonesEnum] | tuple[None, None]:
     all_bidding_zones = [bz for bz in BiddingZonesEnum] + [bz for bz in AltBiddingZonesEnum]
@@ -131,11 +205,46 @@ def get_entsoe_client(session: Session | None = None) -> EntsoePandasClient:
     return EntsoePandasClient(api_key, session=session)
 
 
+class RequestRateLimiter:
+    """Spaces out requests made from any number of threads, so no more than `requests_per_minute` are started
+    in a minute. Callers block in `wait` until their slot is due.
+
+    Args:
+        requests_per_minute (int, optional): budget of requests per minute. Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+        clock (Callable[[], float], optional): monotonic clock in seconds. Defaults to time.monotonic.
+        sleep (Callable[[float], None], optional): blocks the calling thread for seconds. Defaults to time.sleep.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if requests_per_minute <= 0:
+            raise ValueError(f"requests_per_minute must be positive, got {requests_per_minute}")
+        self._interval = 60.0 / requests_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot = clock()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
 def fetch_net_position_from_crossborder_flows(
     start: datetime | pd.Timestamp,
     end: datetime | pd.Timestamp,
     bidding_zones: list[BiddingZonesEnum] | BiddingZonesEnum | None = None,
     filter_non_conforming_hours: bool = False,
+    max_concurrent_borders: int = DEFAULT_MAX_CONCURRENT_BORDERS,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
 ) -> DataFrame[NetPosition] | None:
     """Computes the net-positions in a period from `start` to `end` from data from ENTSOE Transparency,
       for the given `bidding_zones`
@@ -146,6 +255,10 @@ def fetch_net_position_from_crossborder_flows(
         bidding_zones (BiddingZones | list[BiddingZones] | None, optional):
             Bidding zones to compute the net position for.
             Defaults to None, which will compute for ALL bidding zones.
+        max_concurrent_borders (int, optional): borders fetched from ENTSOE at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_BORDERS.
+        requests_per_minute (int, optional): budget of requests to the ENTSOE API per minute.
+            Defaults to DEFAULT_REQUESTS_PER_MINUTE.
 
     Returns DataFrame[NetPosition]:
     """
@@ -160,7 +273,9 @@ def fetch_net_position_from_crossborder_flows(
     start_pd = convert_date_to_utc_pandas(start)
     end_pd = convert_date_to_utc_pandas(end)
 
-    retval = _get_net_position_from_crossborder_flows(start_pd, end_pd, bidding_zones)
+    retval = _get_net_position_from_crossborder_flows(
+        start_pd, end_pd, bidding_zones, max_concurrent_borders, requests_per_minute
+    )
 
     if check_for_zero_zum:
         filter_list = is_elements_equal_to_target(retval.sum(axis=1), threshold=1)
@@ -173,24 +288,200 @@ def _get_net_position_from_crossborder_flows(
     start: pd.Timestamp,
     end: pd.Timestamp,
     bidding_zones: list[BiddingZonesEnum] | BiddingZonesEnum | None = None,
+    max_concurrent_borders: int = DEFAULT_MAX_CONCURRENT_BORDERS,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
 ) -> DataFrame[NetPosition]:
     if bidding_zones is None:
         bidding_zones = [bz for bz in BiddingZonesEnum]
     elif isinstance(bidding_zones, BiddingZonesEnum):
         bidding_zones = [bidding_zones]
 
-    df_list = []
+    zone_borders = plan_zone_borders(bidding_zones)
+    cache_border_flows(
+        start,
+        end,
+        [border for borders in zone_borders.values() for border in borders],
+        max_concurrent_borders,
+        requests_per_minute,
+    )
+
+    with CACHE_DB.cursor() as connection:
+        if not CACHE_DB.read_only:
+            refresh_entsoe_net_positions(start, end, connection)
+        net_positions = read_net_positions(
+            "ENTSOE_NET_POSITION",
+            [bidding_zone.value for bidding_zone, borders in zone_borders.items() if borders],
+            start,
+            end,
+            connection,
+        )
+    return net_positions.astype(pd.Float64Dtype())  # type: ignore
+
+
+def refresh_entsoe_net_positions(start: pd.Timestamp, end: pd.Timestamp, connection: duckdb.DuckDBPyConnection):
+    """Recomputes the observed net positions in `ENTSOE_NET_POSITION` for the hours from `start` to `end`
+    that are missing or have had flows stored since. The net position of a zone is the sum of the cached flows
+    on its borders, aggregated in DuckDB. A zone gets no net position in the hours where the flow of one of
+    its borders in `plan_zone_borders` is missing.
+
+    Args:
+        start (pd.Timestamp): start of the range, in UTC
+        end (pd.Timestamp): end of the range, exclusive
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+    """
+    zone_borders = [
+        (bidding_zone.value, area_from.value, area_to.value)
+        for bidding_zone, borders in plan_zone_borders([bz for bz in BiddingZonesEnum]).items()
+        for area_from, area_to in borders
+    ]
+    zones, areas_from, areas_to = (list(values) for values in zip(*zone_borders))
+    select_query = (
+        "WITH borders AS (SELECT UNNEST(?) AS zone, UNNEST(?) AS area_from, UNNEST(?) AS area_to), "
+        "zone_borders AS (SELECT zone, count(*) AS borders FROM borders GROUP BY zone) "
+        "SELECT b.zone, e.time, sum(e.flow) AS net_position FROM ENTSOE e "
+        "JOIN borders b ON e.area_from = b.area_from AND e.area_to = b.area_to "
+        "JOIN zone_borders z ON b.zone = z.zone "
+        "WHERE e.time >= ? AND e.time < ? GROUP BY b.zone, e.time, z.borders HAVING count(e.flow) = z.borders"
+    )
+    refresh_materialized_table(
+        "ENTSOE_NET_POSITION", select_query, [zones, areas_from, areas_to], start, end, connection
+    )
+
+
+def plan_zone_borders(bidding_zones: list[BiddingZonesEnum]) -> dict[BiddingZonesEnum, list[tuple[Area, Area]]]:
+    """Maps each bidding zone to the ENTSOE (area_from, area_to) borders its net position is built from,
+    following `BIDDING_ZONE_CNEC_MAP`. A zone stops at the first border without an ENTSOE mapping.
+
+    Args:
+        bidding_zones (list[BiddingZonesEnum]): zones to plan the borders for
+
+    Returns:
+        dict[BiddingZonesEnum, list[tuple[Area, Area]]]: borders for each zone, seen from the zone
+    """
+    zone_borders: dict[BiddingZonesEnum, list[tuple[Area, Area]]] = {}
     for bidding_zone in bidding_zones:
-        data: list[pd.DataFrame] = []
+        borders: list[tuple[Area, Area]] = []
         with suppress(KeyError, ENTSOELookupException):
-            for bidding_zone_to in BIDDING_ZONE_CNEC_MAP[bidding_zone]:
-                data.append(fetch_entsoe_data_from_bidding_zones(start, end, bidding_zone, bidding_zone_to[1]))
+            for _, bidding_zone_to in BIDDING_ZONE_CNEC_MAP[bidding_zone]:
+                borders.append(lookup_entsoe_areas_from_bz(bidding_zone, bidding_zone_to))
+        zone_borders[bidding_zone] = borders
+    return zone_borders
 
-        if data:
-            corridor_flows = pd.concat(data, axis=1)
-            df_list.append(corridor_flows.sum(axis=1).rename(bidding_zone.value))
 
-    return pd.concat(df_list, axis=1)  # type: ignore
+def fetch_border_flows(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    borders: Iterable[tuple[Area, Area]],
+    max_concurrent_borders: int = DEFAULT_MAX_CONCURRENT_BORDERS,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+) -> pd.DataFrame:
+    """Gets the cross border flow for a set of borders, fetching every physical border once.
+    The flow in the opposite direction of a fetched border is its negation, as it is cached.
+
+    Only the hours missing from the cache are fetched from ENTSOE, on a bounded thread pool sharing one session,
+    before all flows are read from the cache in a single query.
+
+    Args:
+        start (pd.Timestamp): start of the retrieval range, in UTC
+        end (pd.Timestamp): end of the retrieval range, in UTC
+        borders (Iterable[tuple[Area, Area]]): (area_from, area_to) pairs, in any direction
+        max_concurrent_borders (int, optional): borders fetched from ENTSOE at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_BORDERS.
+        requests_per_minute (int, optional): budget of requests to the ENTSOE API per minute.
+            Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+
+    Returns:
+        pd.DataFrame: Frame with time as index and one column per requested border,
+            with (area_from, area_to) column keys
+    """
+    requested_borders = list(borders)
+    unique_borders = cache_border_flows(start, end, requested_borders, max_concurrent_borders, requests_per_minute)
+
+    with CACHE_DB.cursor() as connection:
+        cached_flows = read_border_flows(start, end, unique_borders, connection)
+
+    columns = pd.MultiIndex.from_tuples(list(dict.fromkeys(requested_borders)), names=cached_flows.columns.names)
+    border_flows = cached_flows.reindex(columns=columns)
+    for area_from, area_to in columns:
+        if (area_from, area_to) not in unique_borders:
+            border_flows[(area_from, area_to)] = -cached_flows[(area_to, area_from)]
+    return border_flows
+
+
+def cache_border_flows(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    borders: Iterable[tuple[Area, Area]],
+    max_concurrent_borders: int = DEFAULT_MAX_CONCURRENT_BORDERS,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+) -> list[tuple[Area, Area]]:
+    """Makes sure the flows of `borders` are cached from `start` to `end`, fetching only the missing hours
+
+    Args:
+        start (pd.Timestamp): start of the retrieval range, in UTC
+        end (pd.Timestamp): end of the retrieval range, in UTC
+        borders (Iterable[tuple[Area, Area]]): (area_from, area_to) pairs, in any direction
+        max_concurrent_borders (int, optional): borders fetched from ENTSOE at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_BORDERS.
+        requests_per_minute (int, optional): budget of requests to the ENTSOE API per minute.
+            Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+
+    Returns:
+        list[tuple[Area, Area]]: the physical borders, each once in the direction it was first given
+    """
+    unique_borders: list[tuple[Area, Area]] = []
+    for area_from, area_to in borders:
+        if (area_from, area_to) not in unique_borders and (area_to, area_from) not in unique_borders:
+            unique_borders.append((area_from, area_to))
+
+    with CACHE_DB.cursor() as connection:
+        missing_intervals = {
+            border: get_missing_intervals("ENTSOE", border_key(*border), start, end, connection)
+            for border in unique_borders
+        }
+    missing_intervals = {border: intervals for border, intervals in missing_intervals.items() if intervals}
+    # a read only cache, i.e. in a worker process, serves the hours it has
+    if missing_intervals and not CACHE_DB.read_only:
+        fetch_and_cache_borders(missing_intervals, max_concurrent_borders, requests_per_minute)
+    return unique_borders
+
+
+def fetch_and_cache_borders(
+    border_intervals: dict[tuple[Area, Area], list[tuple[pd.Timestamp, pd.Timestamp]]],
+    max_concurrent_borders: int = DEFAULT_MAX_CONCURRENT_BORDERS,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+):
+    """Fetches the flows of the borders in `border_intervals` from ENTSOE concurrently and stores them in the cache.
+    Every border is only fetched for its own intervals, i.e. the gaps in its cached hours.
+
+    The API calls run on a thread pool of at most `max_concurrent_borders` threads, over one shared session
+    and within the `requests_per_minute` budget. Results are written to the cache from the calling thread.
+
+    Args:
+        border_intervals (dict[tuple[Area, Area], list[tuple[pd.Timestamp, pd.Timestamp]]]): half open `[from, to)`
+            UTC intervals to fetch, for (area_from, area_to) pairs with each physical border once
+        max_concurrent_borders (int, optional): borders fetched at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_BORDERS.
+        requests_per_minute (int, optional): budget of requests to the ENTSOE API per minute.
+            Defaults to DEFAULT_REQUESTS_PER_MINUTE.
+    """
+    rate_limiter = RequestRateLimiter(requests_per_minute)
+    with Session() as session, ThreadPoolExecutor(max_workers=max_concurrent_borders) as executor:
+        client = get_entsoe_client(session)
+        futures = {
+            executor.submit(query_border_flows, start, end, area_from, area_to, client, rate_limiter): (
+                area_from,
+                area_to,
+            )
+            for (area_from, area_to), intervals in border_intervals.items()
+            for start, end in intervals
+        }
+        with CACHE_DB.cursor() as connection:
+            for future in as_completed(futures):
+                area_from, area_to = futures[future]
+                data, other_data = future.result()
+                cache_flow_data(connection, data - other_data, area_from, area_to)
+                cache_flow_data(connection, other_data - data, area_to, area_from)
 
 
 def resample_to_hour_and_replace(data: pandasDtypes) -> pandasDtypes:
@@ -202,73 +493,141 @@ def resample_to_hour_and_replace(data: pandasDtypes) -> pandasDtypes:
 def _get_cross_border_flow(
     start: pd.Timestamp, end: pd.Timestamp, area_from: Area, area_to: Area, _recurse: bool = True
 ) -> "pd.Series[float]":
-    connection = duckdb.connect(str(DB_PATH), read_only=True)
-    cached_data = None
-    with suppress(duckdb.CatalogException):
-        cached_data = connection.sql(
-            (
-                "SELECT * FROM ENTSOE WHERE time BETWEEN "
-                f"TIMESTAMPTZ '{start.isoformat()}' AND TIMESTAMPTZ '{end.isoformat()}'"
-                f"AND area_from='{area_from.value}' AND area_to='{area_to.value}'"
+    cached_flows = None
+    missing_intervals = [(start, end)]
+    with CACHE_DB.cursor() as connection, suppress(duckdb.CatalogException):
+        missing_intervals = get_missing_intervals("ENTSOE", border_key(area_from, area_to), start, end, connection)
+        if not missing_intervals:
+            cached_flows = read_border_flows(start, end, [(area_from, area_to)], connection)
+
+    if cached_flows is not None and not cached_flows.empty:
+        return cached_flows[(area_from, area_to)].rename("flow")
+
+    if CACHE_DB.read_only:
+        with CACHE_DB.cursor() as connection:
+            return read_border_flows(start, end, [(area_from, area_to)], connection)[(area_from, area_to)].rename(
+                "flow"
             )
-        ).df()
-    connection.close()
-
-    if cached_data is not None and not cached_data.empty:
-        cached_retval = cast_cache_to_correct_types(cached_data)
-        cached_retval = cached_retval[(start <= cached_retval.index) & (cached_retval.index < end)]
-        unique_timestamps: Sequence[datetime] = np.sort(cached_retval.index.unique().to_pydatetime())  # type: ignore
-        hours = (end - start).total_seconds() // (60 * 60)
-        quarters = (end - start).total_seconds() // (60 * 15)
 
-        if len(unique_timestamps) == hours or len(unique_timestamps) == quarters:
-            return cached_retval
-
-    engine = create_engine("duckdb:///" + str(DB_PATH))
-    query_and_cache_data(start, end, area_from, area_to, engine)
-    engine.dispose()
+    # only the gaps are fetched, the hours already cached are read back with them
+    with CACHE_DB.cursor() as connection:
+        for gap_start, gap_end in missing_intervals or [(start, end)]:
+            query_and_cache_data(gap_start, gap_end, area_from, area_to, connection)
 
     if not _recurse:
         raise RuntimeError("Recurse calls did not yield all data from ENTSOE - report this error to the maintainer")
     return _get_cross_border_flow(start, end, area_from, area_to, _recurse=False)
 
 
-def cast_cache_to_correct_types(cached_data: pd.DataFrame) -> "pd.Series[float]":
-    cached_data["time"] = cached_data["time"].astype(pd.DatetimeTZDtype("ns", "UTC"))
-    cached_data["flow"] = cached_data["flow"].astype(pd.Float64Dtype())
-    cached_retval = cached_data.set_index("time")["flow"]
-    cached_retval.index.rename("time", True)
+def read_border_flows(
+    start: pd.Timestamp, end: pd.Timestamp, borders: list[tuple[Area, Area]], connection: duckdb.DuckDBPyConnection
+) -> pd.DataFrame:
+    """Reads the cached flows of several borders in one query, pivoted to one column per border in DuckDB.
+    Does not fetch anything from ENTSOE.
+
+    Args:
+        start (pd.Timestamp): start of the range, in UTC
+        end (pd.Timestamp): end of the range, exclusive
+        borders (list[tuple[Area, Area]]): (area_from, area_to) pairs to read, as they are cached
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+
+    Returns:
+        pd.DataFrame: Frame with time as index and one column per border, with (area_from, area_to) column keys.
+            Hours without a cached flow for a border are NA.
+    """
+    if not borders:
+        return pd.DataFrame(
+            index=pd.DatetimeIndex([], tz="UTC", name="time"),
+            columns=pd.MultiIndex.from_tuples([], names=["area_from", "area_to"]),
+            dtype=pd.Float64Dtype(),
+        )
+
+    pivot_columns = ", ".join(
+        f'max(flow) FILTER (WHERE area_from = ? AND area_to = ?) AS "flow_{i}"' for i in range(len(borders))
+    )
+    border_params = [area.value for border in borders for area in border]
+    # timestamps are read as naive UTC wall time, so no DST-ambiguous local times reach pandas
+    cached_data = connection.execute(
+        f"SELECT timezone('UTC', time) AS time, {pivot_columns} FROM ENTSOE "
+        "WHERE time >= ? AND time < ? "
+        f"AND area_from || '_' || area_to IN (SELECT UNNEST(?)) "
+        "GROUP BY time ORDER BY time",
+        border_params
+        + [
+            start.to_pydatetime(),
+            end.to_pydatetime(),
+            [border_key(area_from, area_to) for area_from, area_to in borders],
+        ],
+    ).df()
+
+    cached_retval = cast_cache_to_correct_types(cached_data)
+    cached_retval.columns = pd.MultiIndex.from_tuples(borders, names=["area_from", "area_to"])
+    return cached_retval
+
+
+def border_key(area_from: Area, area_to: Area) -> str:
+    return f"{area_from.value}_{area_to.value}"
+
+
+def cast_cache_to_correct_types(cached_data: pd.DataFrame) -> pd.DataFrame:
+    cached_data["time"] = convert_series_to_utc(cached_data["time"])
+    cached_retval = cached_data.set_index("time").astype(pd.Float64Dtype())
     with suppress(ValueError):
         cached_retval.index.freq = pd.infer_freq(cached_retval.index)  # type: ignore
     return cached_retval
 
 
-def query_and_cache_data(start: pd.Timestamp, end: pd.Timestamp, area_from: Area, area_to: Area, engine: Engine):
-    data = _get_cross_border_flow_from_api(start, end, area_from, area_to)
-    other_data = _get_cross_border_flow_from_api(start, end, area_to, area_from)
+def query_and_cache_data(
+    start: pd.Timestamp, end: pd.Timestamp, area_from: Area, area_to: Area, connection: duckdb.DuckDBPyConnection
+):
+    data, other_data = query_border_flows(start, end, area_from, area_to)
+
+    cache_flow_data(connection, data - other_data, area_from, area_to)
+    cache_flow_data(connection, other_data - data, area_to, area_from)
 
-    data = resample_to_hour_and_replace(data)
-    other_data = resample_to_hour_and_replace(other_data)
 
-    cache_flow_data(engine, data - other_data, area_from, area_to)
-    cache_flow_data(engine, other_data - data, area_to, area_from)
+def query_border_flows(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    area_from: Area,
+    area_to: Area,
+    client: EntsoePandasClient | None = None,
+    rate_limiter: RequestRateLimiter | None = None,
+) -> tuple["pd.Series[float]", "pd.Series[float]"]:
+    """Fetches the hourly flow of a border from ENTSOE, in both directions
+
+    Returns:
+        tuple[pd.Series[float], pd.Series[float]]: flow from `area_from` to `area_to`, and the other way
+    """
+    data = _get_cross_border_flow_from_api(start, end, area_from, area_to, client, rate_limiter)
+    other_data = _get_cross_border_flow_from_api(start, end, area_to, area_from, client, rate_limiter)
+    return resample_to_hour_and_replace(data), resample_to_hour_and_replace(other_data)
 
 
-def cache_flow_data(engine: Engine, data: pd.Series, area_from: Area, area_to: Area):
+def cache_flow_data(connection: duckdb.DuckDBPyConnection, data: pd.Series, area_from: Area, area_to: Area):
     frame = pd.DataFrame({"flow": data})
     frame["area_from"] = area_from.value
     frame["area_to"] = area_to.value
     frame = frame.rename_axis("time").reset_index()
     frame["ROW_KEY"] = frame["area_from"] + "_" + frame["area_to"] + "_" + frame["time"].astype(str)
-    store_df_in_table("ENTSOE", frame, engine)
+    store_df_in_table("ENTSOE", frame, connection)
+    store_coverage("ENTSOE", border_key(area_from, area_to), frame["time"], connection)
 
 
 def _get_cross_border_flow_from_api(
-    start: pd.Timestamp, end: pd.Timestamp, area_from: Area, area_to: Area
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    area_from: Area,
+    area_to: Area,
+    client: EntsoePandasClient | None = None,
+    rate_limiter: RequestRateLimiter | None = None,
 ) -> "pd.Series[float]":
     logging.getLogger().info(f"Fetching ENTSOE data from {start} to {end} for {area_from} to {area_to}")
 
-    client = get_entsoe_client()
+    if client is None:
+        client = get_entsoe_client()
+    if rate_limiter is not None:
+        rate_limiter.wait()
     crossborder_flow = client.query_crossborder_flows(
         country_code_from=area_from,
         country_code_to=area_to,
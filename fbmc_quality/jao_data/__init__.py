@@ -1,6 +1,8 @@
 from fbmc_quality.jao_data.analyse_jao_data import (
+    CnecIndex,
     compute_basecase_net_pos,
     get_cnec_id_from_name,
     get_cross_border_cnec_ids,
 )
-from fbmc_quality.jao_data.fetch_jao_data import fetch_jao_dataframe_timeseries
+from fbmc_quality.jao_data.fetch_jao_data import CnecFilter, fetch_jao_dataframe_timeseries, update_ptdf_store
+from fbmc_quality.jao_data.ptdf_store import PTDF_STORE, PtdfBlock, PtdfStore
@@ -1,16 +1,18 @@
-import logging
 from contextlib import suppress
 from datetime import datetime
 from warnings import warn
 
+import duckdb
 import pandas as pd
-import polars as pl
 from pandera.typing import DataFrame
 
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import read_net_positions, refresh_materialized_table
 from fbmc_quality.dataframe_schemas.schemas import JaoData, NetPosition
+from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
 from fbmc_quality.enums.bidding_zones import BIDDING_ZONE_CNEC_MAP
 from fbmc_quality.enums.bidding_zones import BiddingZonesEnum as BiddingZonesEnum
-from fbmc_quality.jao_data.fetch_jao_data import fetch_jao_dataframe_timeseries
+from fbmc_quality.jao_data.fetch_jao_data import cache_jao_data
 
 ALTERNATIVE_NAMES = {
     "NO_NO2_NL->NO2": ["NL->NO2"],
@@ -19,58 +21,112 @@ ALTERNATIVE_NAMES = {
 }
 
 
-def get_cnec_id_from_name(
-    cnecName: str, dataset: DataFrame[JaoData], alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES
-) -> str:
-    """Gets the CNEC-ID for a given cnec name. Returns the id(s) associated with this name
-    at the 0th timestep of the dataset
+class CnecIndex:
+    """Index of the CNECs in a JAO dataset, built once per dataset and looked up in constant time.
+
+    Maps CNEC names to ids, following `alternative_names` for names that have changed,
+    and ids to their name and the time range they appear in.
+    Only the name, id and time of each row are read, the dataset itself is not copied.
 
     Args:
-        cnecName (str): CNEC to find the correspondig ID for
-        dataset (DataFrame[JaoData]): Dataset of CNEC information. See `make_data_array_from_datetime` for the schema
+        dataset (DataFrame[JaoData]): Dataset of CNEC information, indexed by cnec_id and time
         alternative_names (dict[str, list[str]]): mapping of names that may have changed
-
-    Returns:
-        np.ndarray | int: Possibly Id(s) of the cnecs that correspond to the
     """
 
-    cnec_ids = None
-    test_alternative = True
+    def __init__(self, dataset: DataFrame[JaoData], alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES):
+        self._alternative_names = alternative_names
+
+        times = dataset.index.get_level_values(JaoData.time)
+        rows = pd.DataFrame(
+            {
+                JaoData.cnecName: dataset[JaoData.cnecName].to_numpy(),
+                JaoData.cnec_id: dataset.index.get_level_values(JaoData.cnec_id),
+                JaoData.time: times,
+            }
+        )
+        name_and_ids = rows[[JaoData.cnecName, JaoData.cnec_id]]
+
+        # ids are first looked up at the 0th timestep of the dataset, then in the whole dataset
+        first_step = name_and_ids[(times == times[0]) if len(times) else []]
+        self._first_step_ids: dict[str, list[str]] = (
+            first_step.groupby(JaoData.cnecName)[JaoData.cnec_id].agg(list).to_dict()
+        )
+        unique_name_and_ids = name_and_ids.drop_duplicates()
+        self._all_ids: dict[str, list[str]] = (
+            unique_name_and_ids.groupby(JaoData.cnecName)[JaoData.cnec_id].agg(list).to_dict()
+        )
+        self._names: dict[str, str] = (
+            unique_name_and_ids.drop_duplicates(JaoData.cnec_id).set_index(JaoData.cnec_id)[JaoData.cnecName].to_dict()
+        )
+        time_ranges = rows.groupby(JaoData.cnec_id)[JaoData.time].agg(["min", "max"])
+        self._time_ranges: dict[str, tuple[pd.Timestamp, pd.Timestamp]] = dict(
+            zip(time_ranges.index, zip(time_ranges["min"], time_ranges["max"]))
+        )
+
+    def get_id(self, cnecName: str) -> str:
+        """Gets the CNEC-ID for a given cnec name, as `get_cnec_id_from_name` does
 
-    time_obj = dataset.index.get_level_values(JaoData.time)[0]
-    time_slice = dataset.xs(key=time_obj, level=JaoData.time)
-    ds_where = time_slice[JaoData.cnecName].where(time_slice[JaoData.cnecName] == cnecName)
-    cnec_ids = ds_where.dropna().index.get_level_values(JaoData.cnec_id)
+        Args:
+            cnecName (str): CNEC to find the correspondig ID for
 
-    if len(cnec_ids) == 1:
-        return cnec_ids.values[0]
+        Raises:
+            ValueError: if no or more than one id is found for the name
+
+        Returns:
+            str: Id of the cnec
+        """
+        cnec_ids = self._first_step_ids.get(cnecName, [])
+        if len(cnec_ids) == 1:
+            return cnec_ids[0]
 
-    if cnecName in alternative_names and test_alternative:
-        test_alternative = False
         with suppress(ValueError):
-            for alternative in alternative_names[cnecName]:
-                pot_id = get_cnec_id_from_name(alternative, dataset, alternative_names)
-                return pot_id
+            for alternative in self._alternative_names.get(cnecName, []):
+                return self.get_id(alternative)
+
+        fallback_ids = self._all_ids.get(cnecName, [])
+        if len(fallback_ids) == 1:
+            return fallback_ids[0]
+
+        raise ValueError(f"Ambigious or non-existent ID for {cnecName}, expected one but found {cnec_ids}")
+
+    def get_name(self, cnec_id: str) -> str:
+        """Gets the name of the CNEC with id `cnec_id`"""
+        return self._names[cnec_id]
+
+    def get_time_range(self, cnec_id: str) -> tuple[pd.Timestamp, pd.Timestamp]:
+        """Gets the first and last time the CNEC with id `cnec_id` appears in the dataset"""
+        return self._time_ranges[cnec_id]
+
+    @property
+    def cnec_ids(self) -> list[str]:
+        return list(self._names)
 
-    fallback_id = _get_cnec_id_from_polars_frame(cnecName, dataset)["cnec_id"].unique()
-    if len(fallback_id) == 1:
-        return fallback_id[0]
+    def __contains__(self, cnecName: str) -> bool:
+        return cnecName in self._all_ids
 
-    raise ValueError(f"Ambigious or non-existent ID for {cnecName}, expected one but found {cnec_ids}")
 
+def get_cnec_id_from_name(
+    cnecName: str, dataset: DataFrame[JaoData], alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES
+) -> str:
+    """Gets the CNEC-ID for a given cnec name. Returns the id(s) associated with this name
+    at the 0th timestep of the dataset. Use a `CnecIndex` when looking up more than one name in the same dataset.
 
-def _get_cnec_id_from_polars_frame(cnecName: str, dataset: DataFrame[JaoData]) -> pd.DataFrame:
-    logging.getLogger().info("Trying fallback method for finding CNEC ID")
+    Args:
+        cnecName (str): CNEC to find the correspondig ID for
+        dataset (DataFrame[JaoData]): Dataset of CNEC information. See `make_data_array_from_datetime` for the schema
+        alternative_names (dict[str, list[str]]): mapping of names that may have changed
 
-    frame = pl.from_pandas(dataset, rechunk=False, include_index=True)
-    selected_data = frame.filter(pl.col(JaoData.cnecName) == cnecName)
-    return selected_data.select(pl.col(JaoData.cnec_id)).to_pandas()
+    Returns:
+        np.ndarray | int: Possibly Id(s) of the cnecs that correspond to the
+    """
+    return CnecIndex(dataset, alternative_names).get_id(cnecName)
 
 
 def get_cross_border_cnec_ids(
     df: DataFrame[JaoData],
     bidding_zones: BiddingZonesEnum | list[BiddingZonesEnum] | None = None,
     bidding_zone_cnec_map: dict[BiddingZonesEnum, list[tuple[str, BiddingZonesEnum]]] = BIDDING_ZONE_CNEC_MAP,
+    cnec_index: CnecIndex | None = None,
 ) -> dict[BiddingZonesEnum, list[str]]:
     """From a dataset find the cnec ids (a coordinate in the DS) that correspond to the cross border flows.
     The mapping is maintained in BIDDING_ZONE_CNEC_MAP
@@ -91,6 +147,7 @@ def get_cross_border_cnec_ids(
             >>> ],
             >>> ...
             >>> }
+        cnec_index (CnecIndex | None, optional): index of `df`, built from `df` if not given. Defaults to None.
 
     Returns:
         dict[BiddingZonesEnum, list[str]]: mapping of bidding zone to cnec_id strings
@@ -101,6 +158,9 @@ def get_cross_border_cnec_ids(
     if isinstance(bidding_zones, BiddingZonesEnum):
         bidding_zones = [bidding_zones]
 
+    if cnec_index is None:
+        cnec_index = CnecIndex(df)
+
     bz_to_cnec_id_map = {bz: [] for bz in bidding_zones}
 
     for bidding_zone in bidding_zones:
@@ -108,7 +168,7 @@ def get_cross_border_cnec_ids(
         try:
             cnec_names = bidding_zone_cnec_map[bidding_zone]
             for cnec_name_and_bz in cnec_names:
-                mrid = get_cnec_id_from_name(cnec_name_and_bz[0], df)
+                mrid = cnec_index.get_id(cnec_name_and_bz[0])
                 cnec_mrids.append(mrid)
         except (ValueError, KeyError):
             continue
@@ -122,17 +182,19 @@ def compute_basecase_net_pos(
     end: datetime | pd.Timestamp,
     bidding_zones: BiddingZonesEnum | list[BiddingZonesEnum] | None = None,
     filter_non_conforming_hours: bool = False,
+    dataset: DataFrame[JaoData] | None = None,
 ) -> DataFrame[NetPosition] | None:
     """Computes the net-positions in a period from `start` to `end` from data in `dataset`,
       for the given `bidding_zones`
 
     Args:
-        dataset (DataFrame[JaoData]): Data used to compute the net positions.
         start (date | None, optional): Date to start filter the computation on.
         end (date | None, optional): Date to end filter the computation on.
         bidding_zones (BiddingZonesEnum | list[BiddingZones] | None, optional):
             Bidding zones to compute the net position for.
             Defaults to None, which will compute for ALL bidding zones.
+        dataset (DataFrame[JaoData] | None, optional): Data already loaded from JAO, needs the `cnecName`
+            and `fref` columns. Defaults to None, which computes the net positions in the cache database.
 
     Returns DataFrame[JaoData]:
     """
@@ -146,22 +208,22 @@ def compute_basecase_net_pos(
     if isinstance(bidding_zones, BiddingZonesEnum):
         bidding_zones = [bidding_zones]
 
-    dataset = fetch_jao_dataframe_timeseries(start, end)
-    if dataset is None:
+    start_pd = convert_date_to_utc_pandas(start)
+    end_pd = convert_date_to_utc_pandas(end)
+
+    if dataset is not None:
+        retval = _compute_basecase_net_pos_from_dataset(dataset, start_pd, end_pd, bidding_zones)
+    else:
+        cache_jao_data(start_pd, end_pd)
+        with CACHE_DB.cursor() as connection:
+            if not CACHE_DB.read_only:
+                refresh_basecase_net_positions(start_pd, end_pd, connection)
+            retval = read_net_positions(
+                "JAO_NET_POSITION", [bidding_zone.value for bidding_zone in bidding_zones], start_pd, end_pd, connection
+            )
+    if retval.empty:
         raise RuntimeError(f"No date in interval {start} to {end}")
 
-    all_cnec_mrids = get_cross_border_cnec_ids(dataset, bidding_zones)
-    inner_dataset = dataset.dropna(subset=[JaoData.fref], how="all", axis=0)
-    np_frames = []
-
-    for bidding_zone in bidding_zones:
-        cnec_mrids = all_cnec_mrids[bidding_zone]
-        selected_data = inner_dataset[inner_dataset.index.get_level_values(JaoData.cnec_id).isin(cnec_mrids)]
-
-        nps = selected_data[JaoData.fref].groupby(level=JaoData.time).sum()
-        np_frames.append(nps.to_frame(bidding_zone.value))
-
-    retval = -1 * pd.concat(np_frames, axis=1)
     if check_for_zero_zum:
         filter_list = is_elements_equal_to_target(retval.sum(1), threshold=5)
         if filter_non_conforming_hours:
@@ -169,6 +231,104 @@ def compute_basecase_net_pos(
     return retval
 
 
+def _border_cnec_names(
+    bidding_zones: list[BiddingZonesEnum],
+    bidding_zone_cnec_map: dict[BiddingZonesEnum, list[tuple[str, BiddingZonesEnum]]] = BIDDING_ZONE_CNEC_MAP,
+    alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES,
+) -> pd.DataFrame:
+    # one row per name a border CNEC may have, the name itself first, as `CnecIndex.get_id` tries them
+    return pd.DataFrame(
+        [
+            (bidding_zone.value, border_name, cnec_name, priority)
+            for bidding_zone in bidding_zones
+            for border_name, _ in bidding_zone_cnec_map.get(bidding_zone, [])
+            for priority, cnec_name in enumerate([border_name] + alternative_names.get(border_name, []))
+        ],
+        columns=["zone", "border", JaoData.cnecName, "priority"],
+    )
+
+
+def _compute_basecase_net_pos_from_dataset(
+    dataset: DataFrame[JaoData], start: pd.Timestamp, end: pd.Timestamp, bidding_zones: list[BiddingZonesEnum]
+) -> pd.DataFrame:
+    times = dataset.index.get_level_values(JaoData.time)
+    inner_dataset = dataset.loc[(times >= start) & (times < end)].dropna(subset=[JaoData.fref], how="all", axis=0)
+    rows = pd.DataFrame(
+        {
+            JaoData.time: inner_dataset.index.get_level_values(JaoData.time),
+            JaoData.cnecName: inner_dataset[JaoData.cnecName].astype(object).to_numpy(),
+            JaoData.fref: inner_dataset[JaoData.fref].to_numpy(dtype=float),
+        }
+    )
+    borders = _border_cnec_names(bidding_zones)
+    zones = [bidding_zone.value for bidding_zone in bidding_zones]
+
+    # the border CNECs are resolved per hour, as in `refresh_basecase_net_positions`
+    candidates = (
+        rows.merge(borders, on=JaoData.cnecName)
+        .groupby(["zone", "border", "priority", JaoData.time])[JaoData.fref]
+        .agg(["first", "size"])
+        .reset_index()
+    )
+    resolved = (
+        candidates.loc[candidates["size"] == 1]
+        .sort_values("priority")
+        .drop_duplicates(["zone", "border", JaoData.time])
+    )
+    found_borders = resolved.groupby(["zone", JaoData.time])["border"].transform("size")
+    resolved = resolved.loc[found_borders == resolved["zone"].map(borders.groupby("zone")["border"].nunique())]
+
+    nps = resolved.groupby([JaoData.time, "zone"])["first"].sum().unstack("zone").reindex(columns=zones)
+    return -1 * nps.rename_axis(columns=None).sort_index().astype(float)
+
+
+def refresh_basecase_net_positions(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    connection: duckdb.DuckDBPyConnection,
+    bidding_zone_cnec_map: dict[BiddingZonesEnum, list[tuple[str, BiddingZonesEnum]]] = BIDDING_ZONE_CNEC_MAP,
+    alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES,
+):
+    """Recomputes the basecase net positions in `JAO_NET_POSITION` for the hours from `start` to `end`
+    that are missing or have had JAO data stored since.
+
+    The net position of a zone is minus the sum of the `fref` of its border CNECs, aggregated in DuckDB.
+    In every hour, a border CNEC is found by its name or else by one of its `alternative_names`,
+    in the order `CnecIndex.get_id` tries them, where the name appears exactly once.
+    A zone gets no net position in the hours where one of its border CNECs is not found.
+
+    Args:
+        start (pd.Timestamp): start of the range, in UTC
+        end (pd.Timestamp): end of the range, exclusive
+        connection (duckdb.DuckDBPyConnection): connection to the cache database
+        bidding_zone_cnec_map (dict[BiddingZonesEnum, list[tuple[str, BiddingZonesEnum]]]):
+            Mapping from bidding zone to its border cnec names. Defaults to BIDDING_ZONE_CNEC_MAP.
+        alternative_names (dict[str, list[str]]): mapping of names that may have changed.
+            Defaults to ALTERNATIVE_NAMES.
+    """
+    borders = _border_cnec_names([bz for bz in BiddingZonesEnum], bidding_zone_cnec_map, alternative_names)
+    select_query = (
+        "WITH borders AS "
+        "(SELECT UNNEST(?) AS zone, UNNEST(?) AS border, UNNEST(?) AS cnecName, UNNEST(?) AS priority), "
+        "zone_borders AS (SELECT zone, count(DISTINCT border) AS borders FROM borders GROUP BY zone), "
+        "candidates AS (SELECT b.zone, b.border, b.priority, j.time, any_value(j.fref) AS fref, count(*) AS matches "
+        "FROM JAO j JOIN borders b ON j.cnecName = b.cnecName "
+        "WHERE j.time >= ? AND j.time < ? AND j.fref IS NOT NULL GROUP BY b.zone, b.border, b.priority, j.time), "
+        "resolved AS (SELECT zone, border, time, arg_min(fref, priority) AS fref FROM candidates "
+        "WHERE matches = 1 GROUP BY zone, border, time) "
+        "SELECT r.zone, r.time, -sum(r.fref) AS net_position FROM resolved r JOIN zone_borders z ON r.zone = z.zone "
+        "GROUP BY r.zone, r.time, z.borders HAVING count(*) = z.borders"
+    )
+    refresh_materialized_table(
+        "JAO_NET_POSITION",
+        select_query,
+        [borders[column].to_list() for column in ["zone", "border", JaoData.cnecName, "priority"]],
+        start,
+        end,
+        connection,
+    )
+
+
 def is_elements_equal_to_target(
     array: "pd.Series[pd.Float64Dtype | pd.Int64Dtype]", target: int | float = 0, threshold: float = 1e-6
 ) -> "pd.Series[bool]":
@@ -3,21 +3,35 @@ import hashlib
 import logging
 import uuid
 import warnings
+from contextlib import suppress
 from datetime import datetime, timedelta
-from typing import Hashable, Iterable, TypeVar
+from pathlib import Path
+from typing import NamedTuple, TypeVar
 
 import aiohttp
 import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow
+import pyarrow.compute
 from pandera.typing import DataFrame
-from pytz import AmbiguousTimeError
-from sqlalchemy import Engine, create_engine
 
-from fbmc_quality.dataframe_schemas.cache_db import DB_PATH
-from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_df_in_table
-from fbmc_quality.dataframe_schemas.schemas import JaoData
-from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import (
+    get_cached_hours,
+    get_missing_intervals,
+    hours_to_intervals,
+    store_coverage,
+    store_df_in_table,
+)
+from fbmc_quality.dataframe_schemas.schemas import CompactJaoData, JaoData, JaoModel
+from fbmc_quality.datetime_handlers.handle_timezones import (
+    convert_date_to_utc_pandas,
+    convert_series_to_utc,
+    split_period,
+)
 from fbmc_quality.exceptions.fbmc_exceptions import JAOLookupException, WrongTimezoneException
+from fbmc_quality.jao_data.ptdf_store import PTDF_STORE, PTDF_STORE_FIELDS
 
 warnings.filterwarnings(
     "ignore",
@@ -32,32 +46,119 @@ def create_uuid_from_string(val: str) -> str:
     return str(uuid.UUID(hex=hex_string))
 
 
-async def get_ptdfs(date: timedata, session: aiohttp.ClientSession) -> pd.DataFrame:
+# (cnecName, contName) -> cnec_id tables, one per cache database, and `None` for ids that are not persisted
+_CNEC_ID_LOOKUPS: dict[Path | None, dict[tuple[str, str], str]] = {}
+
+
+def _get_cnec_id_lookup(connection: duckdb.DuckDBPyConnection | None) -> dict[tuple[str, str], str]:
+    # keyed on the path, so the table of a database configured later is loaded and filled on its own
+    if connection is None:
+        return _CNEC_ID_LOOKUPS.setdefault(None, {})
+
+    path = CACHE_DB.path
+    if path not in _CNEC_ID_LOOKUPS:
+        rows = connection.execute("SELECT cnecName, contName, cnec_id FROM CNEC_ID").fetchall()
+        _CNEC_ID_LOOKUPS[path] = {(cnec_name, cont_name): cnec_id for cnec_name, cont_name, cnec_id in rows}
+    return _CNEC_ID_LOOKUPS[path]
+
+
+def create_cnec_ids(
+    cnec_names: "pd.Series[str]",
+    cont_names: "pd.Series[str]",
+    connection: duckdb.DuckDBPyConnection | None = None,
+) -> "pd.Series[str]":
+    """Creates the CNEC ids for pairs of CNEC names and contingency names.
+    The id is the uuid of the md5 hash of `cnecName + contName`, see `create_uuid_from_string`.
+
+    Each unique pair is looked up in a (cnecName, contName) -> cnec_id table that lives for the process,
+    and only pairs not seen before are hashed. If `connection` is supplied the table is also persisted in
+    the `CNEC_ID` table of the cache, and there is one table per path of `CACHE_DB`.
+
+    Args:
+        cnec_names (pd.Series[str]): names of the CNECs
+        cont_names (pd.Series[str]): names of the contingencies, aligned with `cnec_names`
+        connection (duckdb.DuckDBPyConnection | None, optional): connection to the cache to persist
+            the lookup table in. Defaults to None.
+
+    Returns:
+        pd.Series[str]: cnec ids with the same index as `cnec_names`
+    """
+    cnec_id_lookup = _get_cnec_id_lookup(connection)
+
+    # object first, so categorical names do not need "" as a category
+    pairs = pd.MultiIndex.from_arrays(
+        [cnec_names.astype(object).fillna("").astype(str), cont_names.astype(object).fillna("").astype(str)]
+    )
+    codes, unique_pairs = pairs.factorize()
+
+    new_pairs = [pair for pair in unique_pairs if pair not in cnec_id_lookup]
+    if new_pairs:
+        for cnec_name, cont_name in new_pairs:
+            cnec_id_lookup[(cnec_name, cont_name)] = create_uuid_from_string(cnec_name + cont_name)
+
+        if connection is not None:
+            new_ids = pd.DataFrame(new_pairs, columns=[JaoData.cnecName, JaoData.contName])
+            new_ids[JaoData.cnec_id] = [cnec_id_lookup[pair] for pair in new_pairs]
+            store_df_in_table("CNEC_ID", new_ids.drop_duplicates([JaoData.cnec_id]), connection)
+
+    unique_ids = np.array([cnec_id_lookup[pair] for pair in unique_pairs], dtype=object)
+    return pd.Series(unique_ids[codes], index=cnec_names.index, name=JaoData.cnec_id)
+
+
+JAO_URL = "https://test-publicationtool.jao.eu/nordic/api/data/finalComputation"
+JAO_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Encoding": "gzip, deflate, br, zstd",
+    "Accept-Language": "nb-NO,nb;q=0.9,no;q=0.8,nn;q=0.7,en-US;q=0.6,en;q=0.5",
+    "Origin": "https://test-publicationtool.jao.eu",
+    "Referer": "https://test-publicationtool.jao.eu/nordic/flowbasedDomain",
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "same-origin",
+    "X-Requested-With": "XMLHttpRequest",
+}
+JAO_PAGE_SIZE = 100
+DEFAULT_MAX_CONCURRENT_PAGES = 8
+DEFAULT_MAX_CONCURRENT_WINDOWS = 4
+DEFAULT_WINDOW_HOURS = 1
+DEFAULT_MAX_ROWS_PER_WINDOW = 20_000
+DEFAULT_PTDF_BACKFILL_CHUNK_SIZE = pd.Timedelta(weeks=1)
+
+
+def _format_jao_timestamp(date: timedata) -> str:
+    return date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+async def get_ptdfs(
+    date: timedata,
+    session: aiohttp.ClientSession,
+    max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    hours: int = 1,
+    max_rows_per_window: int = DEFAULT_MAX_ROWS_PER_WINDOW,
+) -> pd.DataFrame:
     """get PTDFs from JAO, query by datetime
 
+    The number of rows is queried first, then the pages are fetched concurrently and combined in one go.
+    If `hours` is larger than 1 the query spans several hours. When the window holds more than
+    `max_rows_per_window` rows it is split in two, and each half is queried separately.
+    A half without data is logged and left out, any other error of a half is raised.
+
     Args:
         date (datetime): date to query the JAO by
+        session (aiohttp.ClientSession): session to send the requests with
+        max_concurrent_pages (int, optional): max number of pages requested at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_PAGES.
+        hours (int, optional): number of hours from `date` to query for. Defaults to 1.
+        max_rows_per_window (int, optional): max number of rows to page through in a single window.
+            Defaults to DEFAULT_MAX_ROWS_PER_WINDOW.
 
     Returns:
-        Dict[str, object]: HTTP payload from the API request
+        pd.DataFrame: rows of the HTTP payloads from the API requests
     """
     session.verify = False
 
-    date_str = date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    to_date_str = (date + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-
-    url = "https://test-publicationtool.jao.eu/nordic/api/data/finalComputation"
-    headers = {
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Encoding": "gzip, deflate, br, zstd",
-        "Accept-Language": "nb-NO,nb;q=0.9,no;q=0.8,nn;q=0.7,en-US;q=0.6,en;q=0.5",
-        "Origin": "https://test-publicationtool.jao.eu",
-        "Referer": "https://test-publicationtool.jao.eu/nordic/flowbasedDomain",
-        "Sec-Fetch-Dest": "empty",
-        "Sec-Fetch-Mode": "cors",
-        "Sec-Fetch-Site": "same-origin",
-        "X-Requested-With": "XMLHttpRequest",
-    }
+    date_str = _format_jao_timestamp(date)
+    to_date_str = _format_jao_timestamp(date + timedelta(hours=hours))
 
     data = {
         "FromUtc": date_str,
@@ -67,41 +168,67 @@ async def get_ptdfs(date: timedata, session: aiohttp.ClientSession) -> pd.DataFr
         "Take": "0",
     }
 
-    async with session.get(url=url, data=data, headers=headers) as response:
+    async with session.get(url=JAO_URL, data=data, headers=JAO_HEADERS) as response:
         json = await response.json()
         if json["totalRowsWithFilter"] == 0:
             raise JAOLookupException(f"No data for {date_str} to {to_date_str}")
         else:
             total_num_data = json["totalRowsWithFilter"]
 
-    df = pd.DataFrame()  # type: ignore
-    args = []
+    if total_num_data > max_rows_per_window and hours > 1:
+        first_half = hours // 2
+        halves = await asyncio.gather(
+            get_ptdfs(date, session, max_concurrent_pages, first_half, max_rows_per_window),
+            get_ptdfs(
+                date + timedelta(hours=first_half),
+                session,
+                max_concurrent_pages,
+                hours - first_half,
+                max_rows_per_window,
+            ),
+            return_exceptions=True,
+        )
+        frames = [half for half in halves if isinstance(half, pd.DataFrame)]
+        for half in halves:
+            if isinstance(half, JAOLookupException):
+                # a half without data is left out, the other half is still returned
+                logging.getLogger().warning(f"JAO: leaving out half of {date_str} to {to_date_str}: {half}")
+            elif not isinstance(half, pd.DataFrame):
+                raise half
+        if not frames:
+            raise JAOLookupException(f"No data for {date_str} to {to_date_str}")
+        return pd.concat(frames, ignore_index=True)
+
+    semaphore = asyncio.Semaphore(max_concurrent_pages)
 
-    for i in range(0, total_num_data, 100):
-        args.append({"FromUtc": date_str, "ToUtc": to_date_str, "Filter": "{}", "Skip": i, "Take": 100})
+    async def get_page(skip: int) -> list[dict]:
+        arg = {"FromUtc": date_str, "ToUtc": to_date_str, "Filter": "{}", "Skip": skip, "Take": JAO_PAGE_SIZE}
+        async with semaphore:
+            async with session.get(url=JAO_URL, data=arg, headers=JAO_HEADERS) as response:
+                json = await response.json()
+                return json["data"]
 
-    for arg in args:
-        async with session.get(url=url, data=arg, headers=headers) as response:
-            json = await response.json()
-            df = pd.concat([df, pd.DataFrame(json["data"])])
-    return df
+    pages = await asyncio.gather(*(get_page(i) for i in range(0, total_num_data, JAO_PAGE_SIZE)))
+    return pd.DataFrame([row for page in pages for row in page])
 
 
 async def _fetch_jao_dataframe_from_datetime(
-    date: timedata, engine: Engine, session: aiohttp.ClientSession | None = None
+    date: timedata,
+    connection: duckdb.DuckDBPyConnection,
+    session: aiohttp.ClientSession | None = None,
+    max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    hours: int = 1,
 ) -> DataFrame[JaoData]:
-    """Fetches a dataframe representation of JAO data"""
+    """Fetches a dataframe representation of JAO data, for `hours` hours starting at `date`"""
 
     if session is None:
         async with aiohttp.ClientSession() as new_session:
-            df = await get_ptdfs(date, new_session)
+            df = await get_ptdfs(date, new_session, max_concurrent_pages, hours)
     else:
-        df = await get_ptdfs(date, session)
+        df = await get_ptdfs(date, session, max_concurrent_pages, hours)
 
     df = df.loc[df[JaoData.cnecName].notnull(), :]
-    df[JaoData.cnec_id] = df.apply(
-        lambda row: create_uuid_from_string(row[JaoData.cnecName] + row[JaoData.contName]), axis=1
-    )
+    df[JaoData.cnec_id] = create_cnec_ids(df[JaoData.cnecName], df[JaoData.contName], connection)
     df[JaoData.time] = pd.to_datetime(df[JaoData.dateTimeUtc])
     col = df.columns.to_list()
 
@@ -113,33 +240,148 @@ async def _fetch_jao_dataframe_from_datetime(
     df = df.drop_duplicates(["ROW_KEY"])
     df = df.drop(["SE3_SWL", "SE4_SWL"], axis=1)
 
-    store_df_in_table("JAO", df, engine)
+    store_df_in_table("JAO", df, connection)
+    store_coverage("JAO", "", df[JaoData.time].unique(), connection)
     df = df.set_index([JaoData.cnec_id, JaoData.time]).drop("ROW_KEY", axis=1)
     df_validated: DataFrame[JaoData] = JaoData.validate(df)  # type: ignore
+    PTDF_STORE.append(df_validated)
     return df_validated
 
 
-async def _fetch_jao_dataframe_timeseries(time_points: list[datetime]) -> DataFrame[JaoData] | None:
+def plan_fetch_windows(time_points: list[datetime], window_hours: int) -> list[tuple[datetime, int]]:
+    """Groups hourly time points into contiguous windows of at most `window_hours` hours
+
+    Args:
+        time_points (list[datetime]): hours to fetch
+        window_hours (int): max number of hours in a window
+
+    Returns:
+        list[tuple[datetime, int]]: start of each window and the number of hours it spans
+    """
+    windows: list[tuple[datetime, int]] = []
+    for time_point in sorted(time_points):
+        if windows:
+            window_start, window_length = windows[-1]
+            is_contiguous = window_start + timedelta(hours=window_length) == time_point
+            if is_contiguous and window_length < window_hours:
+                windows[-1] = (window_start, window_length + 1)
+                continue
+        windows.append((time_point, 1))
+    return windows
+
+
+async def _fetch_jao_dataframe_timeseries(
+    time_points: list[datetime],
+    max_concurrent_windows: int = DEFAULT_MAX_CONCURRENT_WINDOWS,
+    window_hours: int = DEFAULT_WINDOW_HOURS,
+) -> DataFrame[JaoData] | None:
     logging.getLogger().info(f"Fetching JAO data from {len(time_points)} hours")
 
-    all_results: list[DataFrame[JaoData]] = []
-    engine = create_engine("duckdb:///" + str(DB_PATH))
+    semaphore = asyncio.Semaphore(max_concurrent_windows)
+
+    # the coroutines share the cursor, which is safe since they all run on the thread of the event loop
+    with CACHE_DB.cursor() as connection:
 
-    async with aiohttp.ClientSession() as session:
-        for time_point in time_points:
-            results = await _fetch_jao_dataframe_from_datetime(time_point, engine, session)
-            all_results.append(results)
+        async def fetch_window(start: datetime, hours: int, session: aiohttp.ClientSession) -> DataFrame[JaoData]:
+            async with semaphore:
+                return await _fetch_jao_dataframe_from_datetime(start, connection, session, hours=hours)
+
+        async with aiohttp.ClientSession() as session:
+            all_results: list[DataFrame[JaoData]] = await asyncio.gather(
+                *(fetch_window(start, hours, session) for start, hours in plan_fetch_windows(time_points, window_hours))
+            )
 
-    engine.dispose()
     if all_results:
-        return_frame = pd.concat(all_results)
-        return return_frame  # type: ignore
+        return pd.concat(all_results).sort_index()  # type: ignore
     else:
         return None
 
 
+class CnecFilter(NamedTuple):
+    """Filter on which CNECs to read from JAO data. Every field that is not `None` has to match."""
+
+    cnec_names: list[str] | None = None
+    cnec_ids: list[str] | None = None
+    cnec_types: list[str] | None = None
+
+
+JAO_COLUMNS: list[str] = [column.name for column in JaoModel.__table__.columns if column.name != "ROW_KEY"]
+
+
+def _validate_jao_columns(columns: list[str]):
+    unknown_columns = set(columns) - set(JAO_COLUMNS)
+    if unknown_columns:
+        raise ValueError(f"Unknown JAO columns {unknown_columns}")
+
+
+def _make_jao_cache_query(
+    from_time: pd.Timestamp, to_time: pd.Timestamp, columns: list[str] | None, cnec_filter: CnecFilter | None
+) -> tuple[str, list]:
+    # timestamps are read as naive UTC wall time, so no DST-ambiguous local times reach pandas
+    utc_columns = {col: f'timezone(\'UTC\', "{col}") AS "{col}"' for col in (JaoData.time, JaoData.dateTimeUtc)}
+    if columns is None:
+        select = f"* EXCLUDE (ROW_KEY) REPLACE ({', '.join(utc_columns.values())})"
+    else:
+        _validate_jao_columns(columns)
+        index_and_columns = [JaoData.cnec_id, JaoData.time] + [
+            col for col in columns if col not in (JaoData.cnec_id, JaoData.time)
+        ]
+        select = ", ".join(utc_columns.get(col, f'"{col}"') for col in index_and_columns)
+
+    query = (
+        f"SELECT {select} FROM JAO WHERE time BETWEEN"
+        f" TIMESTAMPTZ '{from_time.isoformat()}'"
+        f"AND TIMESTAMPTZ '{(to_time + pd.Timedelta(1, unit='minutes')).isoformat()}'"
+    )
+    parameters: list = []
+
+    if cnec_filter is not None:
+        for column, values in (
+            (JaoData.cnecName, cnec_filter.cnec_names),
+            (JaoData.cnec_id, cnec_filter.cnec_ids),
+            (JaoData.cnecType, cnec_filter.cnec_types),
+        ):
+            if values is not None:
+                query += f' AND "{column}" IN (SELECT UNNEST(?))'
+                parameters.append(list(values))
+    return query, parameters
+
+
+def select_from_jao_frame(
+    frame: DataFrame[JaoData], columns: list[str] | None = None, cnec_filter: CnecFilter | None = None
+) -> DataFrame[JaoData]:
+    """Applies the same column projection and CNEC filter as the cache reads to an in-memory JAO frame
+
+    Args:
+        frame (DataFrame[JaoData]): JAO data indexed by cnec_id and time
+        columns (list[str] | None, optional): columns to keep. Defaults to None, which keeps all columns.
+        cnec_filter (CnecFilter | None, optional): filter on the CNECs to keep. Defaults to None.
+
+    Returns:
+        DataFrame[JaoData]: the selected data
+    """
+    if cnec_filter is not None:
+        mask = np.ones(len(frame), dtype=bool)
+        if cnec_filter.cnec_names is not None:
+            mask &= frame[JaoData.cnecName].isin(cnec_filter.cnec_names).to_numpy()
+        if cnec_filter.cnec_ids is not None:
+            mask &= frame.index.get_level_values(JaoData.cnec_id).isin(cnec_filter.cnec_ids)
+        if cnec_filter.cnec_types is not None:
+            mask &= frame[JaoData.cnecType].isin(cnec_filter.cnec_types).to_numpy()
+        frame = frame.loc[mask]
+
+    if columns is not None:
+        _validate_jao_columns(columns)
+        frame = frame.loc[:, [col for col in columns if col not in (JaoData.cnec_id, JaoData.time)]]
+    return frame  # type: ignore
+
+
 def try_jao_cache_before_async(
-    from_time: timedata, to_time: timedata
+    from_time: timedata,
+    to_time: timedata,
+    columns: list[str] | None = None,
+    cnec_filter: CnecFilter | None = None,
+    compact: bool = False,
 ) -> tuple[DataFrame[JaoData] | None, list[datetime]]:
     if not isinstance(from_time, datetime):
         dt_from_time = datetime(from_time.year, from_time.month, from_time.day)
@@ -161,65 +403,73 @@ def try_jao_cache_before_async(
         time_range.append(loop_time)
         loop_time += pd.Timedelta(hours=1)
 
-    connection = duckdb.connect(str(DB_PATH), read_only=True)
     try:
-        cached_data = (
-            connection.sql(
-                (
-                    "SELECT * FROM JAO WHERE time BETWEEN"
-                    f" TIMESTAMPTZ '{from_time.isoformat()}'"
-                    f"AND TIMESTAMPTZ '{(to_time + pd.Timedelta(1, unit='minutes')).isoformat()}'"
-                )
-            )
-            .df()
-            .drop("ROW_KEY", axis=1)
-        )
+        with CACHE_DB.cursor() as connection:
+            cached_hours = get_cached_hours("JAO", "", from_time, to_time, connection)
+            if cached_hours.empty:
+                return None, time_range
+
+            query, parameters = _make_jao_cache_query(from_time, to_time, columns, cnec_filter)
+            cached_result = connection.execute(query, parameters)
+            cached_data = _dictionary_encoded_frame(cached_result.arrow()) if compact else cached_result.df()
     except duckdb.CatalogException:
         return None, time_range
-    connection.close()
 
+    subset_time = [loop_time for loop_time in time_range if loop_time not in cached_hours]
     if cached_data.empty:
-        return None, time_range
+        return None, subset_time
     else:
         cached_data = formatting_cache_to_retval(cached_data)
-        unique_hours: Iterable[datetime] = cached_data.index.get_level_values(JaoData.time).unique().to_pydatetime()
-        subset_time = [loop_time for loop_time in time_range if loop_time not in unique_hours]
-
         return cached_data, subset_time
 
 
+def _dictionary_encoded_frame(table: pyarrow.Table) -> pd.DataFrame:
+    # strings are encoded in arrow, so pandas gets categoricals without building a python string per row
+    for position, field in enumerate(table.schema):
+        if pyarrow.types.is_string(field.type) or pyarrow.types.is_large_string(field.type):
+            table = table.set_column(position, field.name, pyarrow.compute.dictionary_encode(table.column(position)))
+    return table.to_pandas()
+
+
 def formatting_cache_to_retval(cached_data: pd.DataFrame) -> pd.DataFrame:
-    try:
-        cached_data[JaoData.time] = cached_data[JaoData.time].astype(pd.DatetimeTZDtype("ns", "UTC"))
-    except AmbiguousTimeError:
-        cached_data = correct_for_dst(cached_data)
+    cached_data[JaoData.time] = convert_series_to_utc(cached_data[JaoData.time])
     cached_data[JaoData.cnec_id] = cached_data[JaoData.cnec_id].astype(pd.StringDtype())
-    cached_data[JaoData.dateTimeUtc] = cached_data[JaoData.dateTimeUtc].astype(pd.DatetimeTZDtype("ns", "UTC"))
-    cached_data[JaoData.contingencies] = cached_data[JaoData.contingencies].astype(pd.StringDtype())
+    if JaoData.dateTimeUtc in cached_data.columns:
+        cached_data[JaoData.dateTimeUtc] = convert_series_to_utc(cached_data[JaoData.dateTimeUtc])
+    if JaoData.contingencies in cached_data.columns and cached_data[JaoData.contingencies].dtype == object:
+        cached_data[JaoData.contingencies] = cached_data[JaoData.contingencies].astype(pd.StringDtype())
     cached_data = cached_data.set_index([JaoData.cnec_id, JaoData.time])
     cached_data = cached_data.sort_index(level=JaoData.time)
     return cached_data
 
 
-def correct_for_dst(frame: pd.DataFrame):
-    new_time_for_cnec: dict[Hashable, pd.Series] = {}
-    for cnec_id, subframe in frame.groupby(JaoData.cnec_id):
-        new_time_for_cnec[cnec_id] = subframe[JaoData.time].astype(pd.DatetimeTZDtype("ns", "UTC"))
-
-    for cnec_id, data in new_time_for_cnec.items():
-        frame.loc[frame[JaoData.cnec_id] == cnec_id, JaoData.time] = data
-
-    frame[JaoData.time] = frame[JaoData.time].astype(pd.DatetimeTZDtype("ns", "UTC"))
-    return frame
-
-
-def fetch_jao_dataframe_timeseries(from_time: timedata, to_time: timedata) -> DataFrame[JaoData] | None:
+def fetch_jao_dataframe_timeseries(
+    from_time: timedata,
+    to_time: timedata,
+    max_concurrent_windows: int = DEFAULT_MAX_CONCURRENT_WINDOWS,
+    window_hours: int = DEFAULT_WINDOW_HOURS,
+    columns: list[str] | None = None,
+    cnec_filter: CnecFilter | None = None,
+    compact: bool = False,
+) -> DataFrame[JaoData] | DataFrame[CompactJaoData] | None:
     """Reads JAO data from the API and returns the corresponding frame.
     Pulls data from cache in the `write_path`
 
+    The column projection and the CNEC filter are pushed down into the cache query,
+    so only the selected part of the cached data is read. Data fetched from the API is filtered in memory.
+
     Args:
         from_time (timedata): from when to pull data
         to_time (timedata): to when to pull data
+        max_concurrent_windows (int, optional): max number of windows fetched from the API at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_WINDOWS.
+        window_hours (int, optional): max number of hours requested from the API in one query.
+            Larger windows cut the request overhead for backfills. Defaults to DEFAULT_WINDOW_HOURS.
+        columns (list[str] | None, optional): JAO columns to return, the index is always returned.
+            Defaults to None, which returns all columns.
+        cnec_filter (CnecFilter | None, optional): filter on CNEC names, ids or types. Defaults to None.
+        compact (bool, optional): return the compact representation of `CompactJaoData`, see `make_compact_jao_frame`.
+            Without `columns`, all columns but `contingencies` are returned. Defaults to False.
         write_path (Path | None, optional): Path to use for data caching. Defaults to None,
             and uses `~/.linearisation_error`.
 
@@ -235,27 +485,142 @@ def fetch_jao_dataframe_timeseries(from_time: timedata, to_time: timedata) -> Da
     from_time_pd = convert_date_to_utc_pandas(from_time)
     to_time_pd = convert_date_to_utc_pandas(to_time)
 
+    if compact and columns is None:
+        columns = [column for column in JAO_COLUMNS if column != JaoData.contingencies]
+
     all_results = None
-    cached_results, timestamps_not_in_cache = try_jao_cache_before_async(from_time_pd, to_time_pd)
+    cached_results, timestamps_not_in_cache = try_jao_cache_before_async(
+        from_time_pd, to_time_pd, columns, cnec_filter, compact
+    )
+
+    if len(timestamps_not_in_cache) > 0 and CACHE_DB.read_only:
+        logger.warning(f"JAO: {len(timestamps_not_in_cache)} hours are not in the read only cache")
+        timestamps_not_in_cache = []
 
     if len(timestamps_not_in_cache) > 0:
         logger.info(f"JAO: Hit cache - but need extra data from {len(timestamps_not_in_cache)}")
-        try:
-            all_results = asyncio.run(_fetch_jao_dataframe_timeseries(timestamps_not_in_cache))
-        except RuntimeError:
-            loop = asyncio.get_event_loop()
-            all_results = asyncio.run_coroutine_threadsafe(
-                _fetch_jao_dataframe_timeseries(timestamps_not_in_cache), loop
-            ).result()
+        all_results = _run_jao_fetch(timestamps_not_in_cache, max_concurrent_windows, window_hours)
     elif cached_results is not None:
         logger.info("JAO: Full Cache Hit")
-        return cached_results
+        return make_compact_jao_frame(cached_results) if compact else cached_results
+
+    if all_results is not None:
+        all_results = select_from_jao_frame(all_results, columns, cnec_filter)
 
     if cached_results is not None and all_results is not None:
         return_frame = pd.concat([cached_results, all_results]).sort_index()
-        return return_frame  # type: ignore
     elif all_results is not None:
-        return all_results.sort_index()  # type: ignore
+        return_frame = all_results.sort_index()
+    else:
+        return None
+    return make_compact_jao_frame(return_frame) if compact else return_frame  # type: ignore
+
+
+def make_compact_jao_frame(frame: pd.DataFrame) -> DataFrame[CompactJaoData]:
+    """Converts JAO data to the compact representation validated by `CompactJaoData`:
+    text columns are dictionary encoded as categoricals and floats are stored as float32,
+    which is the precision of the cache. Only the columns in `frame` are validated.
+
+    Args:
+        frame (pd.DataFrame): data from JAO, indexed by cnec_id and time
+
+    Returns:
+        DataFrame[CompactJaoData]: the compact frame
+    """
+    dtypes: dict[str, str | type] = {column: np.float32 for column in frame.select_dtypes("floating").columns}
+    for column in frame.select_dtypes(["object", "string"]).columns:
+        # columns of unhashable payloads, i.e. nested JSON, are left as they are
+        with suppress(TypeError):
+            pd.unique(frame[column])
+            dtypes[column] = "category"
+
+    schema = CompactJaoData.to_schema()
+    schema = schema.remove_columns([column for column in schema.columns if column not in frame.columns])
+    compact_frame: DataFrame[CompactJaoData] = schema.validate(frame.astype(dtypes))  # type: ignore
+    return compact_frame
+
+
+def _run_jao_fetch(
+    time_points: list[datetime], max_concurrent_windows: int, window_hours: int
+) -> DataFrame[JaoData] | None:
+    try:
+        return asyncio.run(_fetch_jao_dataframe_timeseries(time_points, max_concurrent_windows, window_hours))
+    except RuntimeError:
+        loop = asyncio.get_event_loop()
+        return asyncio.run_coroutine_threadsafe(
+            _fetch_jao_dataframe_timeseries(time_points, max_concurrent_windows, window_hours), loop
+        ).result()
+
+
+def cache_jao_data(
+    from_time: timedata,
+    to_time: timedata,
+    max_concurrent_windows: int = DEFAULT_MAX_CONCURRENT_WINDOWS,
+    window_hours: int = DEFAULT_WINDOW_HOURS,
+):
+    """Makes sure the JAO data from `from_time` to `to_time` is cached, fetching only the hours
+    that are not, without reading the cached data.
+
+    Args:
+        from_time (timedata): from when to cache data
+        to_time (timedata): to when to cache data, exclusive
+        max_concurrent_windows (int, optional): max number of windows fetched from the API at the same time.
+            Defaults to DEFAULT_MAX_CONCURRENT_WINDOWS.
+        window_hours (int, optional): max number of hours requested from the API in one query.
+            Defaults to DEFAULT_WINDOW_HOURS.
+    """
+    if CACHE_DB.read_only:
+        return
+
+    from_time_pd = convert_date_to_utc_pandas(from_time)
+    to_time_pd = convert_date_to_utc_pandas(to_time)
+
+    with CACHE_DB.cursor() as connection:
+        missing_intervals = get_missing_intervals("JAO", "", from_time_pd, to_time_pd, connection)
+
+    missing_hours = [
+        hour.to_pydatetime()
+        for interval_start, interval_end in missing_intervals
+        for hour in pd.date_range(interval_start, interval_end, freq="h", inclusive="left")
+    ]
+    if missing_hours:
+        logging.getLogger().info(f"JAO: caching {len(missing_hours)} missing hours")
+        _run_jao_fetch(missing_hours, max_concurrent_windows, window_hours)
+
+
+def update_ptdf_store(
+    from_time: timedata,
+    to_time: timedata,
+    chunk_size: pd.Timedelta = DEFAULT_PTDF_BACKFILL_CHUNK_SIZE,
+):
+    """Copies the cached JAO hours from `from_time` to `to_time` that are not in the PTDF store into it,
+    see `PtdfStore`. Hours fetched from the API are added to the store as they are cached, so this only
+    backfills hours that were cached before the store existed. Nothing is fetched from the API, and the
+    cache is read `chunk_size` at a time.
+
+    Args:
+        from_time (timedata): from when to store data
+        to_time (timedata): to when to store data, exclusive
+        chunk_size (pd.Timedelta, optional): max length of the cache reads.
+            Defaults to DEFAULT_PTDF_BACKFILL_CHUNK_SIZE.
+    """
+    if CACHE_DB.read_only:
+        return
+
+    from_time_pd = convert_date_to_utc_pandas(from_time)
+    to_time_pd = convert_date_to_utc_pandas(to_time)
+
+    with CACHE_DB.cursor() as connection:
+        cached_hours = get_cached_hours("JAO", "", from_time_pd, to_time_pd, connection)
+
+    for interval_start, interval_end in hours_to_intervals(cached_hours.difference(PTDF_STORE.times)):
+        for chunk_start, chunk_end in split_period(interval_start, interval_end, chunk_size):
+            cached_data, _ = try_jao_cache_before_async(chunk_start, chunk_end, PTDF_STORE_FIELDS)
+            if cached_data is None:
+                continue
+            # the cache read includes the `chunk_end` hour, which belongs to the next chunk
+            cached_data = cached_data.loc[cached_data.index.get_level_values(JaoData.time) < chunk_end]
+            PTDF_STORE.append(cached_data)  # type: ignore
 
 
 """
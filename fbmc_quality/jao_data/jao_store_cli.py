@@ -3,7 +3,7 @@ from datetime import datetime, timedelta
 import typer
 from pytz import timezone
 
-from fbmc_quality.jao_data.fetch_jao_data import fetch_jao_dataframe_timeseries
+from fbmc_quality.jao_data.fetch_jao_data import DEFAULT_MAX_CONCURRENT_WINDOWS, fetch_jao_dataframe_timeseries
 
 app = typer.Typer()
 
@@ -12,6 +12,10 @@ app = typer.Typer()
 def main(
     from_date: datetime = typer.Argument(..., help="From date (required) - will be converted to date"),
     to_date: datetime = typer.Argument(..., help="To date (required) - will be converted to date"),
+    max_concurrent_windows: int = typer.Option(
+        DEFAULT_MAX_CONCURRENT_WINDOWS, help="Max number of time windows fetched from JAO at the same time"
+    ),
+    window_hours: int = typer.Option(24, help="Max number of hours requested from JAO in a single query"),
 ):
     # Check if the folder path is provided, use default if not
 
@@ -27,7 +31,7 @@ def main(
     current = from_date
 
     while current < to_date:
-        _ = fetch_jao_dataframe_timeseries(current, current + delta)
+        _ = fetch_jao_dataframe_timeseries(current, current + delta, max_concurrent_windows, window_hours)
         typer.echo(f"Stored data for {current}")
         current += delta
 
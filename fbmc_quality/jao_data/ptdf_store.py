@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+from pandera.typing import DataFrame
+
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+from fbmc_quality.dataframe_schemas.schemas import BiddingZones, JaoData
+
+PTDF_STORE_FIELDS: list[str] = list(BiddingZones.to_schema().columns.keys()) + [
+    JaoData.fall,
+    JaoData.fref,
+    JaoData.fmax,
+    JaoData.ram,
+    JaoData.maxFlow,
+]
+PTDF_STORE_DTYPE = np.float32
+
+
+class PtdfBlock(NamedTuple):
+    """Dense block of JAO values laid out time x CNEC x field, NaN where a CNEC is missing at a time"""
+
+    times: pd.DatetimeIndex
+    cnec_ids: pd.Index
+    fields: list[str]
+    values: np.ndarray
+
+
+class _PtdfSegment(NamedTuple):
+    name: str
+    times: pd.DatetimeIndex
+    cnec_ids: pd.Index
+
+
+def pack_jao_data(
+    jao_data: DataFrame[JaoData], fields: list[str] = PTDF_STORE_FIELDS, dtype: np.dtype | type = PTDF_STORE_DTYPE
+) -> PtdfBlock:
+    """Packs the `fields` of every CNEC in `jao_data` into a dense time x CNEC x field block.
+    Fields that are not in `jao_data` are NaN.
+
+    Args:
+        jao_data (DataFrame[JaoData]): data from JAO, indexed by cnec_id and time
+        fields (list[str], optional): columns to pack. Defaults to PTDF_STORE_FIELDS.
+        dtype (np.dtype | type, optional): dtype of the block. Defaults to PTDF_STORE_DTYPE.
+
+    Returns:
+        PtdfBlock: the packed data, with sorted times and cnec ids
+    """
+    time_codes, times = pd.factorize(jao_data.index.get_level_values(JaoData.time), sort=True)
+    cnec_codes, cnec_ids = pd.factorize(jao_data.index.get_level_values(JaoData.cnec_id), sort=True)
+
+    values = np.full((len(times), len(cnec_ids), len(fields)), np.nan, dtype=dtype)
+    present_fields = [field for field in fields if field in jao_data.columns]
+    field_positions = [fields.index(field) for field in present_fields]
+    values[time_codes[:, None], cnec_codes[:, None], field_positions] = jao_data[present_fields].to_numpy(
+        dtype=dtype, na_value=np.nan
+    )
+    return PtdfBlock(
+        pd.DatetimeIndex(times, name=JaoData.time).tz_convert("UTC"),
+        pd.Index(cnec_ids, name=JaoData.cnec_id),
+        fields,
+        values,
+    )
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    # an exclusive lock between processes, held while the store is changed
+    with open(path, "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class PtdfStore:
+    """On-disk store of the zone PTDFs, `fall`, `fref`, `fmax`, `ram` and `maxFlow` of every CNEC,
+    laid out time x CNEC x field and read through memory maps.
+
+    The store is a folder of segments, each one a `.npy` block with side-car indices of its times and cnec ids,
+    listed in a `manifest.json`. Appending writes a new segment for the hours that are not stored yet,
+    under a lock on the folder, so several processes can append to the same store.
+    Opening the store only reads the side-car indices, the blocks are mapped when a read touches them.
+    The manifest is read again when it changes, so a store sees the segments appended by other processes.
+
+    Args:
+        path (str | Path | None, optional): folder of the store. Defaults to None,
+            which places it next to the cache database as `<cache name>.ptdfs`.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self._configured_path = path
+        self._segments: list[_PtdfSegment] | None = None
+        self._segments_path: Path | None = None
+        self._manifest_version: tuple[int, int] | None = None
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> Path:
+        if self._configured_path is not None:
+            return Path(self._configured_path)
+        return CACHE_DB.path.with_suffix(".ptdfs")
+
+    @property
+    def fields(self) -> list[str]:
+        return PTDF_STORE_FIELDS
+
+    def _manifest_path(self) -> Path:
+        return self.path / "manifest.json"
+
+    def _get_manifest_version(self) -> tuple[int, int] | None:
+        # the manifest is replaced on every append, so another file or mtime means the segments changed
+        try:
+            manifest_stat = self._manifest_path().stat()
+        except FileNotFoundError:
+            return None
+        return manifest_stat.st_ino, manifest_stat.st_mtime_ns
+
+    def _get_segments(self, reload: bool = False) -> list[_PtdfSegment]:
+        with self._lock:
+            manifest_version = self._get_manifest_version()
+            is_stale = self._segments_path != self.path or manifest_version != self._manifest_version
+            if reload or self._segments is None or is_stale:
+                self._segments_path = self.path
+                self._manifest_version = manifest_version
+                segments = {segment.name: segment for segment in self._segments or []}
+                self._segments = []
+                if self._manifest_path().exists():
+                    manifest = json.loads(self._manifest_path().read_text())
+                    if manifest["fields"] != PTDF_STORE_FIELDS:
+                        raise ValueError(f"PTDF store at {self.path} has fields {manifest['fields']}")
+                    self._segments = [
+                        segments[name] if name in segments else self._load_segment(name)
+                        for name in manifest["segments"]
+                    ]
+            return self._segments
+
+    def _load_segment(self, name: str) -> _PtdfSegment:
+        times = pd.DatetimeIndex(np.load(self.path / f"{name}_times.npy"), name=JaoData.time).tz_localize("UTC")
+        cnec_ids = pd.Index(np.load(self.path / f"{name}_cnec_ids.npy").astype(object), name=JaoData.cnec_id)
+        return _PtdfSegment(name, times, cnec_ids)
+
+    def _load_values(self, segment: _PtdfSegment) -> np.ndarray:
+        return np.load(self.path / f"{segment.name}.npy", mmap_mode="r")
+
+    @property
+    def times(self) -> pd.DatetimeIndex:
+        """Sorted UTC hours in the store"""
+        segment_times = [segment.times for segment in self._get_segments()]
+        if not segment_times:
+            return pd.DatetimeIndex([], tz="UTC", name=JaoData.time)
+        return segment_times[0].append(segment_times[1:]).sort_values()
+
+    def append(self, jao_data: DataFrame[JaoData]):
+        """Adds the hours of `jao_data` that are not in the store yet as a new segment.
+        The manifest is read again under the lock first, so hours appended by another process are not stored twice.
+
+        Args:
+            jao_data (DataFrame[JaoData]): data from JAO, indexed by cnec_id and time
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock, _file_lock(self.path / "store.lock"):
+            segments = self._get_segments(reload=True)
+            is_new = ~jao_data.index.get_level_values(JaoData.time).isin(self.times)
+            if not is_new.any():
+                return
+
+            block = pack_jao_data(jao_data.loc[is_new])
+            # unique names, segments are never overwritten
+            name = f"segment_{block.times[0]:%Y%m%dT%H}_{uuid.uuid4().hex[:12]}"
+
+            values = np.lib.format.open_memmap(
+                self.path / f"{name}.npy", mode="w+", dtype=PTDF_STORE_DTYPE, shape=block.values.shape
+            )
+            values[:] = block.values
+            values.flush()
+            del values
+            np.save(self.path / f"{name}_times.npy", block.times.tz_convert("UTC").tz_localize(None).to_numpy())
+            np.save(self.path / f"{name}_cnec_ids.npy", block.cnec_ids.to_numpy(dtype=str))
+
+            # the manifest is replaced last, so a segment is only visible once all its files are written
+            manifest_tmp = self.path / f"manifest.json.{name}.tmp"
+            manifest_tmp.write_text(
+                json.dumps({"fields": PTDF_STORE_FIELDS, "segments": [segment.name for segment in segments] + [name]})
+            )
+            os.replace(manifest_tmp, self._manifest_path())
+            segments.append(_PtdfSegment(name, block.times, block.cnec_ids))
+            self._manifest_version = self._get_manifest_version()
+
+    def read_segments(
+        self, start: pd.Timestamp, end: pd.Timestamp, cnec_ids: list[str] | pd.Index | None = None
+    ) -> list[PtdfBlock]:
+        """Reads the stored hours in `[start, end)` as one block per segment that overlaps the range.
+        Without `cnec_ids`, the values of a block are a read only view of the memory mapped segment,
+        so nothing is read from disk until the values are used. With `cnec_ids`, only the overlapping
+        hours of the selected CNECs are copied out of each segment.
+
+        Args:
+            start (pd.Timestamp): tz-aware start of the range
+            end (pd.Timestamp): tz-aware end of the range, exclusive
+            cnec_ids (list[str] | pd.Index | None, optional): CNECs to read. Defaults to None, which reads all CNECs.
+
+        Returns:
+            list[PtdfBlock]: blocks of the segments, each with sorted times and the CNECs of the segment
+        """
+        blocks = []
+        for segment in self._get_segments():
+            # the times of a segment are sorted, so the hours of the range are one slice of it
+            first, last = segment.times.searchsorted(start), segment.times.searchsorted(end)
+            if first == last:
+                continue
+
+            values = self._load_values(segment)[first:last]
+            segment_ids = segment.cnec_ids
+            if cnec_ids is not None:
+                is_selected = segment_ids.isin(cnec_ids)
+                values = values[:, is_selected]
+                segment_ids = segment_ids[is_selected]
+            blocks.append(PtdfBlock(segment.times[first:last], segment_ids, PTDF_STORE_FIELDS, values))
+        return blocks
+
+    def read(self, start: pd.Timestamp, end: pd.Timestamp, cnec_ids: list[str] | pd.Index | None = None) -> PtdfBlock:
+        """Reads the stored hours in `[start, end)` into one dense block, see `read_segments`.
+        A range within one segment is returned as a view of the segment, other ranges are copied once
+        from the segment views into the block. Use `read_segments` to keep the memory to the slices touched.
+
+        Args:
+            start (pd.Timestamp): tz-aware start of the range
+            end (pd.Timestamp): tz-aware end of the range, exclusive
+            cnec_ids (list[str] | pd.Index | None, optional): CNECs to read. Defaults to None, which reads all CNECs.
+
+        Returns:
+            PtdfBlock: values of the range, with sorted times and cnec ids
+        """
+        blocks = self.read_segments(start, end, cnec_ids)
+        if cnec_ids is None:
+            all_ids = pd.Index([], dtype=object).append([block.cnec_ids for block in blocks])
+            cnec_ids = all_ids.unique().sort_values()
+        cnec_index = pd.Index(cnec_ids, name=JaoData.cnec_id)
+        if len(blocks) == 1 and blocks[0].cnec_ids.equals(cnec_index):
+            return blocks[0]._replace(cnec_ids=cnec_index)
+
+        times = pd.DatetimeIndex([], tz="UTC", name=JaoData.time).append([block.times for block in blocks])
+        times = times.sort_values()
+        values = np.full((len(times), len(cnec_index), len(PTDF_STORE_FIELDS)), np.nan, dtype=PTDF_STORE_DTYPE)
+        for block in blocks:
+            rows = times.get_indexer(block.times)
+            values[rows[:, None], cnec_index.get_indexer(block.cnec_ids)] = block.values
+        return PtdfBlock(times, cnec_index, PTDF_STORE_FIELDS, values)
+
+
+PTDF_STORE = PtdfStore()
@@ -1,12 +1,52 @@
 from fbmc_quality.linearisation_analysis.compute_functions import (
+    cnec_tensor_from_block,
+    compute_cnec_scores,
+    compute_cnec_vulnerabilities_to_err,
     compute_cnec_vulnerability_to_err,
     compute_linearisation_error,
+    compute_linearisation_errors,
     compute_linearised_flow,
+    compute_linearised_flows,
+    make_cnec_tensor,
+    read_cnec_tensor,
+    scan_cnec_vulnerabilities,
+)
+from fbmc_quality.linearisation_analysis.dataclasses import (
+    CnecDataAndNPS,
+    CnecScores,
+    CnecTensor,
+    JaoDataAndNPS,
+    LazyCnecScores,
+    LazyJaoDataAndNPS,
+    PlotData,
+    VulnerabilityScan,
+)
+from fbmc_quality.linearisation_analysis.parallel import cache_analysis_inputs, run_sharded_cnec_statistics
+from fbmc_quality.linearisation_analysis.polars_backend import (
+    collect_cnec_scores,
+    collect_vulnerability_scan,
+    lazy_basecase_net_positions,
+    lazy_cnec_flows,
+    lazy_cnec_ids,
+    lazy_cnec_scores,
+    lazy_jao_frame,
+    lazy_linearisation_errors,
+    lazy_linearised_flows,
+    lazy_net_positions,
+    lazy_vulnerability_summary,
+    read_jao_cache,
+    scan_analysis_inputs,
+    scan_net_positions,
 )
-from fbmc_quality.linearisation_analysis.dataclasses import CnecDataAndNPS, JaoDataAndNPS, PlotData
 from fbmc_quality.linearisation_analysis.process_data import (
     align_by_index_overlap,
     fetch_jao_data_basecase_nps_and_observed_nps,
     load_data_for_corridor_cnec,
     load_data_for_internal_cnec,
 )
+from fbmc_quality.linearisation_analysis.streaming import (
+    CnecStatistics,
+    compute_cnec_statistics,
+    split_period,
+    stream_cnec_scores,
+)
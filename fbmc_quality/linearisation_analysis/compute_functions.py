@@ -4,8 +4,13 @@ import numpy as np
 import pandas as pd
 from pandera.typing import DataFrame
 
-from fbmc_quality.dataframe_schemas import CnecData, JaoData, NetPosition
+from fbmc_quality.dataframe_schemas import BiddingZones, CnecData, JaoData, NetPosition
+from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
 from fbmc_quality.entsoe_data.fetch_entsoe_data import resample_to_hour_and_replace
+from fbmc_quality.jao_data.analyse_jao_data import CnecIndex
+from fbmc_quality.jao_data.fetch_jao_data import cache_jao_data, timedata, update_ptdf_store
+from fbmc_quality.jao_data.ptdf_store import PTDF_STORE, PtdfBlock, PtdfStore
+from fbmc_quality.linearisation_analysis.dataclasses import CnecScores, CnecTensor, VulnerabilityScan
 
 
 def compute_linearised_flow(
@@ -92,3 +97,294 @@ def compute_cnec_vulnerability_to_err(
         }
     )
     return return_frame
+
+
+def make_cnec_tensor(jao_data: DataFrame[JaoData], dtype: np.dtype | type = np.float64) -> CnecTensor:
+    """Packs the PTDFs of every CNEC in `jao_data` into a dense time x CNEC x zone array,
+    and `fall`, `fref`, `fmax`, `maxFlow` and `ram` into time x CNEC arrays.
+
+    Args:
+        jao_data (DataFrame[JaoData]): data from JAO, indexed by cnec_id and time
+        dtype (np.dtype | type, optional): dtype of the arrays. Defaults to np.float64.
+
+    Returns:
+        CnecTensor: the packed data
+    """
+    time_codes, times = pd.factorize(jao_data.index.get_level_values(JaoData.time), sort=True)
+    cnec_codes, cnec_ids = pd.factorize(jao_data.index.get_level_values(JaoData.cnec_id), sort=True)
+    zones = [zone for zone in BiddingZones.to_schema().columns.keys() if zone in jao_data.columns]
+    shape = (len(times), len(cnec_ids))
+
+    ptdfs = np.zeros(shape + (len(zones),), dtype=dtype)
+    ptdfs[time_codes, cnec_codes, :] = np.nan_to_num(jao_data[zones].to_numpy(dtype=dtype, na_value=np.nan))
+
+    def pack(column: str) -> np.ndarray:
+        packed = np.full(shape, np.nan, dtype=dtype)
+        packed[time_codes, cnec_codes] = jao_data[column].to_numpy(dtype=dtype, na_value=np.nan)
+        return packed
+
+    return CnecTensor(
+        pd.DatetimeIndex(times, name=JaoData.time),
+        pd.Index(cnec_ids, name=JaoData.cnec_id),
+        zones,
+        ptdfs,
+        pack(JaoData.fall),
+        pack(JaoData.fref),
+        pack(JaoData.fmax),
+        pack(JaoData.maxFlow),
+        pack(JaoData.ram) if JaoData.ram in jao_data.columns else None,
+    )
+
+
+def cnec_tensor_from_block(ptdf_block: PtdfBlock) -> CnecTensor:
+    """Splits a block read from the PTDF store into a `CnecTensor`, without copying the non-PTDF fields
+
+    Args:
+        ptdf_block (PtdfBlock): block read with `PtdfStore.read`
+
+    Returns:
+        CnecTensor: the data of the block
+    """
+    zones = [zone for zone in BiddingZones.to_schema().columns.keys() if zone in ptdf_block.fields]
+    zone_positions = [ptdf_block.fields.index(zone) for zone in zones]
+
+    def field(column: str) -> np.ndarray:
+        return ptdf_block.values[:, :, ptdf_block.fields.index(column)]
+
+    return CnecTensor(
+        ptdf_block.times,
+        ptdf_block.cnec_ids,
+        zones,
+        np.nan_to_num(ptdf_block.values[:, :, zone_positions]),
+        field(JaoData.fall),
+        field(JaoData.fref),
+        field(JaoData.fmax),
+        field(JaoData.maxFlow),
+        field(JaoData.ram),
+    )
+
+
+def read_cnec_tensor(
+    from_time: timedata,
+    to_time: timedata,
+    cnec_ids: list[str] | pd.Index | None = None,
+    ptdf_store: PtdfStore = PTDF_STORE,
+) -> CnecTensor:
+    """Reads the data of all CNECs from `from_time` to `to_time` from the memory mapped PTDF store.
+    Reading from PTDF_STORE caches the missing JAO hours first, which adds them to the store,
+    and backfills the store with cached hours it does not have, see `update_ptdf_store`.
+
+    Args:
+        from_time (timedata): from when to read data
+        to_time (timedata): to when to read data, exclusive
+        cnec_ids (list[str] | pd.Index | None, optional): CNECs to read. Defaults to None, which reads all CNECs.
+        ptdf_store (PtdfStore, optional): store to read from. Defaults to PTDF_STORE, next to the cache database.
+
+    Returns:
+        CnecTensor: float32 arrays of the data
+    """
+    from_time_pd = convert_date_to_utc_pandas(from_time)
+    to_time_pd = convert_date_to_utc_pandas(to_time)
+    if ptdf_store is PTDF_STORE:
+        cache_jao_data(from_time_pd, to_time_pd)
+        update_ptdf_store(from_time_pd, to_time_pd)
+    return cnec_tensor_from_block(ptdf_store.read(from_time_pd, to_time_pd, cnec_ids))
+
+
+def _align_to_tensor(frame: pd.DataFrame, cnec_tensor: CnecTensor, columns: list | pd.Index) -> np.ndarray:
+    return frame.reindex(index=cnec_tensor.times, columns=columns).to_numpy(
+        dtype=cnec_tensor.fall.dtype, na_value=np.nan
+    )
+
+
+def compute_linearised_flows(cnec_tensor: CnecTensor, target_net_positions: DataFrame[NetPosition]) -> pd.DataFrame:
+    """Computes the FBMC linearised flow of every CNEC in one contraction, as `compute_linearised_flow` does per CNEC.
+    Zones without a net position do not contribute to the flow.
+
+    Args:
+        cnec_tensor (CnecTensor): packed PTDFs and y axis offsets, see `make_cnec_tensor`
+        target_net_positions (DataFrame[NetPosition]): Net positions to use as targets for computing the flow
+
+    Returns:
+        pd.DataFrame: linearised flow, with time as index and one column per cnec_id
+    """
+    net_positions = np.nan_to_num(_align_to_tensor(target_net_positions, cnec_tensor, cnec_tensor.zones))
+    linearised_flows = np.einsum("tcz,tz->tc", cnec_tensor.ptdfs, net_positions) + cnec_tensor.fall
+    return pd.DataFrame(linearised_flows, index=cnec_tensor.times, columns=cnec_tensor.cnec_ids)
+
+
+def compute_linearisation_errors(
+    cnec_tensor: CnecTensor, target_net_positions: DataFrame[NetPosition], target_flows: pd.DataFrame
+) -> pd.DataFrame:
+    """Computes the linearisation error of every CNEC at once, as `compute_linearisation_error` does per CNEC,
+    with `target_flow - linear_flow` and the linear flow capped by `maxFlow`
+
+    Args:
+        cnec_tensor (CnecTensor): packed PTDFs and y axis offsets, see `make_cnec_tensor`
+        target_net_positions (DataFrame[NetPosition]): net positions to use for the linearisation
+        target_flows (pd.DataFrame): observed flows, with time as index and one column per cnec_id
+
+    Returns:
+        pd.DataFrame: linearisation error, with time as index and one column per cnec_id
+    """
+    linear_flows = compute_linearised_flows(cnec_tensor, target_net_positions).to_numpy()
+    capped_flows = np.minimum(cnec_tensor.max_flow, linear_flows)
+    errors = _align_to_tensor(target_flows, cnec_tensor, cnec_tensor.cnec_ids) - capped_flows
+    return pd.DataFrame(errors, index=cnec_tensor.times, columns=cnec_tensor.cnec_ids)
+
+
+def compute_cnec_vulnerabilities_to_err(
+    cnec_tensor: CnecTensor,
+    target_net_positions: DataFrame[NetPosition],
+    target_flows: pd.DataFrame,
+    alt_fmax: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """Computes the vulnerability score and basecase relative margin of every CNEC at once,
+    as `compute_cnec_vulnerability_to_err` does per CNEC
+
+    Args:
+        cnec_tensor (CnecTensor): packed PTDFs and y axis offsets, see `make_cnec_tensor`
+        target_net_positions (DataFrame[NetPosition]): target net positions to linearise from
+        target_flows (pd.DataFrame): observed flows, with time as index and one column per cnec_id
+        alt_fmax (pd.DataFrame | None, optional): fmax to use instead of the one from JAO,
+            with time as index and one column per cnec_id. Defaults to None.
+
+    Returns:
+        pd.DataFrame: frame with vulnerability_score and basecase_relative_margin, indexed by cnec_id and time
+    """
+    fmax = cnec_tensor.fmax if alt_fmax is None else _align_to_tensor(alt_fmax, cnec_tensor, cnec_tensor.cnec_ids)
+    target_flow = _align_to_tensor(target_flows, cnec_tensor, cnec_tensor.cnec_ids)
+    linearisation_errors = compute_linearisation_errors(cnec_tensor, target_net_positions, target_flows).to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vulnerability_score = linearisation_errors / (fmax - target_flow)
+        basecase_relative_margin = np.abs((fmax - target_flow) / (fmax - cnec_tensor.fref))
+
+    index = pd.MultiIndex.from_product([cnec_tensor.cnec_ids, cnec_tensor.times])
+    return pd.DataFrame(
+        {
+            "vulnerability_score": vulnerability_score.T.ravel(),
+            "basecase_relative_margin": basecase_relative_margin.T.ravel(),
+        },
+        index=index,
+    )
+
+
+def compute_cnec_scores(
+    jao_data: DataFrame[JaoData],
+    target_net_positions: DataFrame[NetPosition],
+    cnec_flows: pd.DataFrame,
+) -> CnecScores:
+    """Computes the linearisation error and vulnerability score of every CNEC in `cnec_flows` in one pass,
+    see `compute_cnec_vulnerabilities_to_err`.
+    The MTUs of a CNEC are the hours where it is in `jao_data`, has a net position and an observed flow.
+
+    Args:
+        jao_data (DataFrame[JaoData]): data from JAO, indexed by cnec_id and time
+        target_net_positions (DataFrame[NetPosition]): net positions to linearise from
+        cnec_flows (pd.DataFrame): observed flows, with time as index and columns `(cnec name, "flow")`
+            and `(cnec name, "fmax")`, i.e. `pd.concat(frames, axis=1)` of one frame per CNEC
+
+    Returns:
+        CnecScores: errors and scores with time as index and one column per CNEC name, NaN outside the MTUs,
+            and the reason for every CNEC name that could not be scored
+    """
+    errors: dict[str, str] = {}
+    cnec_index = CnecIndex(jao_data)
+    names_by_id: dict[str, str] = {}
+
+    for cnec_name in cnec_flows.columns.get_level_values(0).unique():
+        fields = cnec_flows[cnec_name].columns
+        if "flow" not in fields or "fmax" not in fields:
+            errors[cnec_name] = 'The observed flows must have the columns "flow" and "fmax"'
+            continue
+        try:
+            cnec_id = cnec_index.get_id(cnec_name)
+        except ValueError as error:
+            errors[cnec_name] = str(error)
+            continue
+        if cnec_id in names_by_id:
+            errors[cnec_name] = f"Has the same cnec_id {cnec_id} as {names_by_id[cnec_id]}"
+            continue
+        names_by_id[cnec_id] = cnec_name
+
+    is_scored = jao_data.index.get_level_values(JaoData.cnec_id).isin(list(names_by_id))
+    scored_data = jao_data.loc[is_scored]
+    cnec_tensor = make_cnec_tensor(scored_data)
+    names = pd.Index([names_by_id[cnec_id] for cnec_id in cnec_tensor.cnec_ids], name="cnec")
+
+    def by_cnec_id(field: str) -> pd.DataFrame:
+        frame = cnec_flows.loc[:, [(name, field) for name in names]]
+        return frame.set_axis(cnec_tensor.cnec_ids, axis=1)
+
+    flows = by_cnec_id("flow")
+    fmax = _align_to_tensor(by_cnec_id("fmax"), cnec_tensor, cnec_tensor.cnec_ids)
+    linearisation_errors = compute_linearisation_errors(cnec_tensor, target_net_positions, flows).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vulnerability_score = linearisation_errors / (fmax - _align_to_tensor(flows, cnec_tensor, cnec_tensor.cnec_ids))
+
+    is_mtu = np.zeros(vulnerability_score.shape, dtype=bool)
+    is_mtu[
+        cnec_tensor.times.get_indexer(scored_data.index.get_level_values(JaoData.time)),
+        cnec_tensor.cnec_ids.get_indexer(scored_data.index.get_level_values(JaoData.cnec_id)),
+    ] = True
+    is_mtu &= cnec_tensor.times.isin(target_net_positions.index)[:, None]
+    is_mtu &= _align_to_tensor(flows.notna(), cnec_tensor, cnec_tensor.cnec_ids) == 1
+
+    non_redundant = scored_data[JaoData.nonRedundant].astype(float).groupby(level=JaoData.cnec_id)
+    return CnecScores(
+        pd.DataFrame(linearisation_errors, index=cnec_tensor.times, columns=names).where(is_mtu),
+        pd.DataFrame(vulnerability_score, index=cnec_tensor.times, columns=names).where(is_mtu),
+        non_redundant.sum().reindex(cnec_tensor.cnec_ids).set_axis(names),
+        non_redundant.size().reindex(cnec_tensor.cnec_ids).set_axis(names),
+        errors,
+    )
+
+
+def scan_cnec_vulnerabilities(
+    jao_data: DataFrame[JaoData],
+    target_net_positions: DataFrame[NetPosition],
+    cnec_flows: pd.DataFrame,
+    threshold: float = 1.0,
+) -> VulnerabilityScan:
+    """Summarises the vulnerability score of every CNEC in `cnec_flows` in one pass, see `compute_cnec_scores`.
+
+    The summary has, per CNEC name:
+        `mtus`: number of MTUs
+        `mtus_above_threshold`, `mtus_below_threshold`, `mtus_outside_threshold`:
+            % of MTUs with `V > threshold`, `V < -threshold` and `|V| > threshold`
+        `median_above_zero`, `median_below_zero`, `median_vulnerability`: median of `V > 0`, `V < 0` and all `V`
+        `non_redundant_share`: share of the hours of the CNEC in `jao_data` where it is non redundant
+
+    Args:
+        jao_data (DataFrame[JaoData]): data from JAO, indexed by cnec_id and time
+        target_net_positions (DataFrame[NetPosition]): net positions to linearise from
+        cnec_flows (pd.DataFrame): observed flows, with time as index and columns `(cnec name, "flow")`
+            and `(cnec name, "fmax")`, i.e. `pd.concat(frames, axis=1)` of one frame per CNEC
+        threshold (float, optional): vulnerability score counted as critical. Defaults to 1.0.
+
+    Returns:
+        VulnerabilityScan: the summary, and the reason for every CNEC name that could not be scanned
+    """
+    cnec_scores = compute_cnec_scores(jao_data, target_net_positions, cnec_flows)
+    errors = cnec_scores.errors
+    scores = cnec_scores.vulnerability_scores
+    mtus = scores.notna().sum()
+
+    summary = pd.DataFrame(
+        {
+            "mtus": mtus,
+            "mtus_above_threshold": 100 * (scores > threshold).sum() / mtus,
+            "mtus_below_threshold": 100 * (scores < -threshold).sum() / mtus,
+            "mtus_outside_threshold": 100 * (scores.abs() > threshold).sum() / mtus,
+            "median_above_zero": scores.where(scores > 0).median(),
+            "median_below_zero": scores.where(scores < 0).median(),
+            "median_vulnerability": scores.median(),
+            "non_redundant_share": cnec_scores.non_redundant_hours / cnec_scores.jao_hours,
+        }
+    )
+
+    for cnec_name in summary.index[summary["mtus"] == 0]:
+        errors[cnec_name] = "No MTUs with JAO data, net positions and observed flow"
+    summary = summary.loc[summary["mtus"] > 0]
+    return VulnerabilityScan(summary, errors)
@@ -2,6 +2,7 @@ from typing import NamedTuple
 
 import numpy as np
 import pandas as pd
+import polars as pl
 from pandera.typing import DataFrame
 
 from fbmc_quality.dataframe_schemas import CnecData, JaoData, NetPosition
@@ -15,6 +16,16 @@ class JaoDataAndNPS(NamedTuple):
     observedNPs: DataFrame[NetPosition]
 
 
+class LazyJaoDataAndNPS(NamedTuple):
+    """Dataclass containing polars LazyFrames of data from JAO and observed and basecase Net Positions,
+    see `scan_analysis_inputs`
+    """
+
+    jaoData: pl.LazyFrame
+    basecaseNPs: pl.LazyFrame
+    observedNPs: pl.LazyFrame
+
+
 class CnecDataAndNPS(NamedTuple):
     """Dataclass conaining pandas Dataframes of data from JAO and observed and basecase Net Positions,
     as well as observed flow.
@@ -29,6 +40,55 @@ class CnecDataAndNPS(NamedTuple):
     observed_flow: pd.DataFrame
 
 
+class CnecTensor(NamedTuple):
+    """Dense arrays of the data from JAO, for all CNECs at once.
+    Laid out time x CNEC (x bidding zone), with the axes labeled by `times`, `cnec_ids` and `zones`.
+    PTDFs that are missing are 0, the other arrays are NaN where a CNEC is missing at a time.
+    """
+
+    times: pd.DatetimeIndex
+    cnec_ids: pd.Index
+    zones: list[str]
+    ptdfs: np.ndarray
+    fall: np.ndarray
+    fref: np.ndarray
+    fmax: np.ndarray
+    max_flow: np.ndarray
+    ram: np.ndarray | None = None
+
+
+class CnecScores(NamedTuple):
+    """Linearisation errors and vulnerability scores of many CNECs, with time as index and one column per CNEC name,
+    NaN outside the MTUs of a CNEC. See `compute_cnec_scores`.
+    """
+
+    linearisation_errors: pd.DataFrame
+    vulnerability_scores: pd.DataFrame
+    non_redundant_hours: pd.Series
+    jao_hours: pd.Series
+    errors: dict[str, str]
+
+
+class LazyCnecScores(NamedTuple):
+    """Query plans of the scores of many CNECs, see `lazy_cnec_scores`.
+    `scores` has one row per CNEC name and MTU, `hours` the hours of every scored CNEC in the JAO data,
+    and `cnec_ids` the cnec_id or the reason it could not be scored for every CNEC name.
+    """
+
+    scores: pl.LazyFrame
+    hours: pl.LazyFrame
+    cnec_ids: pl.LazyFrame
+
+
+class VulnerabilityScan(NamedTuple):
+    """Summary of the vulnerability scores of many CNECs, see `scan_cnec_vulnerabilities`.
+    `summary` is indexed by CNEC name, `errors` maps the name of every CNEC that could not be scanned to the reason.
+    """
+
+    summary: pd.DataFrame
+    errors: dict[str, str]
+
+
 class PlotData(NamedTuple):
     """Simple container used for plotting when investigating the difference
     between basecase Net Positions and an observed state.
@@ -0,0 +1,96 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import pandas as pd
+
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
+from fbmc_quality.entsoe_data.fetch_entsoe_data import fetch_net_position_from_crossborder_flows
+from fbmc_quality.jao_data.fetch_jao_data import cache_jao_data
+from fbmc_quality.linearisation_analysis.streaming import (
+    DEFAULT_CHUNK_SIZE,
+    CnecFlowsFunction,
+    CnecStatistics,
+    compute_cnec_statistics,
+    split_period,
+)
+
+DEFAULT_SHARD_SIZE = pd.Timedelta(days=28)
+
+
+def _open_cache_read_only(path: str):
+    CACHE_DB.configure(path, read_only=True)
+
+
+def cache_analysis_inputs(start: datetime | date | pd.Timestamp, end: datetime | date | pd.Timestamp):
+    """Fetches the JAO data and the observed net positions from `start` to `end` into the cache,
+    so the analysis of the period can run from a read only cache
+
+    Args:
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+    """
+    start_pd = convert_date_to_utc_pandas(start)
+    end_pd = convert_date_to_utc_pandas(end)
+    cache_jao_data(start_pd, end_pd)
+    fetch_net_position_from_crossborder_flows(start_pd, end_pd)
+
+
+def run_sharded_cnec_statistics(
+    start: datetime | date | pd.Timestamp,
+    end: datetime | date | pd.Timestamp,
+    fetch_cnec_flows: CnecFlowsFunction,
+    cnec_names: list[str] | None = None,
+    shard_size: pd.Timedelta = DEFAULT_SHARD_SIZE,
+    chunk_size: pd.Timedelta = DEFAULT_CHUNK_SIZE,
+    threshold: float = 1.0,
+    max_workers: int | None = None,
+) -> CnecStatistics:
+    """Computes the per-CNEC statistics of `compute_cnec_statistics` from `start` to `end` in a pool of processes,
+    one time shard per task, and merges the statistics of the shards.
+
+    The inputs of the whole period are cached first, then the workers open the cache read only.
+    Workers are spawned, so `fetch_cnec_flows` must be a function that can be imported by name.
+    DuckDB does not allow the read only connections of the workers next to a read-write one, so the connection
+    of `CACHE_DB` is closed while the pool runs. `CACHE_DB` opens a new connection on its next use,
+    but cursors borrowed from it before the call can not be used after it.
+
+    Args:
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+        fetch_cnec_flows (CnecFlowsFunction): returns a frame with the columns `flow` and `fmax` per CNEC name
+        cnec_names (list[str] | None, optional): CNECs to score. Defaults to None, which scores all CNECs.
+        shard_size (pd.Timedelta, optional): length of the period handed to one worker. Defaults to DEFAULT_SHARD_SIZE.
+        chunk_size (pd.Timedelta, optional): length of a chunk loaded at once by a worker.
+            Defaults to DEFAULT_CHUNK_SIZE.
+        threshold (float, optional): vulnerability score counted as critical. Defaults to 1.0.
+        max_workers (int | None, optional): number of worker processes. Defaults to None, one per core.
+
+    Returns:
+        CnecStatistics: statistics of the whole period
+    """
+    cache_analysis_inputs(start, end)
+    shards = split_period(start, end, shard_size)
+    logging.getLogger().info(f"Analysing {len(shards)} shards from {start} to {end}")
+
+    cache_path = str(CACHE_DB.path)
+    CACHE_DB.close()
+
+    statistics = CnecStatistics(threshold)
+    with ProcessPoolExecutor(
+        max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_open_cache_read_only,
+        initargs=(cache_path,),
+    ) as pool:
+        futures = [
+            pool.submit(
+                compute_cnec_statistics, shard_start, shard_end, fetch_cnec_flows, cnec_names, chunk_size, threshold
+            )
+            for shard_start, shard_end in shards
+        ]
+        for future in as_completed(futures):
+            statistics.merge(future.result())
+    return statistics
@@ -0,0 +1,536 @@
+from datetime import date, datetime
+
+import pandas as pd
+import polars as pl
+import polars.selectors as cs
+
+from fbmc_quality.dataframe_schemas import BiddingZones, JaoData
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
+from fbmc_quality.enums.bidding_zones import BIDDING_ZONE_CNEC_MAP, BiddingZonesEnum
+from fbmc_quality.jao_data.analyse_jao_data import ALTERNATIVE_NAMES, _border_cnec_names
+from fbmc_quality.jao_data.fetch_jao_data import _make_jao_cache_query, cache_jao_data
+from fbmc_quality.linearisation_analysis.dataclasses import (
+    CnecScores,
+    LazyCnecScores,
+    LazyJaoDataAndNPS,
+    VulnerabilityScan,
+)
+from fbmc_quality.linearisation_analysis.parallel import cache_analysis_inputs
+
+CNEC = "cnec"
+TIME_DTYPE = pl.Datetime("us", "UTC")
+LAZY_JAO_COLUMNS = [
+    JaoData.cnecName,
+    JaoData.nonRedundant,
+    JaoData.fall,
+    JaoData.fref,
+    JaoData.fmax,
+    JaoData.maxFlow,
+] + list(BiddingZones.to_schema().columns.keys())
+
+
+def _normalise_frame(frame: pl.LazyFrame) -> pl.LazyFrame:
+    # pandas treats NaN as missing, polars only skips nulls, and timestamps must share a unit to be joined
+    return frame.with_columns(
+        cs.float().cast(pl.Float64).fill_nan(None),
+        cs.datetime().cast(TIME_DTYPE),
+        cs.categorical().cast(pl.Utf8),
+    )
+
+
+def _pivot_zones(frame: pl.LazyFrame, zones: list[str], value: str) -> pl.LazyFrame:
+    # a lazy pivot, one column per zone in the order of `zones`
+    return (
+        frame.group_by(JaoData.time)
+        .agg([pl.col(value).filter(pl.col("zone") == zone).max().alias(zone) for zone in zones])
+        .sort(JaoData.time)
+    )
+
+
+def lazy_jao_frame(jao_data: pd.DataFrame) -> pl.LazyFrame:
+    """Converts JAO data loaded with pandas to a LazyFrame, with `cnec_id` and `time` as columns
+
+    Args:
+        jao_data (pd.DataFrame): data from JAO, indexed by cnec_id and time
+
+    Returns:
+        pl.LazyFrame: the JAO data
+    """
+    return _normalise_frame(pl.from_pandas(jao_data.reset_index()).lazy())
+
+
+def lazy_net_positions(net_positions: pd.DataFrame) -> pl.LazyFrame:
+    """Converts net positions loaded with pandas to a LazyFrame, with `time` and one column per zone
+
+    Args:
+        net_positions (pd.DataFrame): net positions with time as index and one column per zone
+
+    Returns:
+        pl.LazyFrame: the net positions
+    """
+    frame = net_positions.rename_axis(JaoData.time).reset_index()
+    return _normalise_frame(pl.from_pandas(frame).lazy())
+
+
+def lazy_cnec_flows(cnec_flows: pd.DataFrame) -> pl.LazyFrame:
+    """Converts observed flows with the columns `(cnec name, "flow")` and `(cnec name, "fmax")`,
+    as taken by `compute_cnec_scores`, to a LazyFrame with the columns `cnec`, `time`, `flow` and `fmax`.
+    CNEC names without both columns are left out.
+
+    Args:
+        cnec_flows (pd.DataFrame): observed flows, with time as index
+
+    Returns:
+        pl.LazyFrame: the observed flows, one row per CNEC name and time
+    """
+    frames = {
+        cnec_name: cnec_flows[cnec_name][["flow", "fmax"]]
+        for cnec_name in cnec_flows.columns.get_level_values(0).unique()
+        if {"flow", "fmax"} <= set(cnec_flows[cnec_name].columns)
+    }
+    if not frames:
+        return pl.LazyFrame(schema={CNEC: pl.Utf8, JaoData.time: TIME_DTYPE, "flow": pl.Float64, "fmax": pl.Float64})
+
+    frame = pd.concat(frames, names=[CNEC, JaoData.time]).reset_index()
+    return _normalise_frame(pl.from_pandas(frame).lazy())
+
+
+def read_jao_cache(
+    from_time: datetime | date | pd.Timestamp,
+    to_time: datetime | date | pd.Timestamp,
+    columns: list[str] | None = LAZY_JAO_COLUMNS,
+    fill_cache: bool = True,
+) -> pl.LazyFrame:
+    """Reads JAO data from the cache database and wraps it as a LazyFrame, filling the cache from the JAO API
+    first where hours are missing. The columns and time range are selected in DuckDB, then the selected rows
+    are loaded into memory at once as Arrow and handed to polars without a copy.
+    Only the plans built on the frame are lazy, keep the range and `columns` to what the analysis needs.
+
+    Args:
+        from_time (datetime | date | pd.Timestamp): from when to read data
+        to_time (datetime | date | pd.Timestamp): to when to read data
+        columns (list[str] | None, optional): JAO columns to read, `cnec_id` and `time` are always read.
+            Defaults to LAZY_JAO_COLUMNS, the columns used by the analysis. None reads all columns.
+        fill_cache (bool, optional): fetch the missing hours from the JAO API first. Defaults to True.
+
+    Returns:
+        pl.LazyFrame: the JAO data, with `cnec_id` and `time` as columns
+    """
+    from_time_pd = convert_date_to_utc_pandas(from_time)
+    to_time_pd = convert_date_to_utc_pandas(to_time)
+    if fill_cache:
+        cache_jao_data(from_time_pd, to_time_pd)
+
+    query, parameters = _make_jao_cache_query(from_time_pd, to_time_pd, columns, None)
+    with CACHE_DB.cursor() as connection:
+        table = connection.execute(query, parameters).arrow()
+    return _normalise_frame(pl.from_arrow(table).lazy())  # type: ignore
+
+
+def scan_net_positions(
+    table_name: str,
+    from_time: datetime | date | pd.Timestamp,
+    to_time: datetime | date | pd.Timestamp,
+    zones: list[str] | None = None,
+) -> pl.LazyFrame:
+    """Reads a materialized net position table of the cache database into a LazyFrame,
+    with `time` and one column per zone. The rows of the range are loaded at once, the pivot is lazy.
+
+    Args:
+        table_name (str): materialized table, i.e. `ENTSOE_NET_POSITION`
+        from_time (datetime | date | pd.Timestamp): start of the range
+        to_time (datetime | date | pd.Timestamp): end of the range, exclusive
+        zones (list[str] | None, optional): zones to read. Defaults to None, which reads the zones in the table.
+
+    Returns:
+        pl.LazyFrame: the net positions, null where a zone has no value
+    """
+    from_time_pd = convert_date_to_utc_pandas(from_time)
+    to_time_pd = convert_date_to_utc_pandas(to_time)
+    with CACHE_DB.cursor() as connection:
+        table = connection.execute(
+            f"SELECT timezone('UTC', time) AS time, zone, net_position FROM {table_name} WHERE time >= ? AND time < ?",
+            [from_time_pd.to_pydatetime(), to_time_pd.to_pydatetime()],
+        ).arrow()
+
+    if zones is None:
+        table_zones = set(table.column("zone").unique().to_pylist())
+        zones = [bidding_zone.value for bidding_zone in BiddingZonesEnum if bidding_zone.value in table_zones]
+    return _pivot_zones(_normalise_frame(pl.from_arrow(table).lazy()), zones, "net_position")  # type: ignore
+
+
+def scan_analysis_inputs(
+    start: datetime | date | pd.Timestamp, end: datetime | date | pd.Timestamp
+) -> LazyJaoDataAndNPS:
+    """Caches the JAO data and observed net positions from `start` to `end`, and scans them into LazyFrames,
+    as `fetch_jao_data_basecase_nps_and_observed_nps` loads them with pandas
+
+    Args:
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+
+    Returns:
+        LazyJaoDataAndNPS: the JAO data, basecase net positions and observed net positions
+    """
+    cache_analysis_inputs(start, end)
+    jao_data = read_jao_cache(start, end, fill_cache=False)
+    return LazyJaoDataAndNPS(
+        jao_data,
+        lazy_basecase_net_positions(jao_data, start, end),
+        scan_net_positions("ENTSOE_NET_POSITION", start, end),
+    )
+
+
+def lazy_cnec_ids(
+    jao_data: pl.LazyFrame,
+    cnec_names: pl.LazyFrame,
+    alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES,
+) -> pl.LazyFrame:
+    """Looks up the cnec_id of every name in the `cnec` column of `cnec_names`, as `CnecIndex.get_id` does:
+    the id the name has in the first hour of `jao_data`, else the id of one of its `alternative_names`,
+    else the id the name has in all of `jao_data`, if there is exactly one.
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns `cnec_id`, `time` and `cnecName`
+        cnec_names (pl.LazyFrame): names to look up in the column `cnec`
+        alternative_names (dict[str, list[str]]): mapping of names that may have changed
+
+    Returns:
+        pl.LazyFrame: `cnec_names` with the column `cnec_id`, null for names without exactly one id
+    """
+    rows = jao_data.select(JaoData.cnecName, JaoData.cnec_id, JaoData.time)
+    matches = pl.concat(
+        [
+            rows.filter(pl.col(JaoData.time) == pl.col(JaoData.time).min())
+            .group_by(JaoData.cnecName)
+            .agg(pl.col(JaoData.cnec_id).first(), pl.len().alias("matches"))
+            .with_columns(pl.lit(True).alias("first_step")),
+            rows.select(JaoData.cnecName, JaoData.cnec_id)
+            .unique()
+            .group_by(JaoData.cnecName)
+            .agg(pl.col(JaoData.cnec_id).first(), pl.len().alias("matches"))
+            .with_columns(pl.lit(False).alias("first_step")),
+        ]
+    )
+
+    alternatives = pl.LazyFrame(
+        [
+            (cnec_name, alternative, rank)
+            for cnec_name, names in alternative_names.items()
+            for rank, alternative in enumerate(names)
+        ],
+        schema={CNEC: pl.Utf8, "alternative": pl.Utf8, "rank": pl.Int64},
+        orient="row",
+    ).join(cnec_names.select(CNEC), on=CNEC)
+    last_priority = 2 * max((len(names) for names in alternative_names.values()), default=0) + 1
+
+    def lookup(frame: pl.LazyFrame, name: pl.Expr, priority: pl.Expr, first_step: bool) -> pl.LazyFrame:
+        return frame.select(
+            CNEC,
+            name.alias("lookup"),
+            priority.cast(pl.Int64).alias("priority"),
+            pl.lit(first_step).alias("first_step"),
+        )
+
+    lookups = pl.concat(
+        [
+            lookup(cnec_names, pl.col(CNEC), pl.lit(0), True),
+            lookup(alternatives, pl.col("alternative"), 2 * pl.col("rank") + 1, True),
+            lookup(alternatives, pl.col("alternative"), 2 * pl.col("rank") + 2, False),
+            lookup(cnec_names, pl.col(CNEC), pl.lit(last_priority), False),
+        ]
+    )
+    cnec_ids = (
+        lookups.join(matches, left_on=["lookup", "first_step"], right_on=[JaoData.cnecName, "first_step"])
+        .filter(pl.col("matches") == 1)
+        .sort("priority")
+        .unique(CNEC, keep="first", maintain_order=True)
+        .select(CNEC, JaoData.cnec_id)
+    )
+    return cnec_names.join(cnec_ids, on=CNEC, how="left", coalesce=True)
+
+
+def lazy_basecase_net_positions(
+    jao_data: pl.LazyFrame,
+    start: datetime | date | pd.Timestamp,
+    end: datetime | date | pd.Timestamp,
+    bidding_zones: BiddingZonesEnum | list[BiddingZonesEnum] | None = None,
+    bidding_zone_cnec_map: dict[BiddingZonesEnum, list[tuple[str, BiddingZonesEnum]]] = BIDDING_ZONE_CNEC_MAP,
+    alternative_names: dict[str, list[str]] = ALTERNATIVE_NAMES,
+) -> pl.LazyFrame:
+    """Computes the basecase net positions from `start` to `end` as `compute_basecase_net_pos` does from a dataset:
+    minus the sum of the `fref` of the border CNECs of a zone. In every hour, a border CNEC is found by its name
+    or else by one of its `alternative_names`, when exactly one CNEC has that name in the hour.
+    A zone has no value in the hours where one of its border CNECs is not found.
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns `cnec_id`, `time`, `cnecName` and `fref`
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+        bidding_zones (BiddingZonesEnum | list[BiddingZonesEnum] | None, optional):
+            Bidding zones to compute the net position for. Defaults to None, which computes for ALL bidding zones.
+        bidding_zone_cnec_map (dict[BiddingZonesEnum, list[tuple[str, BiddingZonesEnum]]]):
+            Mapping from bidding zone to its border cnec names. Defaults to BIDDING_ZONE_CNEC_MAP.
+        alternative_names (dict[str, list[str]]): mapping of names that may have changed.
+            Defaults to ALTERNATIVE_NAMES.
+
+    Returns:
+        pl.LazyFrame: net positions with `time` and one column per zone
+    """
+    if bidding_zones is None:
+        bidding_zones = [bz for bz in BiddingZonesEnum]
+    if isinstance(bidding_zones, BiddingZonesEnum):
+        bidding_zones = [bidding_zones]
+
+    start_pd = convert_date_to_utc_pandas(start)
+    end_pd = convert_date_to_utc_pandas(end)
+    inner_data = jao_data.filter(
+        (pl.col(JaoData.time) >= start_pd.to_pydatetime())
+        & (pl.col(JaoData.time) < end_pd.to_pydatetime())
+        & pl.col(JaoData.fref).is_not_null()
+    )
+
+    borders = pl.LazyFrame(
+        _border_cnec_names(bidding_zones, bidding_zone_cnec_map, alternative_names).to_dict("list"),
+        schema={"zone": pl.Utf8, "border": pl.Utf8, JaoData.cnecName: pl.Utf8, "priority": pl.Int64},
+    )
+    zone_borders = borders.group_by("zone").agg(pl.col("border").n_unique().alias("borders"))
+    resolved = (
+        inner_data.join(borders, on=JaoData.cnecName)
+        .group_by("zone", "border", "priority", JaoData.time)
+        .agg(pl.col(JaoData.fref).first(), pl.len().alias("matches"))
+        .filter(pl.col("matches") == 1)
+        .sort("priority")
+        .unique(["zone", "border", JaoData.time], keep="first", maintain_order=True)
+    )
+    net_positions = (
+        resolved.group_by(JaoData.time, "zone")
+        .agg((-pl.col(JaoData.fref).sum()).alias("net_position"), pl.len().alias("found_borders"))
+        .join(zone_borders, on="zone")
+        .filter(pl.col("found_borders") == pl.col("borders"))
+    )
+    return _pivot_zones(net_positions, [bidding_zone.value for bidding_zone in bidding_zones], "net_position")
+
+
+def _with_linearised_flows(jao_data: pl.LazyFrame, net_positions: pl.LazyFrame, how: str = "left") -> pl.LazyFrame:
+    zones = [zone for zone in BiddingZones.to_schema().columns.keys() if zone in jao_data.columns]
+    zones = [zone for zone in zones if zone in net_positions.columns]
+    renamed_net_positions = net_positions.select(JaoData.time, *[pl.col(zone).alias(f"{zone}_np") for zone in zones])
+
+    # missing PTDFs and net positions do not contribute to the flow, as in `compute_linearised_flows`
+    contributions = [pl.col(zone).fill_null(0) * pl.col(f"{zone}_np").fill_null(0) for zone in zones]
+    return (
+        jao_data.join(renamed_net_positions, on=JaoData.time, how=how, coalesce=True)  # type: ignore
+        .with_columns((pl.sum_horizontal(pl.lit(0.0), *contributions) + pl.col(JaoData.fall)).alias("linearised_flow"))
+        .drop([f"{zone}_np" for zone in zones])
+    )
+
+
+def _linearisation_error(target_flow: pl.Expr) -> pl.Expr:
+    # the linear flow capped by `maxFlow`, null where `maxFlow` is, as `np.minimum` is NaN
+    capped_flow = (
+        pl.when(pl.col(JaoData.maxFlow).is_null())
+        .then(None)
+        .when(pl.col(JaoData.maxFlow) < pl.col("linearised_flow"))
+        .then(pl.col(JaoData.maxFlow))
+        .otherwise(pl.col("linearised_flow"))
+    )
+    return target_flow - capped_flow
+
+
+def lazy_linearised_flows(jao_data: pl.LazyFrame, net_positions: pl.LazyFrame) -> pl.LazyFrame:
+    """Computes the FBMC linearised flow of every CNEC, as `compute_linearised_flows` does
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns `cnec_id`, `time`, `fall` and the zonal PTDFs
+        net_positions (pl.LazyFrame): net positions with `time` and one column per zone
+
+    Returns:
+        pl.LazyFrame: frame with the columns `cnec_id`, `time` and `linearised_flow`
+    """
+    return _with_linearised_flows(jao_data, net_positions).select(JaoData.cnec_id, JaoData.time, "linearised_flow")
+
+
+def lazy_linearisation_errors(
+    jao_data: pl.LazyFrame, net_positions: pl.LazyFrame, target_flows: pl.LazyFrame
+) -> pl.LazyFrame:
+    """Computes the linearisation error of every CNEC, as `compute_linearisation_errors` does,
+    with `target_flow - linear_flow` and the linear flow capped by `maxFlow`
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns `cnec_id`, `time`, `fall`, `maxFlow` and the zonal PTDFs
+        net_positions (pl.LazyFrame): net positions with `time` and one column per zone
+        target_flows (pl.LazyFrame): observed flows with the columns `cnec_id`, `time` and `flow`
+
+    Returns:
+        pl.LazyFrame: frame with the columns `cnec_id`, `time` and `linearisation_error`
+    """
+    targets = target_flows.select(JaoData.cnec_id, JaoData.time, pl.col("flow").alias("target_flow"))
+    return (
+        _with_linearised_flows(jao_data, net_positions)
+        .join(targets, on=[JaoData.cnec_id, JaoData.time], how="left", coalesce=True)
+        .select(JaoData.cnec_id, JaoData.time, _linearisation_error(pl.col("target_flow")).alias("linearisation_error"))
+    )
+
+
+def lazy_cnec_scores(jao_data: pl.LazyFrame, net_positions: pl.LazyFrame, cnec_flows: pl.LazyFrame) -> LazyCnecScores:
+    """Builds the query plans of the linearisation error and vulnerability score of every CNEC in `cnec_flows`,
+    as `compute_cnec_scores` computes them. Nothing is computed until the plans are collected.
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns of LAZY_JAO_COLUMNS, `cnec_id` and `time`
+        net_positions (pl.LazyFrame): net positions to linearise from, with `time` and one column per zone
+        cnec_flows (pl.LazyFrame): observed flows with the columns `cnec`, `time`, `flow` and `fmax`,
+            see `lazy_cnec_flows`
+
+    Returns:
+        LazyCnecScores: plans of the scores per MTU, the JAO hours per CNEC and the cnec_id of every CNEC name
+    """
+    cnec_names = cnec_flows.select(CNEC).unique(maintain_order=True).with_row_index("order")
+    first_name = pl.col(CNEC).sort_by("order").first().over(JaoData.cnec_id)
+    cnec_ids = (
+        lazy_cnec_ids(jao_data, cnec_names)
+        .with_columns(
+            pl.when(pl.col(JaoData.cnec_id).is_null())
+            .then(pl.format("Ambigious or non-existent ID for {}", pl.col(CNEC)))
+            .when(pl.col(CNEC) != first_name)
+            .then(pl.format("Has the same cnec_id {} as {}", pl.col(JaoData.cnec_id), first_name))
+            .alias("error")
+        )
+        .sort("order")
+        .drop("order")
+    )
+
+    scored_ids = cnec_ids.filter(pl.col("error").is_null()).select(CNEC, JaoData.cnec_id)
+    scored_data = jao_data.join(scored_ids, on=JaoData.cnec_id)
+    hours = scored_data.group_by(CNEC, JaoData.cnec_id).agg(
+        pl.col(JaoData.nonRedundant).cast(pl.Float64).sum().alias("non_redundant_hours"),
+        pl.len().alias("jao_hours"),
+    )
+
+    # the MTUs of a CNEC are the hours where it is in the JAO data, has a net position and an observed flow
+    targets = cnec_flows.filter(pl.col("flow").is_not_null()).select(
+        CNEC, JaoData.time, pl.col("flow").alias("target_flow"), pl.col("fmax").alias("observed_fmax")
+    )
+    linearisation_error = _linearisation_error(pl.col("target_flow"))
+    scores = _with_linearised_flows(
+        scored_data.join(targets, on=[CNEC, JaoData.time]), net_positions, how="inner"
+    ).select(
+        CNEC,
+        JaoData.cnec_id,
+        JaoData.time,
+        linearisation_error.alias("linearisation_error"),
+        (linearisation_error / (pl.col("observed_fmax") - pl.col("target_flow")))
+        .fill_nan(None)
+        .alias("vulnerability_score"),
+    )
+    return LazyCnecScores(scores, hours, cnec_ids)
+
+
+def lazy_vulnerability_summary(lazy_scores: LazyCnecScores, threshold: float = 1.0) -> pl.LazyFrame:
+    """Builds the query plan of the summary of `scan_cnec_vulnerabilities`, with one row per scored CNEC name
+
+    Args:
+        lazy_scores (LazyCnecScores): plans of the scores, see `lazy_cnec_scores`
+        threshold (float, optional): vulnerability score counted as critical. Defaults to 1.0.
+
+    Returns:
+        pl.LazyFrame: the summary, with the CNEC name in the column `cnec`, ordered by cnec_id
+    """
+    score = pl.col("vulnerability_score")
+    statistics = lazy_scores.scores.group_by(CNEC).agg(
+        score.is_not_null().sum().cast(pl.Int64).alias("mtus"),
+        (score > threshold).sum().alias("above_threshold"),
+        (score < -threshold).sum().alias("below_threshold"),
+        (score.abs() > threshold).sum().alias("outside_threshold"),
+        score.filter(score > 0).median().alias("median_above_zero"),
+        score.filter(score < 0).median().alias("median_below_zero"),
+        score.median().alias("median_vulnerability"),
+    )
+    mtus = pl.col("mtus")
+    return (
+        lazy_scores.hours.join(statistics, on=CNEC, how="left", coalesce=True)
+        .sort(JaoData.cnec_id)
+        .select(
+            CNEC,
+            mtus.fill_null(0),
+            (100 * pl.col("above_threshold") / mtus).alias("mtus_above_threshold"),
+            (100 * pl.col("below_threshold") / mtus).alias("mtus_below_threshold"),
+            (100 * pl.col("outside_threshold") / mtus).alias("mtus_outside_threshold"),
+            "median_above_zero",
+            "median_below_zero",
+            "median_vulnerability",
+            (pl.col("non_redundant_hours") / pl.col("jao_hours")).alias("non_redundant_share"),
+        )
+    )
+
+
+def _collected_errors(cnec_ids: pl.DataFrame) -> dict[str, str]:
+    errors = cnec_ids.filter(pl.col("error").is_not_null())
+    return dict(zip(errors[CNEC].to_list(), errors["error"].to_list()))
+
+
+def collect_cnec_scores(jao_data: pl.LazyFrame, net_positions: pl.LazyFrame, cnec_flows: pl.LazyFrame) -> CnecScores:
+    """Computes the scores of `lazy_cnec_scores` in one optimized pass,
+    and returns them in the layout of `compute_cnec_scores`
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns of LAZY_JAO_COLUMNS, `cnec_id` and `time`
+        net_positions (pl.LazyFrame): net positions to linearise from, with `time` and one column per zone
+        cnec_flows (pl.LazyFrame): observed flows with the columns `cnec`, `time`, `flow` and `fmax`
+
+    Returns:
+        CnecScores: errors and scores with time as index and one column per CNEC name, NaN outside the MTUs,
+            and the reason for every CNEC name that could not be scored
+    """
+    lazy_scores = lazy_cnec_scores(jao_data, net_positions, cnec_flows)
+    scored_times = (
+        jao_data.join(lazy_scores.hours, on=JaoData.cnec_id, how="semi")
+        .select(JaoData.time)
+        .unique()
+        .sort(JaoData.time)
+    )
+    scores, hours, cnec_ids, times = pl.collect_all(
+        [lazy_scores.scores, lazy_scores.hours.sort(JaoData.cnec_id), lazy_scores.cnec_ids, scored_times]
+    )
+
+    names = pd.Index(hours[CNEC].to_list(), name=CNEC)
+    index = pd.DatetimeIndex(times[JaoData.time].to_pandas(), name=JaoData.time)
+    score_frame = scores.to_pandas().set_index([JaoData.time, CNEC])
+
+    def wide(column: str) -> pd.DataFrame:
+        return score_frame[column].unstack(CNEC).reindex(index=index, columns=names)
+
+    hour_frame = hours.to_pandas().set_index(CNEC)
+    return CnecScores(
+        wide("linearisation_error"),
+        wide("vulnerability_score"),
+        hour_frame["non_redundant_hours"].rename(JaoData.nonRedundant),
+        hour_frame["jao_hours"].astype(int).rename(JaoData.nonRedundant),
+        _collected_errors(cnec_ids),
+    )
+
+
+def collect_vulnerability_scan(
+    jao_data: pl.LazyFrame, net_positions: pl.LazyFrame, cnec_flows: pl.LazyFrame, threshold: float = 1.0
+) -> VulnerabilityScan:
+    """Computes the summary of `scan_cnec_vulnerabilities` in one optimized pass, see `lazy_vulnerability_summary`
+
+    Args:
+        jao_data (pl.LazyFrame): JAO data with the columns of LAZY_JAO_COLUMNS, `cnec_id` and `time`
+        net_positions (pl.LazyFrame): net positions to linearise from, with `time` and one column per zone
+        cnec_flows (pl.LazyFrame): observed flows with the columns `cnec`, `time`, `flow` and `fmax`
+        threshold (float, optional): vulnerability score counted as critical. Defaults to 1.0.
+
+    Returns:
+        VulnerabilityScan: the summary, and the reason for every CNEC name that could not be scanned
+    """
+    lazy_scores = lazy_cnec_scores(jao_data, net_positions, cnec_flows)
+    summary, cnec_ids = pl.collect_all([lazy_vulnerability_summary(lazy_scores, threshold), lazy_scores.cnec_ids])
+
+    errors = _collected_errors(cnec_ids)
+    for cnec_name in summary.filter(pl.col("mtus") == 0)[CNEC].to_list():
+        errors[cnec_name] = "No MTUs with JAO data, net positions and observed flow"
+    summary_frame = summary.filter(pl.col("mtus") > 0).to_pandas().set_index(CNEC)
+    return VulnerabilityScan(summary_frame, errors)
@@ -64,18 +64,19 @@ def transform_delta_np_and_ptdfs_to_numpy(
 
 
 def fetch_jao_data_basecase_nps_and_observed_nps(
-    start: datetime | pd.Timestamp, end: datetime | pd.Timestamp
+    start: datetime | pd.Timestamp, end: datetime | pd.Timestamp, compact: bool = False
 ) -> JaoDataAndNPS:
-    jao_data = fetch_jao_dataframe_timeseries(start, end)
+    jao_data = fetch_jao_dataframe_timeseries(start, end, compact=compact)
+    if jao_data is None:
+        raise ValueError(f"No jao data for {start} {end}")
+
     observed_nps = fetch_net_position_from_crossborder_flows(start, end)
-    basecase_nps = compute_basecase_net_pos(start, end)
+    basecase_nps = compute_basecase_net_pos(start, end, dataset=jao_data)
 
     if observed_nps is None:
         raise ValueError(f"No observed data for {start} {end}")
     if basecase_nps is None:
         raise ValueError(f"No entose data for {start} {end}")
-    if jao_data is None:
-        raise ValueError(f"No jao data for {start} {end}")
 
     return JaoDataAndNPS(jao_data, basecase_nps, observed_nps)
 
@@ -0,0 +1,239 @@
+from datetime import date, datetime
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from fbmc_quality.dataframe_schemas.schemas import BiddingZones, JaoData
+from fbmc_quality.datetime_handlers.handle_timezones import split_period
+from fbmc_quality.entsoe_data.fetch_entsoe_data import fetch_net_position_from_crossborder_flows
+from fbmc_quality.jao_data.fetch_jao_data import fetch_jao_dataframe_timeseries
+from fbmc_quality.linearisation_analysis.compute_functions import compute_cnec_scores
+from fbmc_quality.linearisation_analysis.dataclasses import CnecScores
+
+DEFAULT_CHUNK_SIZE = pd.Timedelta(weeks=1)
+DEFAULT_SCORE_BIN_EDGES = np.linspace(-5, 5, 401)
+# the JAO columns read by `compute_cnec_scores`
+SCORE_JAO_COLUMNS = [
+    JaoData.cnecName,
+    JaoData.nonRedundant,
+    JaoData.fall,
+    JaoData.fref,
+    JaoData.fmax,
+    JaoData.maxFlow,
+] + list(BiddingZones.to_schema().columns.keys())
+
+CnecFlowsFunction = Callable[
+    [datetime | date | pd.Timestamp, datetime | date | pd.Timestamp, list[str]], dict[str, pd.DataFrame] | None
+]
+
+_SUM_COLUMNS = [
+    "mtus",
+    "error_sum",
+    "squared_error_sum",
+    "max_abs_error",
+    "above_threshold",
+    "below_threshold",
+    "zero_scores",
+    "non_redundant_hours",
+    "jao_hours",
+]
+
+
+class CnecStatistics:
+    """Per-CNEC aggregates of linearisation errors and vulnerability scores, updated one chunk of scores at a time.
+    Statistics of different chunks or time shards are combined with `merge`, in any order.
+
+    The memory does not grow with the length of the period: the sums are kept per CNEC,
+    and the vulnerability scores as a histogram over `score_bin_edges`, from which the medians are read.
+    The medians are the centre of the bin holding the median, so they are only exact to half the width of a bin,
+    and a median in the bins below or above the edges is reported as the outer edge.
+
+    Args:
+        threshold (float, optional): vulnerability score counted as critical. Defaults to 1.0.
+        score_bin_edges (np.ndarray, optional): sorted edges of the score histogram, must contain 0.
+            Defaults to DEFAULT_SCORE_BIN_EDGES.
+    """
+
+    def __init__(self, threshold: float = 1.0, score_bin_edges: np.ndarray = DEFAULT_SCORE_BIN_EDGES):
+        if 0 not in score_bin_edges:
+            raise ValueError("The score bin edges must contain 0")
+
+        self.threshold = threshold
+        self.score_bin_edges = np.asarray(score_bin_edges, dtype=float)
+        self.sums = pd.DataFrame(columns=_SUM_COLUMNS, dtype=float).rename_axis("cnec")
+        # one bin below and one above the edges
+        self.score_histogram = pd.DataFrame(columns=range(len(self.score_bin_edges) + 1), dtype=float).rename_axis(
+            "cnec"
+        )
+        self.errors: dict[str, str] = {}
+
+    def update(self, cnec_scores: CnecScores):
+        """Adds the scores of a chunk to the statistics
+
+        Args:
+            cnec_scores (CnecScores): scores of a chunk, see `compute_cnec_scores`
+        """
+        errors = cnec_scores.linearisation_errors
+        scores = cnec_scores.vulnerability_scores
+        sums = pd.DataFrame(
+            {
+                "mtus": scores.notna().sum(),
+                "error_sum": errors.sum(),
+                "squared_error_sum": (errors**2).sum(),
+                "max_abs_error": errors.abs().max().fillna(0),
+                "above_threshold": (scores > self.threshold).sum(),
+                "below_threshold": (scores < -self.threshold).sum(),
+                "zero_scores": (scores == 0).sum(),
+                "non_redundant_hours": cnec_scores.non_redundant_hours,
+                "jao_hours": cnec_scores.jao_hours,
+            }
+        ).astype(float)
+
+        values = scores.to_numpy(dtype=float)
+        is_score = ~np.isnan(values)
+        bins = np.searchsorted(self.score_bin_edges, values, side="right")
+        columns = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+        number_of_bins = len(self.score_bin_edges) + 1
+        counts = np.bincount(
+            columns[is_score] * number_of_bins + bins[is_score], minlength=values.shape[1] * number_of_bins
+        ).reshape(values.shape[1], number_of_bins)
+        histogram = pd.DataFrame(counts, index=scores.columns, columns=range(number_of_bins), dtype=float)
+
+        self._add(sums, histogram, cnec_scores.errors)
+
+    def merge(self, other: "CnecStatistics") -> "CnecStatistics":
+        """Adds the statistics of `other`, computed with the same threshold and bins, to these statistics
+
+        Args:
+            other (CnecStatistics): statistics of another chunk or time shard
+
+        Returns:
+            CnecStatistics: these statistics, updated
+        """
+        if other.threshold != self.threshold or not np.array_equal(other.score_bin_edges, self.score_bin_edges):
+            raise ValueError("Can only merge statistics with the same threshold and score bins")
+        self._add(other.sums, other.score_histogram, other.errors)
+        return self
+
+    def _add(self, sums: pd.DataFrame, histogram: pd.DataFrame, errors: dict[str, str]):
+        max_abs_error = pd.concat([self.sums["max_abs_error"], sums["max_abs_error"]], axis=1).max(axis=1)
+        self.sums = self.sums.add(sums, fill_value=0)
+        self.sums["max_abs_error"] = max_abs_error
+        self.score_histogram = self.score_histogram.add(histogram, fill_value=0)
+        for cnec_name, error in errors.items():
+            self.errors.setdefault(cnec_name, error)
+
+    def _histogram_median(self, counts: np.ndarray, first_bin: int) -> pd.Series:
+        # `counts` are the columns of the histogram from `first_bin` on
+        cumulative_counts = counts.cumsum(axis=1)
+        total = cumulative_counts[:, -1] if counts.shape[1] else np.zeros(len(counts))
+        median_bins = (cumulative_counts < (total / 2)[:, None]).sum(axis=1) + first_bin
+
+        # bin `i` holds the scores in `[edges[i - 1], edges[i])`, the outer bins count as their edge
+        edges = self.score_bin_edges
+        lower_edges = edges[np.clip(median_bins - 1, 0, len(edges) - 1)]
+        upper_edges = edges[np.clip(median_bins, 0, len(edges) - 1)]
+        medians = (lower_edges + upper_edges) / 2
+        return pd.Series(np.where(total > 0, medians, np.nan), index=self.score_histogram.index)
+
+    def summary(self) -> pd.DataFrame:
+        """Summarises the statistics per CNEC name, with the columns of `scan_cnec_vulnerabilities` and
+        `mean_linearisation_error`, `rms_linearisation_error` and `max_abs_linearisation_error`.
+        The medians are read from the histogram, see `CnecStatistics`, and named
+        `approx_median_above_zero`, `approx_median_below_zero` and `approx_median_vulnerability`.
+        Like in `scan_cnec_vulnerabilities`, scores of exactly 0 are neither above nor below zero.
+
+        Returns:
+            pd.DataFrame: summary indexed by CNEC name, for the CNECs with at least one MTU
+        """
+        sums = self.sums
+        mtus = sums["mtus"]
+        histogram = self.score_histogram.to_numpy()
+        # the bin starting at 0 holds the scores in `[0, edges[zero_bin])`, the zeros are taken out of it
+        zero_bin = int(np.searchsorted(self.score_bin_edges, 0, side="right"))
+        above_zero = histogram[:, zero_bin:].copy()
+        above_zero[:, 0] -= sums["zero_scores"].reindex(self.score_histogram.index).fillna(0).to_numpy()
+        summary = pd.DataFrame(
+            {
+                "mtus": mtus.astype(int),
+                "mtus_above_threshold": 100 * sums["above_threshold"] / mtus,
+                "mtus_below_threshold": 100 * sums["below_threshold"] / mtus,
+                "mtus_outside_threshold": 100 * (sums["above_threshold"] + sums["below_threshold"]) / mtus,
+                "approx_median_above_zero": self._histogram_median(above_zero, zero_bin),
+                "approx_median_below_zero": self._histogram_median(histogram[:, :zero_bin], 0),
+                "approx_median_vulnerability": self._histogram_median(histogram, 0),
+                "non_redundant_share": sums["non_redundant_hours"] / sums["jao_hours"],
+                "mean_linearisation_error": sums["error_sum"] / mtus,
+                "rms_linearisation_error": np.sqrt(sums["squared_error_sum"] / mtus),
+                "max_abs_linearisation_error": sums["max_abs_error"],
+            }
+        )
+        return summary.loc[summary["mtus"] > 0]
+
+
+def stream_cnec_scores(
+    start: datetime | date | pd.Timestamp,
+    end: datetime | date | pd.Timestamp,
+    fetch_cnec_flows: CnecFlowsFunction,
+    cnec_names: list[str] | None = None,
+    chunk_size: pd.Timedelta = DEFAULT_CHUNK_SIZE,
+) -> Iterator[CnecScores]:
+    """Computes the linearisation errors and vulnerability scores from `start` to `end` one chunk at a time,
+    so only the data of one chunk is in memory at once. See `compute_cnec_scores`.
+    Only the JAO columns in `SCORE_JAO_COLUMNS` and the observed net positions are loaded for a chunk.
+
+    Args:
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+        fetch_cnec_flows (CnecFlowsFunction): returns a frame with the columns `flow` and `fmax` per CNEC name,
+            for a chunk and a list of names, like the internal CNEC function of the app
+        cnec_names (list[str] | None, optional): CNECs to score. Defaults to None, which scores all CNECs in a chunk.
+        chunk_size (pd.Timedelta, optional): length of a chunk. Defaults to DEFAULT_CHUNK_SIZE.
+
+    Yields:
+        CnecScores: scores of a chunk
+    """
+    for chunk_start, chunk_end in split_period(start, end, chunk_size):
+        jao_data = fetch_jao_dataframe_timeseries(chunk_start, chunk_end, columns=SCORE_JAO_COLUMNS)
+        if jao_data is None:
+            raise ValueError(f"No jao data for {chunk_start} {chunk_end}")
+        # the JAO read includes the `chunk_end` hour, which belongs to the next chunk
+        jao_data = jao_data.loc[jao_data.index.get_level_values(JaoData.time) < chunk_end]
+        observed_nps = fetch_net_position_from_crossborder_flows(chunk_start, chunk_end)
+        if observed_nps is None:
+            raise ValueError(f"No observed data for {chunk_start} {chunk_end}")
+
+        names = cnec_names if cnec_names is not None else list(jao_data[JaoData.cnecName].dropna().unique())
+        cnec_flows = fetch_cnec_flows(chunk_start, chunk_end, names)
+        if not cnec_flows:
+            continue
+
+        yield compute_cnec_scores(jao_data, observed_nps, pd.concat(cnec_flows, axis=1))
+
+
+def compute_cnec_statistics(
+    start: datetime | date | pd.Timestamp,
+    end: datetime | date | pd.Timestamp,
+    fetch_cnec_flows: CnecFlowsFunction,
+    cnec_names: list[str] | None = None,
+    chunk_size: pd.Timedelta = DEFAULT_CHUNK_SIZE,
+    threshold: float = 1.0,
+) -> CnecStatistics:
+    """Aggregates the scores of `stream_cnec_scores` per CNEC, keeping no chunk once it is added
+
+    Args:
+        start (datetime | date | pd.Timestamp): start of the period
+        end (datetime | date | pd.Timestamp): end of the period, exclusive
+        fetch_cnec_flows (CnecFlowsFunction): returns a frame with the columns `flow` and `fmax` per CNEC name
+        cnec_names (list[str] | None, optional): CNECs to score. Defaults to None, which scores all CNECs in a chunk.
+        chunk_size (pd.Timedelta, optional): length of a chunk. Defaults to DEFAULT_CHUNK_SIZE.
+        threshold (float, optional): vulnerability score counted as critical. Defaults to 1.0.
+
+    Returns:
+        CnecStatistics: statistics of the whole period
+    """
+    statistics = CnecStatistics(threshold)
+    for cnec_scores in stream_cnec_scores(start, end, fetch_cnec_flows, cnec_names, chunk_size):
+        statistics.update(cnec_scores)
+    return statistics
@@ -19,8 +19,7 @@ from fbmc_quality.dataframe_schemas.schemas import JaoData
 # from fbmc_quality.linearisation_analysis.process_data import get_from_to_bz_from_name
 from fbmc_quality.entsoe_data.fetch_entsoe_data import get_from_to_bz_from_name
 from fbmc_quality.enums.bidding_zones import BiddingZonesEnum
-from fbmc_quality.jao_data import get_cnec_id_from_name
-from fbmc_quality.jao_data.fetch_jao_data import create_uuid_from_string
+from fbmc_quality.jao_data.fetch_jao_data import create_cnec_ids
 from fbmc_quality.linearisation_analysis import (
     JaoDataAndNPS,
     compute_cnec_vulnerability_to_err,
@@ -29,8 +28,8 @@ from fbmc_quality.linearisation_analysis import (
     fetch_jao_data_basecase_nps_and_observed_nps,
     load_data_for_corridor_cnec,
     load_data_for_internal_cnec,
+    scan_cnec_vulnerabilities,
 )
-from fbmc_quality.linearisation_analysis.process_data import align_by_index_overlap
 from fbmc_quality.plotting.flow_map import compute_flow_geo_frame, draw_flow_map_figure, get_european_nps
 
 load_dotenv()
@@ -63,13 +62,11 @@ def get_data(start, end, _deanonymizer):
             return None
 
         data_load_state = st.text("Loading data...")
-        data = fetch_jao_data_basecase_nps_and_observed_nps(start, end)
+        data = fetch_jao_data_basecase_nps_and_observed_nps(start, end, compact=True)
         if _deanonymizer is not None:
             jaodata = data.jaoData
-            jaodata[JaoData.cnecName] = jaodata[JaoData.cnecName].apply(_deanonymizer)
-            jaodata[JaoData.cnec_id] = jaodata.apply(
-                lambda row: create_uuid_from_string(row[JaoData.cnecName] + row[JaoData.contName]), axis=1
-            )
+            jaodata[JaoData.cnecName] = jaodata[JaoData.cnecName].map(_deanonymizer, na_action="ignore")
+            jaodata[JaoData.cnec_id] = create_cnec_ids(jaodata[JaoData.cnecName], jaodata[JaoData.contName])
             data = JaoDataAndNPS(jaodata, data.basecaseNPs, data.observedNPs)
 
         data_load_state.text("Loading data...done!")
@@ -182,65 +179,17 @@ def all_cnecs_analysis(
         all_cnec_data = get_data_for_all_cnecs(internal_cnec_func, names, start, end)
 
     if all_cnec_data is not None and data is not None:
-        too_much_allocated_capacity = []
-        too_little_allocated_capacity = []
+        scan = scan_cnec_vulnerabilities(data.jaoData, data.observedNPs, pd.concat(all_cnec_data, axis=1))
+        if scan.errors:
+            with st.expander(f"{len(scan.errors)} CNECs could not be analysed"):
+                st.dataframe(pd.Series(scan.errors, name="error").rename_axis("cnec"))
 
-        for cnec_name, frame in all_cnec_data.items():
-            try:
-                cnec_id = get_cnec_id_from_name(cnec_name, data.jaoData)
-
-                if ("fmax" not in frame.columns) or ("flow" not in frame.columns):
-                    raise ValueError('The internal cnec function must return a frame with columns "flow" and "fmax"')
-
-                cnec_data = data.jaoData.xs(cnec_id, level=JaoData.cnec_id)
-                overlap = align_by_index_overlap(cnec_data, frame, data.observedNPs)
-                frame = frame.loc[overlap]
-                vuln_cnec_data = compute_cnec_vulnerability_to_err(
-                    cnec_data.loc[overlap],
-                    data.observedNPs.loc[overlap],
-                    frame["flow"].loc[overlap],
-                    frame["fmax"].loc[overlap],
-                )
-            except:
-                continue
-
-            mtus_above_threshold = 100 * (vuln_cnec_data["vulnerability_score"] > 1).sum() / len(vuln_cnec_data)
-            median_above_zero = vuln_cnec_data["vulnerability_score"][
-                vuln_cnec_data["vulnerability_score"] > 0
-            ].median()
-
-            too_much_allocated_capacity.append(
-                {
-                    "mtus_above_threshod": mtus_above_threshold,
-                    "median_above_zero": median_above_zero,
-                    "cnec": cnec_name,
-                    "Significant Shadow Price": cnec_name in SHADOW_CNECS,
-                    "Significant Domain Limit": (cnec_data[JaoData.nonRedundant].sum() / len(cnec_data)) > 0.1,
-                }
-            )
-
-            mtus_below_threshold = 100 * (vuln_cnec_data["vulnerability_score"] < -1).sum() / len(vuln_cnec_data)
-            median_below_zero = vuln_cnec_data["vulnerability_score"][
-                vuln_cnec_data["vulnerability_score"] < 0
-            ].median()
-            too_little_allocated_capacity.append(
-                {
-                    "mtus_below_threshod": mtus_below_threshold,
-                    "median_below_zero": median_below_zero,
-                    "cnec": cnec_name,
-                    "Significant Shadow Price": cnec_name in SHADOW_CNECS,
-                    "Significant Domain Limit": (cnec_data[JaoData.nonRedundant].sum() / len(cnec_data)) > 0.1,
-                }
-            )
+        summary = scan.summary.reset_index()
+        summary["Significant Shadow Price"] = summary["cnec"].isin(SHADOW_CNECS)
+        summary["Significant Domain Limit"] = summary["non_redundant_share"] > 0.1
 
-        overallocated_capacity = pd.DataFrame(too_much_allocated_capacity)
-        overallocated_capacity = overallocated_capacity[
-            (overallocated_capacity["mtus_above_threshod"] > 0) | (overallocated_capacity["median_above_zero"] > 0.7)
-        ]
-        underallocated_capacity = pd.DataFrame(too_little_allocated_capacity)
-        underallocated_capacity = underallocated_capacity[
-            (underallocated_capacity["mtus_below_threshod"] > 0) | (underallocated_capacity["median_below_zero"] < -0.7)
-        ]
+        overallocated_capacity = summary[(summary["mtus_above_threshold"] > 0) | (summary["median_above_zero"] > 0.7)]
+        underallocated_capacity = summary[(summary["mtus_below_threshold"] > 0) | (summary["median_below_zero"] < -0.7)]
 
     if overallocated_capacity is not None and underallocated_capacity is not None:
         # st.dataframe(overallocated_capacity)
@@ -250,7 +199,7 @@ def all_cnecs_analysis(
         # fig_over.add_trace(
         #     go.Scatter(
         #         x=overallocated_capacity["median_above_zero"],
-        #         y=overallocated_capacity["mtus_above_threshod"],
+        #         y=overallocated_capacity["mtus_above_threshold"],
         #         text=overallocated_capacity["cnec"],
         #         mode="markers",
         #     )
@@ -258,7 +207,7 @@ def all_cnecs_analysis(
         fig_over = px.scatter(
             overallocated_capacity,
             x="median_above_zero",
-            y="mtus_above_threshod",
+            y="mtus_above_threshold",
             hover_data=["cnec"],
             color="Significant Shadow Price",
             symbol="Significant Domain Limit",
@@ -282,7 +231,7 @@ def all_cnecs_analysis(
         # fig_under.add_trace(
         #     go.Scatter(
         #         x=underallocated_capacity["median_below_zero"],
-        #         y=underallocated_capacity["mtus_below_threshod"],
+        #         y=underallocated_capacity["mtus_below_threshold"],
         #         text=underallocated_capacity["cnec"],
         #         mode="markers",
         #     )
@@ -291,7 +240,7 @@ def all_cnecs_analysis(
         fig_under = px.scatter(
             underallocated_capacity,
             x="median_below_zero",
-            y="mtus_below_threshod",
+            y="mtus_below_threshold",
             hover_data=["cnec"],
             color="Significant Shadow Price",
             symbol="Significant Domain Limit",
@@ -24,13 +24,13 @@ from sklearn.linear_model import LinearRegression
 
 from fbmc_quality.dataframe_schemas import JaoData
 from fbmc_quality.dataframe_schemas.schemas import NetPosition
-from fbmc_quality.entsoe_data.fetch_entsoe_data import fetch_entsoe_data_from_bidding_zones, get_entsoe_client
-from fbmc_quality.enums import BiddingZonesEnum
-from fbmc_quality.jao_data.analyse_jao_data import (
-    BIDDING_ZONE_CNEC_MAP,
-    get_cnec_id_from_name,
-    get_cross_border_cnec_ids,
+from fbmc_quality.entsoe_data.fetch_entsoe_data import (
+    fetch_border_flows,
+    get_entsoe_client,
+    lookup_entsoe_areas_from_bz,
 )
+from fbmc_quality.enums import BiddingZonesEnum
+from fbmc_quality.jao_data.analyse_jao_data import BIDDING_ZONE_CNEC_MAP, CnecIndex, get_cross_border_cnec_ids
 from fbmc_quality.linearisation_analysis import compute_linearised_flow
 
 ZONE_AREA_MAP = {
@@ -93,20 +93,31 @@ def compute_flow_geo_frame(
 
     subset_jao = basecase_data.xs(input_timestamp, level=JaoData.time)
 
-    cnec_ids = get_cross_border_cnec_ids(basecase_data)
+    cnec_index = CnecIndex(basecase_data)
+    cnec_ids = get_cross_border_cnec_ids(basecase_data, cnec_index=cnec_index)
     flow_based_corridor_values = {}
     observed_corridor_values = {}
 
+    corridor_areas = {
+        (bz, BIDDING_ZONE_CNEC_MAP[bz][i][1]): lookup_entsoe_areas_from_bz(bz, BIDDING_ZONE_CNEC_MAP[bz][i][1])
+        for bz in ZONE_MAP_WITH_HVDC.keys()
+        for i, _ in enumerate(cnec_ids[bz])
+    }
+    observed_flows = fetch_border_flows(start, end.tz_convert("utc"), list(corridor_areas.values()))
+
     for bz in ZONE_MAP_WITH_HVDC.keys():
         for i, _ in enumerate(cnec_ids[bz]):
             target = BIDDING_ZONE_CNEC_MAP[bz][i][1]
             from_to = (bz, target)
 
-            cnec_id = get_cnec_id_from_name(BIDDING_ZONE_CNEC_MAP[bz][i][0], basecase_data)
+            cnec_id = cnec_index.get_id(BIDDING_ZONE_CNEC_MAP[bz][i][0])
             fb_cnec_flow = -1 * compute_linearised_flow(subset_jao.loc[cnec_id], observed_data).loc[start]
             try:
-                obs_cnec_flow = fetch_entsoe_data_from_bidding_zones(start, end, bz, target).loc[start].iloc[0]
-            except ValueError:
+                obs_cnec_flow = observed_flows.loc[start, corridor_areas[from_to]]
+            except (KeyError, ValueError):
+                obs_cnec_flow = 0
+            # an hour that is not cached is NA in the bulk read, not missing
+            if pd.isna(obs_cnec_flow):
                 obs_cnec_flow = 0
             flow_based_corridor_values[from_to] = fb_cnec_flow
             observed_corridor_values[from_to] = obs_cnec_flow
@@ -0,0 +1,12 @@
+from pathlib import Path
+
+import pytest
+
+from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB, CacheDatabase
+
+
+@pytest.fixture(autouse=True)
+def cache_db(tmp_path) -> CacheDatabase:
+    CACHE_DB.configure(Path(tmp_path) / "test_data.duckdb")
+    yield CACHE_DB
+    CACHE_DB.configure(None)
@@ -0,0 +1,381 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+
+def test_batched_flows_match_per_cnec_flows():
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.linearisation_analysis import (
+        compute_cnec_vulnerabilities_to_err,
+        compute_cnec_vulnerability_to_err,
+        compute_linearised_flow,
+        compute_linearised_flows,
+        make_cnec_tensor,
+    )
+
+    rng = np.random.default_rng(0)
+    zones = list(BiddingZones.to_schema().columns.keys())
+    times = pd.date_range("2023-04-01", periods=6, freq="H", tz="utc")
+    cnec_ids = ["a", "b", "c"]
+    index = pd.MultiIndex.from_product([cnec_ids, times], names=["cnec_id", "time"])
+
+    jao_data = pd.DataFrame(rng.normal(size=(len(index), len(zones))), index=index, columns=zones)
+    jao_data.iloc[0, :3] = np.nan
+    for column in ["fall", "fref", "fmax", "maxFlow"]:
+        jao_data[column] = rng.normal(size=len(index)) * 100
+    jao_data["fmax"] += 500
+    net_positions = pd.DataFrame(rng.normal(size=(len(times), len(zones) - 2)), index=times, columns=zones[:-2])
+    target_flows = pd.DataFrame(rng.normal(size=(len(times), len(cnec_ids))) * 100, index=times, columns=cnec_ids)
+
+    cnec_tensor = make_cnec_tensor(jao_data)
+    flows = compute_linearised_flows(cnec_tensor, net_positions)
+    vulnerabilities = compute_cnec_vulnerabilities_to_err(cnec_tensor, net_positions, target_flows)
+
+    for cnec_id in cnec_ids:
+        cnec_data = jao_data.xs(cnec_id, level="cnec_id")
+        expected_flow = compute_linearised_flow(cnec_data, net_positions)
+        assert_series_equal(expected_flow, flows[cnec_id], check_names=False, check_freq=False)
+
+        expected_vulnerability = compute_cnec_vulnerability_to_err(cnec_data, net_positions, target_flows[cnec_id])
+        assert_frame_equal(expected_vulnerability, vulnerabilities.xs(cnec_id), check_names=False, check_freq=False)
+
+
+def test_ptdf_store_reads_appended_hours(tmp_path):
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.jao_data import PtdfStore
+    from fbmc_quality.linearisation_analysis import cnec_tensor_from_block, make_cnec_tensor
+
+    rng = np.random.default_rng(0)
+    zones = list(BiddingZones.to_schema().columns.keys())
+    times = pd.date_range("2023-04-01", periods=6, freq="H", tz="utc")
+    index = pd.MultiIndex.from_product([["a", "b", "c"], times], names=["cnec_id", "time"])
+    jao_data = pd.DataFrame(rng.normal(size=(len(index), len(zones))), index=index, columns=zones)
+    for column in ["fall", "fref", "fmax", "ram", "maxFlow"]:
+        jao_data[column] = rng.normal(size=len(index)) * 100
+    # CNEC `c` only appears in the later hours
+    jao_data = jao_data.drop([("c", time) for time in times[:3]])
+
+    ptdf_store = PtdfStore(tmp_path / "store.ptdfs")
+    ptdf_store.append(jao_data.loc[jao_data.index.get_level_values("time") < times[3]])
+    ptdf_store.append(jao_data)
+    assert len(ptdf_store.times) == len(times)
+
+    reopened_store = PtdfStore(tmp_path / "store.ptdfs")
+    read_tensor = cnec_tensor_from_block(reopened_store.read(times[1], times[-1]))
+    expected_tensor = make_cnec_tensor(jao_data.loc[jao_data.index.get_level_values("time").isin(times[1:-1])])
+
+    assert read_tensor.times.equals(expected_tensor.times)
+    assert read_tensor.cnec_ids.equals(expected_tensor.cnec_ids)
+    for read_values, expected_values in zip(read_tensor[3:], expected_tensor[3:]):
+        np.testing.assert_allclose(read_values, expected_values, rtol=1e-6)
+
+    subset = reopened_store.read(times[0], times[-1] + pd.Timedelta(hours=1), cnec_ids=["c"])
+    assert subset.cnec_ids.to_list() == ["c"]
+    assert np.isnan(subset.values[:3]).all() and not np.isnan(subset.values[3:]).any()
+
+    segment_blocks = reopened_store.read_segments(times[1], times[-1])
+    assert [len(block.times) for block in segment_blocks] == [2, 2]
+    assert all(isinstance(block.values, np.memmap) for block in segment_blocks)
+
+    # a store that has not seen the append of another one does not store the same hours again
+    first_store, stale_store = PtdfStore(tmp_path / "shared.ptdfs"), PtdfStore(tmp_path / "shared.ptdfs")
+    assert stale_store.times.empty
+    first_store.append(jao_data.loc[jao_data.index.get_level_values("time") < times[3]])
+    stale_store.append(jao_data)
+    shared_times = PtdfStore(tmp_path / "shared.ptdfs").times
+    assert shared_times.equals(pd.DatetimeIndex(times, name="time")) and shared_times.is_unique
+    assert len(list((tmp_path / "shared.ptdfs").glob("segment_*_times.npy"))) == 2
+
+    # a store that is kept open reads the hours appended by another one afterwards
+    reader, writer = PtdfStore(tmp_path / "live.ptdfs"), PtdfStore(tmp_path / "live.ptdfs")
+    writer.append(jao_data.loc[jao_data.index.get_level_values("time") < times[3]])
+    assert len(reader.times) == 3 and reader.read(times[3], times[-1]).times.empty
+    writer.append(jao_data)
+    assert reader.times.equals(shared_times)
+    assert [len(block.times) for block in reader.read_segments(times[3], times[-1])] == [2]
+
+
+def test_vulnerability_scan_matches_per_cnec_loop():
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.linearisation_analysis import compute_cnec_vulnerability_to_err, scan_cnec_vulnerabilities
+
+    rng = np.random.default_rng(1)
+    zones = list(BiddingZones.to_schema().columns.keys())
+    times = pd.date_range("2023-04-01", periods=48, freq="H", tz="utc")
+    cnec_names = {"a": "Line A", "b": "Line B", "c": "Line C"}
+    index = pd.MultiIndex.from_product([list(cnec_names), times], names=["cnec_id", "time"])
+
+    jao_data = pd.DataFrame(rng.normal(size=(len(index), len(zones))) / 10, index=index, columns=zones)
+    for column in ["fall", "fref", "maxFlow"]:
+        jao_data[column] = rng.normal(size=len(index)) * 100
+    jao_data["fmax"] = 1000.0
+    jao_data["cnecName"] = [cnec_names[cnec_id] for cnec_id in index.get_level_values("cnec_id")]
+    jao_data["contName"] = "BASECASE"
+    jao_data["nonRedundant"] = rng.random(len(index)) > 0.8
+    net_positions = pd.DataFrame(rng.normal(size=(len(times) - 4, len(zones))) * 500, index=times[4:], columns=zones)
+
+    frames = {
+        name: pd.DataFrame({"flow": rng.normal(size=40) * 500, "fmax": 600.0}, index=times[:40])
+        for name in ["Line A", "Line B", "Unknown line"]
+    }
+    frames["Line C"] = pd.DataFrame({"flow": rng.normal(size=40) * 500}, index=times[:40])
+    scan = scan_cnec_vulnerabilities(jao_data, net_positions, pd.concat(frames, axis=1))
+
+    assert set(scan.errors) == {"Unknown line", "Line C"}
+    assert scan.summary.index.to_list() == ["Line A", "Line B"]
+    for cnec_id, name in [("a", "Line A"), ("b", "Line B")]:
+        cnec_data = jao_data.xs(cnec_id, level="cnec_id")
+        overlap = times[4:40]
+        expected = compute_cnec_vulnerability_to_err(
+            cnec_data.loc[overlap],
+            net_positions.loc[overlap],
+            frames[name]["flow"].loc[overlap],
+            frames[name]["fmax"].loc[overlap],
+        )["vulnerability_score"]
+        summary = scan.summary.loc[name]
+
+        assert summary["mtus"] == len(overlap)
+        assert np.isclose(summary["mtus_above_threshold"], 100 * (expected > 1).sum() / len(expected))
+        assert np.isclose(summary["mtus_outside_threshold"], 100 * (expected.abs() > 1).sum() / len(expected))
+        assert np.isclose(summary["median_below_zero"], expected[expected < 0].median())
+        assert np.isclose(summary["median_vulnerability"], expected.median())
+        assert np.isclose(summary["non_redundant_share"], cnec_data["nonRedundant"].mean())
+
+
+def test_merged_chunk_statistics_match_full_scan():
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.linearisation_analysis import (
+        CnecScores,
+        CnecStatistics,
+        compute_cnec_scores,
+        scan_cnec_vulnerabilities,
+        split_period,
+    )
+
+    rng = np.random.default_rng(2)
+    zones = list(BiddingZones.to_schema().columns.keys())
+    times = pd.date_range("2023-04-01", periods=24 * 10, freq="H", tz="utc")
+    cnec_names = {"a": "Line A", "b": "Line B"}
+    index = pd.MultiIndex.from_product([list(cnec_names), times], names=["cnec_id", "time"])
+
+    jao_data = pd.DataFrame(rng.normal(size=(len(index), len(zones))) / 10, index=index, columns=zones)
+    for column in ["fall", "fref", "maxFlow"]:
+        jao_data[column] = rng.normal(size=len(index)) * 100
+    jao_data["fmax"] = 1000.0
+    jao_data["cnecName"] = [cnec_names[cnec_id] for cnec_id in index.get_level_values("cnec_id")]
+    jao_data["contName"] = "BASECASE"
+    jao_data["nonRedundant"] = rng.random(len(index)) > 0.8
+    net_positions = pd.DataFrame(rng.normal(size=(len(times), len(zones))) * 500, index=times, columns=zones)
+    cnec_flows = pd.concat(
+        {
+            name: pd.DataFrame({"flow": rng.normal(size=len(times)) * 500, "fmax": 700.0}, index=times)
+            for name in ["Line A", "Line B"]
+        },
+        axis=1,
+    )
+
+    statistics = CnecStatistics()
+    for chunk_start, chunk_end in split_period(times[0], times[-1] + pd.Timedelta(hours=1), pd.Timedelta(days=3)):
+        chunk_statistics = CnecStatistics()
+        is_chunk = (index.get_level_values("time") >= chunk_start) & (index.get_level_values("time") < chunk_end)
+        chunk_statistics.update(compute_cnec_scores(jao_data.loc[is_chunk], net_positions, cnec_flows))
+        statistics.merge(chunk_statistics)
+
+    summary = statistics.summary()
+    expected = scan_cnec_vulnerabilities(jao_data, net_positions, cnec_flows).summary
+    exact_columns = ["mtus", "mtus_above_threshold", "mtus_below_threshold", "non_redundant_share"]
+    assert_frame_equal(summary[exact_columns], expected[exact_columns], check_dtype=False, check_names=False)
+    median_columns = ["median_above_zero", "median_below_zero", "median_vulnerability"]
+    approx_medians = summary[[f"approx_{column}" for column in median_columns]].set_axis(median_columns, axis=1)
+    assert (approx_medians - expected[median_columns]).abs().max().max() < 0.05
+
+    # scores of exactly 0 are not above zero
+    scores = pd.DataFrame({"Line A": [0.0, 0.0, 0.0, 0.5]}, index=times[:4])
+    zero_statistics = CnecStatistics()
+    zero_statistics.update(CnecScores(scores, scores, pd.Series({"Line A": 0}), pd.Series({"Line A": 4}), {}))
+    assert abs(zero_statistics.summary().loc["Line A", "approx_median_above_zero"] - 0.5) < 0.05
+
+
+def seeded_cnec_flows(start, end, cnec_names):
+    # observed flows that only depend on the hour, so every shard and chunk sees the same values
+    times = pd.date_range(start, end, freq="H", inclusive="left")
+    hours = (times - pd.Timestamp("2023-04-01", tz="utc")) // pd.Timedelta(hours=1)
+    return {
+        name: pd.DataFrame({"flow": np.sin(hours + position) * 300, "fmax": 700.0}, index=times)
+        for position, name in enumerate(cnec_names)
+        if name in ["Line A", "Line B"]
+    }
+
+
+def seed_analysis_cache(times: pd.DatetimeIndex) -> pd.DataFrame:
+    # JAO rows of two CNECs and the flows of every border, cached for `times`
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_coverage, store_df_in_table
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import cache_flow_data, plan_zone_borders
+    from fbmc_quality.enums.bidding_zones import BiddingZonesEnum
+
+    rng = np.random.default_rng(4)
+    zones = list(BiddingZones.to_schema().columns.keys())
+    rows = pd.DataFrame({"cnec_id": np.repeat(["a", "b"], len(times)), "time": np.tile(times, 2)})
+    rows["cnecName"] = rows["cnec_id"].map({"a": "Line A", "b": "Line B"})
+    rows[zones] = rng.normal(size=(len(rows), len(zones))) / 10
+    for column in ["fall", "fref", "maxFlow"]:
+        rows[column] = rng.normal(size=len(rows)) * 100
+    rows["fmax"] = 1000.0
+    rows["nonRedundant"] = rng.random(len(rows)) > 0.5
+    rows["ROW_KEY"] = rows["cnec_id"] + "_" + rows["time"].astype(str)
+
+    borders = {
+        tuple(sorted(border, key=lambda area: area.value))
+        for zone_borders in plan_zone_borders(list(BiddingZonesEnum)).values()
+        for border in zone_borders
+    }
+    with CACHE_DB.cursor() as connection:
+        store_df_in_table("JAO", rows, connection)
+        store_coverage("JAO", "", times, connection)
+        for area_from, area_to in borders:
+            flows = pd.Series(rng.normal(size=len(times)) * 500, index=times)
+            cache_flow_data(connection, flows, area_from, area_to)
+            cache_flow_data(connection, -flows, area_to, area_from)
+    return rows
+
+
+def test_streamed_statistics_do_not_depend_on_chunk_size():
+    from fbmc_quality.linearisation_analysis import compute_cnec_statistics
+
+    times = pd.date_range("2023-04-01", periods=48, freq="H", tz="utc")
+    rows = seed_analysis_cache(times)
+    expected_share = rows.groupby("cnecName")["nonRedundant"].mean()
+
+    end = times[-1] + pd.Timedelta(hours=1)
+    summaries = {
+        chunk_hours: compute_cnec_statistics(
+            times[0], end, seeded_cnec_flows, chunk_size=pd.Timedelta(hours=chunk_hours)
+        ).summary()
+        for chunk_hours in [48, 12, 1]
+    }
+    for summary in summaries.values():
+        assert (summary["mtus"] == len(times)).all()
+        assert_series_equal(summary["non_redundant_share"], expected_share, check_names=False)
+        assert_frame_equal(summary, summaries[48])
+
+
+def test_sharded_statistics_match_single_process():
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.linearisation_analysis import compute_cnec_statistics, run_sharded_cnec_statistics
+
+    times = pd.date_range("2023-04-01", periods=48, freq="H", tz="utc")
+    rows = seed_analysis_cache(times)
+
+    end = times[-1] + pd.Timedelta(hours=1)
+    chunk_size = pd.Timedelta(hours=12)
+    expected = compute_cnec_statistics(times[0], end, seeded_cnec_flows, chunk_size=chunk_size).summary()
+    sharded = run_sharded_cnec_statistics(
+        times[0], end, seeded_cnec_flows, shard_size=pd.Timedelta(days=1), chunk_size=chunk_size, max_workers=2
+    ).summary()
+
+    assert expected.index.to_list() == ["Line A", "Line B"] and (expected["mtus"] == len(times)).all()
+    assert_frame_equal(sharded.sort_index(), expected.sort_index())
+    # no hour is counted twice at the shard and chunk boundaries
+    expected_share = rows.groupby("cnecName")["nonRedundant"].mean()
+    assert_series_equal(sharded["non_redundant_share"].sort_index(), expected_share, check_names=False)
+    # the handle of the caller opens a new connection after the pool
+    with CACHE_DB.cursor() as connection:
+        assert connection.execute("SELECT count(*) FROM JAO").fetchone() == (len(rows),)
+
+
+def test_polars_backend_matches_pandas_path():
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.enums.bidding_zones import BiddingZonesEnum
+    from fbmc_quality.jao_data import compute_basecase_net_pos
+    from fbmc_quality.linearisation_analysis import (
+        collect_cnec_scores,
+        collect_vulnerability_scan,
+        compute_cnec_scores,
+        compute_linearisation_errors,
+        compute_linearised_flows,
+        lazy_basecase_net_positions,
+        lazy_cnec_flows,
+        lazy_jao_frame,
+        lazy_linearisation_errors,
+        lazy_linearised_flows,
+        lazy_net_positions,
+        make_cnec_tensor,
+        scan_cnec_vulnerabilities,
+    )
+    from fbmc_quality.linearisation_analysis.polars_backend import TIME_DTYPE
+
+    rng = np.random.default_rng(3)
+    zones = list(BiddingZones.to_schema().columns.keys())
+    times = pd.date_range("2023-04-01", periods=48, freq="H", tz="utc")
+    cnec_names = {"a": "Line A", "b": "Line B", "c": "NO2->NO1", "d": "SE3->NO1", "e": "NO3->NO1", "f": "NO5->NO1"}
+    index = pd.MultiIndex.from_product([list(cnec_names), times], names=["cnec_id", "time"])
+
+    jao_data = pd.DataFrame(rng.normal(size=(len(index), len(zones))) / 10, index=index, columns=zones)
+    jao_data.iloc[::7, :4] = np.nan
+    for column in ["fall", "fref", "maxFlow"]:
+        jao_data[column] = rng.normal(size=len(index)) * 100
+    jao_data["fmax"] = 1000.0
+    jao_data["cnecName"] = [cnec_names[cnec_id] for cnec_id in index.get_level_values("cnec_id")]
+    jao_data["nonRedundant"] = rng.random(len(index)) > 0.8
+    # CNEC `b` is missing in some hours
+    jao_data = jao_data.drop([("b", time) for time in times[10:20]])
+    # the border CNEC `NO5->NO1` is missing in some hours, where NO1 has no basecase net position
+    jao_data = jao_data.drop([("f", time) for time in times[30:33]])
+    net_positions = pd.DataFrame(rng.normal(size=(len(times) - 4, len(zones))) * 500, index=times[4:], columns=zones)
+    cnec_flows = pd.concat(
+        {
+            name: pd.DataFrame({"flow": rng.normal(size=40) * 500, "fmax": 600.0}, index=times[:40])
+            for name in ["Line A", "Line B", "Unknown line"]
+        },
+        axis=1,
+    )
+
+    lazy_data = lazy_jao_frame(jao_data)
+    lazy_nps = lazy_net_positions(net_positions)
+    lazy_flows = lazy_cnec_flows(cnec_flows)
+
+    basecase_nps = compute_basecase_net_pos(times[0], times[-1], BiddingZonesEnum.NO1, dataset=jao_data)
+    lazy_basecase_nps = (
+        lazy_basecase_net_positions(lazy_data, times[0], times[-1], BiddingZonesEnum.NO1)
+        .collect()
+        .to_pandas()
+        .set_index("time")
+    )
+    assert_frame_equal(lazy_basecase_nps, basecase_nps, check_index_type=False, check_names=False)
+    assert lazy_basecase_nps.index.isin(times[30:33]).sum() == 0 and len(lazy_basecase_nps) == len(times) - 4
+
+    cnec_tensor = make_cnec_tensor(jao_data)
+    target_flows = pd.DataFrame(
+        rng.normal(size=(len(times), len(cnec_names))) * 100, index=times, columns=list(cnec_names)
+    )
+    lazy_targets = pl.from_pandas(target_flows.rename_axis("time").reset_index()).lazy()
+    lazy_targets = lazy_targets.melt("time", variable_name="cnec_id", value_name="flow").with_columns(
+        pl.col("time").cast(TIME_DTYPE)
+    )
+    for expected, lazy_frame, column in [
+        (compute_linearised_flows(cnec_tensor, net_positions), lazy_linearised_flows(lazy_data, lazy_nps), None),
+        (
+            compute_linearisation_errors(cnec_tensor, net_positions, target_flows),
+            lazy_linearisation_errors(lazy_data, lazy_nps, lazy_targets),
+            None,
+        ),
+    ]:
+        frame = lazy_frame.collect().to_pandas()
+        values = frame.pivot(index="time", columns="cnec_id", values=frame.columns[-1])
+        assert_frame_equal(values, expected, check_index_type=False, check_names=False, check_freq=False)
+
+    expected_scores = compute_cnec_scores(jao_data, net_positions, cnec_flows)
+    scores = collect_cnec_scores(lazy_data, lazy_nps, lazy_flows)
+    for lazy_frame, expected_frame in zip(scores[:4], expected_scores[:4]):
+        assert_frame_equal(
+            pd.DataFrame(lazy_frame), pd.DataFrame(expected_frame), check_dtype=False, check_index_type=False
+        )
+    assert set(scores.errors) == set(expected_scores.errors) == {"Unknown line"}
+
+    expected_scan = scan_cnec_vulnerabilities(jao_data, net_positions, cnec_flows)
+    scan = collect_vulnerability_scan(lazy_data, lazy_nps, lazy_flows)
+    assert_frame_equal(scan.summary, expected_scan.summary, check_dtype=False, check_names=False)
+    assert scan.errors.keys() == expected_scan.errors.keys()
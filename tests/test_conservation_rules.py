@@ -1,14 +1,8 @@
-import os
-from pathlib import Path
-
 from pandas.testing import assert_series_equal
 from pytz import timezone
 
 
 def test_entsoe_conservation(tmp_path):
-    # HACK: to override the setting of the DB_PATH this has to be inserted into env before the imports
-    os.environ["DB_PATH"] = str(Path(tmp_path) / "test_data.duckdb")
-
     from contextlib import suppress
     from datetime import datetime
 
@@ -44,9 +38,6 @@ def test_entsoe_conservation(tmp_path):
 
 
 def test_ptdf_conservation(tmp_path):
-    # HACK: to override the setting of the DB_PATH this has to be inserted into env before the imports
-    os.environ["DB_PATH"] = str(Path(tmp_path) / "test_data.duckdb")
-
     from datetime import datetime
 
     import pandas as pd
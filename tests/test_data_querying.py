@@ -1,16 +1,18 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
-from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
 
+import numpy as np
 import pandas as pd
+import pytest
 from pandas.testing import assert_frame_equal, assert_index_equal, assert_series_equal
 from pytz import timezone
-from sqlalchemy import create_engine
 
 
 def test_jao_data(tmp_path):
-    # HACK: to override the setting of the DB_PATH this has to be inserted into env before the imports
-    os.environ["DB_PATH"] = str(Path(tmp_path) / "test_data.duckdb")
     from fbmc_quality.dataframe_schemas.schemas import JaoData
     from fbmc_quality.datetime_handlers.handle_timezones import convert_date_to_utc_pandas
     from fbmc_quality.jao_data.fetch_jao_data import fetch_jao_dataframe_timeseries, try_jao_cache_before_async
@@ -37,10 +39,7 @@ def test_jao_data(tmp_path):
 
 
 def test_entsoe_data(tmp_path):
-    # HACK: to override the setting of the DB_PATH this has to be inserted into env before the imports
-    os.environ["DB_PATH"] = str(Path(tmp_path) / "test_data.duckdb")
-
-    from fbmc_quality.dataframe_schemas.cache_db import DB_PATH
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
     from fbmc_quality.entsoe_data.fetch_entsoe_data import (
         _get_cross_border_flow_from_api,
         convert_date_to_utc_pandas,
@@ -72,13 +71,16 @@ def test_entsoe_data(tmp_path):
                 convert_date_to_utc_pandas(from_time), convert_date_to_utc_pandas(to_time), to_area, from_area
             )
 
-            engine = create_engine("duckdb:///" + str(DB_PATH))
-            query_and_cache_data(
-                convert_date_to_utc_pandas(from_time), convert_date_to_utc_pandas(to_time), from_area, to_area, engine
-            )
+            with CACHE_DB.cursor() as connection:
+                query_and_cache_data(
+                    convert_date_to_utc_pandas(from_time),
+                    convert_date_to_utc_pandas(to_time),
+                    from_area,
+                    to_area,
+                    connection,
+                )
             flow = resample_to_hour_and_replace((oneway_flow - otherway_flow).to_frame("flow"))
             flow.index.rename("time", True)
-            engine.dispose()
 
             os.environ["ENTSOE_API_KEY"] = ""
             cached_flow = fetch_entsoe_data_from_bidding_zones(from_time, to_time, from_zone, to_zone)
@@ -87,9 +89,6 @@ def test_entsoe_data(tmp_path):
 
 
 def test_entsoe_expected_date_range(tmp_path):
-    # HACK: to override the setting of the DB_PATH this has to be inserted into env before the imports
-    os.environ["DB_PATH"] = str(Path(tmp_path) / "test_data.duckdb")
-
     from fbmc_quality.entsoe_data.fetch_entsoe_data import fetch_net_position_from_crossborder_flows
 
     from_time = datetime(2023, 3, 31, 22, tzinfo=timezone("utc"))
@@ -103,8 +102,6 @@ def test_entsoe_expected_date_range(tmp_path):
 
 
 def test_jao_expected_date_range(tmp_path):
-    # HACK: to override the setting of the DB_PATH this has to be inserted into env before the imports
-    os.environ["DB_PATH"] = str(Path(tmp_path) / "test_data.duckdb")
     from fbmc_quality.jao_data.analyse_jao_data import compute_basecase_net_pos
     from fbmc_quality.jao_data.fetch_jao_data import fetch_jao_dataframe_timeseries
 
@@ -119,3 +116,540 @@ def test_jao_expected_date_range(tmp_path):
     nps = compute_basecase_net_pos(from_time, to_time)
     assert nps is not None
     assert_index_equal(expected_range, nps.index)
+
+
+def test_cnec_ids_match_hashed_names(tmp_path):
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.jao_data.fetch_jao_data import create_cnec_ids, create_uuid_from_string
+
+    cnec_names = pd.Series(["NO2->NO1", "NO3->NO1", "NO2->NO1"], index=[3, 4, 5])
+    cont_names = pd.Series(["BASECASE", "BASECASE", "BASECASE"], index=[3, 4, 5])
+
+    with CACHE_DB.cursor() as connection:
+        cnec_ids = create_cnec_ids(cnec_names, cont_names, connection)
+
+    expected = pd.Series(
+        [create_uuid_from_string(name + cont) for name, cont in zip(cnec_names, cont_names)],
+        index=cnec_names.index,
+        name="cnec_id",
+    )
+    assert_series_equal(expected, cnec_ids)
+
+    # the ids are persisted in a cache configured later as well
+    CACHE_DB.configure(tmp_path / "other_data.duckdb")
+    with CACHE_DB.cursor() as connection:
+        assert_series_equal(expected, create_cnec_ids(cnec_names, cont_names, connection))
+        assert connection.execute("SELECT count(*) FROM CNEC_ID").fetchone() == (2,)
+
+
+class FakeJaoSession:
+    """Serves the JAO API from `rows_per_hour`, and fails the pages of a query that spans one of `failing_hours`"""
+
+    def __init__(self, rows_per_hour: dict[datetime, int], failing_hours: tuple[datetime, ...] = ()):
+        self.rows_per_hour = rows_per_hour
+        self.failing_hours = failing_hours
+
+    @asynccontextmanager
+    async def get(self, url, data, headers):
+        from_time, to_time = (datetime.strptime(data[key], "%Y-%m-%dT%H:%M:%S.000Z") for key in ["FromUtc", "ToUtc"])
+        is_page = int(data["Take"]) > 0
+        if is_page and any(from_time <= hour < to_time for hour in self.failing_hours):
+            raise RuntimeError(f"Server error for {from_time}")
+
+        rows = [
+            {"dateTimeUtc": hour.isoformat(), "row": row}
+            for hour, count in sorted(self.rows_per_hour.items())
+            if from_time <= hour < to_time
+            for row in range(count)
+        ]
+        skip, take = int(data["Skip"]), int(data["Take"])
+        payload = {"totalRowsWithFilter": len(rows), "data": rows[skip : skip + take]}
+        response = AsyncMock()
+        response.json.return_value = payload
+        yield response
+
+
+def test_plan_fetch_windows_groups_contiguous_hours():
+    from fbmc_quality.jao_data.fetch_jao_data import plan_fetch_windows
+
+    hours = [datetime(2023, 4, 1, hour) for hour in [5, 0, 1, 2, 3, 4, 8, 9]]
+    assert plan_fetch_windows(hours, 4) == [
+        (datetime(2023, 4, 1, 0), 4),
+        (datetime(2023, 4, 1, 4), 2),
+        (datetime(2023, 4, 1, 8), 2),
+    ]
+    assert plan_fetch_windows([], 4) == []
+
+
+def test_split_windows_recombine_halves(caplog):
+    from fbmc_quality.jao_data.fetch_jao_data import get_ptdfs
+
+    hours = [datetime(2023, 4, 1, hour) for hour in range(4)]
+    # the last two hours have no data, so the second half of the window is left out
+    session = FakeJaoSession(dict(zip(hours, [3, 3, 0, 0])))
+    with caplog.at_level(logging.WARNING):
+        rows = asyncio.run(get_ptdfs(hours[0], session, hours=4, max_rows_per_window=4))  # type: ignore
+
+    assert rows["dateTimeUtc"].tolist() == [hours[0].isoformat()] * 3 + [hours[1].isoformat()] * 3
+    assert rows["row"].tolist() == [0, 1, 2] * 2
+    assert "leaving out half of 2023-04-01T00:00:00.000Z to 2023-04-01T04:00:00.000Z" in caplog.text
+
+    # other errors of a half are raised
+    failing_session = FakeJaoSession(dict(zip(hours, [3, 3, 3, 3])), failing_hours=(hours[3],))
+    with pytest.raises(RuntimeError, match="Server error"):
+        asyncio.run(get_ptdfs(hours[0], failing_session, hours=4, max_rows_per_window=4))  # type: ignore
+
+
+def test_entsoe_cache_coverage(tmp_path):
+    from entsoe import Area
+
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import get_missing_intervals
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import border_key, cache_flow_data
+
+    from_time = pd.Timestamp(datetime(2023, 4, 1, 0), tz="utc")
+    cached_range = pd.date_range(from_time, periods=4, freq="H")
+
+    with CACHE_DB.cursor() as connection:
+        cache_flow_data(connection, pd.Series(range(4), index=cached_range, dtype=float), Area.NO_1, Area.NO_2)
+        missing = get_missing_intervals(
+            "ENTSOE", border_key(Area.NO_1, Area.NO_2), from_time, from_time + pd.Timedelta(hours=6), connection
+        )
+
+    assert missing == [(from_time + pd.Timedelta(hours=4), from_time + pd.Timedelta(hours=6))]
+
+
+def test_entsoe_bulk_read_pivots_borders(tmp_path):
+    from entsoe import Area
+
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import cache_flow_data, read_border_flows
+
+    from_time = pd.Timestamp(datetime(2023, 4, 1, 0), tz="utc")
+    cached_range = pd.date_range(from_time, periods=4, freq="H")
+    no1_no2 = pd.Series([1.0, 2.0, 3.0, 4.0], index=cached_range)
+    no1_se3 = pd.Series([5.0, 6.0], index=cached_range[1:3])
+
+    with CACHE_DB.cursor() as connection:
+        cache_flow_data(connection, no1_no2, Area.NO_1, Area.NO_2)
+        cache_flow_data(connection, no1_se3, Area.NO_1, Area.SE_3)
+        flows = read_border_flows(
+            from_time, from_time + pd.Timedelta(hours=3), [(Area.NO_1, Area.NO_2), (Area.NO_1, Area.SE_3)], connection
+        )
+
+    assert_index_equal(cached_range[:3].rename("time"), flows.index, check_exact=True)
+    assert flows[(Area.NO_1, Area.NO_2)].tolist() == [1.0, 2.0, 3.0]
+    assert flows[(Area.NO_1, Area.SE_3)].isna().tolist() == [True, False, False]
+
+
+def test_rate_limiter_spaces_requests_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import RequestRateLimiter
+
+    clock = [100.0]
+    sleeps: list[float] = []
+    rate_limiter = RequestRateLimiter(30, clock=lambda: clock[0], sleep=sleeps.append)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: rate_limiter.wait(), range(6)))
+
+    # every request gets its own slot two seconds after the previous one, the first one goes at once
+    assert sorted(sleeps) == [2.0, 4.0, 6.0, 8.0, 10.0]
+
+    # once the slots have passed, requests are not held back
+    clock[0] = 200.0
+    rate_limiter.wait()
+    assert len(sleeps) == 5
+
+
+def test_cross_border_flow_fetches_only_the_gaps(monkeypatch):
+    from entsoe import Area
+
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.entsoe_data import fetch_entsoe_data
+
+    start = pd.Timestamp("2023-04-01", tz="utc")
+    end = start + pd.Timedelta(hours=6)
+    flows = {Area.NO_1: 10.0, Area.NO_2: 3.0, Area.SE_3: 3.0}
+
+    def query_crossborder_flows(country_code_from, country_code_to, start, end, dropped_hours=0):
+        times = pd.date_range(start, end - pd.Timedelta(hours=dropped_hours), freq="H", inclusive="left")
+        return pd.Series(flows[country_code_from], index=times)
+
+    client = MagicMock()
+    client.query_crossborder_flows.side_effect = query_crossborder_flows
+    monkeypatch.setattr(fetch_entsoe_data, "get_entsoe_client", lambda session=None: client)
+
+    cached_times = pd.date_range(start, periods=6, freq="H")[[0, 1, 4, 5]]
+    with CACHE_DB.cursor() as connection:
+        fetch_entsoe_data.cache_flow_data(connection, pd.Series(1.0, index=cached_times), Area.NO_1, Area.NO_2)
+
+    flow = fetch_entsoe_data._get_cross_border_flow(start, end, Area.NO_1, Area.NO_2)
+    assert flow.tolist() == [1.0, 1.0, 7.0, 7.0, 1.0, 1.0]
+
+    def queried_ranges() -> list[tuple]:
+        return [
+            (call.kwargs["country_code_from"], call.kwargs["start"], call.kwargs["end"]) for call in client.mock_calls
+        ]
+
+    # only the gap is fetched, in both directions
+    gap = (start + pd.Timedelta(hours=2), start + pd.Timedelta(hours=4))
+    assert queried_ranges() == [(Area.NO_1, *gap), (Area.NO_2, *gap)]
+
+    # a client that never returns the last hour is asked for that hour once more, then the recursion guard stops
+    client.reset_mock()
+    client.query_crossborder_flows.side_effect = lambda **kwargs: query_crossborder_flows(**kwargs, dropped_hours=1)
+    with pytest.raises(RuntimeError, match="Recurse calls did not yield all data"):
+        fetch_entsoe_data._get_cross_border_flow(start, end, Area.NO_1, Area.SE_3)
+    last_hour = (end - pd.Timedelta(hours=1), end)
+    assert queried_ranges() == [
+        (Area.NO_1, start, end),
+        (Area.SE_3, start, end),
+        (Area.NO_1, *last_hour),
+        (Area.SE_3, *last_hour),
+    ]
+
+
+def test_bz_name_resolver_matches_lookups(tmp_path):
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import (
+        get_from_to_bz_from_name,
+        regex_get_from_to_bz_from_name,
+        substring_get_from_to_bz_from_name,
+    )
+    from fbmc_quality.enums.bidding_zones import BIDDING_ZONE_CNEC_MAP
+
+    cnec_names = [name for corridors in BIDDING_ZONE_CNEC_MAP.values() for name, _ in corridors]
+    cnec_names += ["NO2_SK NO2", "NO2NO1", "SE3-SE3_FS", "DK1_CO", "no zones", "NO_NO2_DK1 DK1"]
+
+    for cnec_name in cnec_names:
+        expected = regex_get_from_to_bz_from_name(cnec_name)
+        if expected[0] is None or expected[1] is None:
+            expected = substring_get_from_to_bz_from_name(cnec_name)
+        assert get_from_to_bz_from_name(cnec_name) == expected, cnec_name
+
+
+def test_entsoe_net_positions_refresh_stored_hours(tmp_path):
+    from entsoe import Area
+
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import read_net_positions
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import (
+        cache_flow_data,
+        plan_zone_borders,
+        refresh_entsoe_net_positions,
+    )
+    from fbmc_quality.enums.bidding_zones import BiddingZonesEnum
+
+    from_time = pd.Timestamp(datetime(2023, 4, 1, 0), tz="utc")
+    to_time = from_time + pd.Timedelta(hours=2)
+    cached_range = pd.date_range(from_time, to_time, freq="H", inclusive="left")
+    zone_borders = plan_zone_borders([BiddingZonesEnum.NO1, BiddingZonesEnum.NO2])
+
+    with CACHE_DB.cursor() as connection:
+        # every border is cached as seen from each of its zones, so each zone sums to its number of borders
+        for area_from, area_to in {border for borders in zone_borders.values() for border in borders}:
+            cache_flow_data(connection, pd.Series([1.0, 2.0], index=cached_range), area_from, area_to)
+        refresh_entsoe_net_positions(from_time, to_time, connection)
+        before = read_net_positions("ENTSOE_NET_POSITION", ["NO1", "NO2"], from_time, to_time, connection)
+
+        cache_flow_data(connection, pd.Series([5.0], index=cached_range[1:]), Area.NO_1, Area.NO_2)
+        cache_flow_data(connection, pd.Series([-5.0], index=cached_range[1:]), Area.NO_2, Area.NO_1)
+        refresh_entsoe_net_positions(from_time, to_time, connection)
+        after = read_net_positions("ENTSOE_NET_POSITION", ["NO1", "NO2"], from_time, to_time, connection)
+
+    for zone in ["NO1", "NO2"]:
+        assert before[zone].tolist() == [float(len(zone_borders[BiddingZonesEnum(zone)])) * hour for hour in [1, 2]]
+    # only the hour where the NO1-NO2 flow was stored again is recomputed
+    assert (after["NO1"] - before["NO1"]).tolist() == [0.0, 3.0]
+    assert (after["NO2"] - before["NO2"]).tolist() == [0.0, -7.0]
+
+
+def test_cnec_index_lookups(tmp_path):
+    from fbmc_quality.jao_data.analyse_jao_data import CnecIndex
+
+    times = pd.date_range(datetime(2023, 4, 1, 0), periods=2, freq="H", tz="utc")
+    dataset = pd.DataFrame(
+        {
+            "cnec_id": ["a", "b", "a", "c", "d"],
+            "time": [times[0], times[0], times[1], times[1], times[1]],
+            "cnecName": ["NO2->NO1", "NL->NO2", "NO2->NO1", "SE3->NO1", "SE3->NO1"],
+        }
+    ).set_index(["cnec_id", "time"])
+
+    cnec_index = CnecIndex(dataset)
+
+    assert cnec_index.get_id("NO2->NO1") == "a"
+    assert cnec_index.get_id("NO_NO2_NL->NO2") == "b"
+    assert cnec_index.get_name("b") == "NL->NO2"
+    assert cnec_index.get_time_range("a") == (times[0], times[1])
+    with pytest.raises(ValueError):
+        cnec_index.get_id("SE3->NO1")
+
+
+def test_read_only_cache_serves_cached_hours(tmp_path):
+    from entsoe import Area
+
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import _get_cross_border_flow, cache_flow_data
+    from fbmc_quality.jao_data import fetch_jao_dataframe_timeseries
+
+    from_time = pd.Timestamp(datetime(2023, 4, 1, 0), tz="utc")
+    cached_range = pd.date_range(from_time, periods=2, freq="H")
+    with CACHE_DB.cursor() as connection:
+        cache_flow_data(connection, pd.Series([1.0, 2.0], index=cached_range), Area.NO_1, Area.NO_2)
+
+    CACHE_DB.configure(CACHE_DB.path, read_only=True)
+    # nothing is fetched for the hours that are not cached
+    flows = _get_cross_border_flow(from_time, from_time + pd.Timedelta(hours=4), Area.NO_1, Area.NO_2)
+    assert flows.tolist() == [1.0, 2.0]
+    assert fetch_jao_dataframe_timeseries(from_time, from_time + pd.Timedelta(hours=4)) is None
+
+
+def test_compact_jao_frame_matches_full_frame(tmp_path):
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_coverage, store_df_in_table
+    from fbmc_quality.jao_data import fetch_jao_dataframe_timeseries
+
+    times = pd.date_range(datetime(2023, 4, 1, 0), periods=3, freq="H", tz="utc")
+    rows = pd.DataFrame(
+        {
+            "cnec_id": ["a", "b"] * 3,
+            "time": times.repeat(2),
+            "id": range(6),
+            "cnecName": ["Line A", "Line B"] * 3,
+            "contName": ["BASECASE", None] * 3,
+            "contingencies": ['{"contingencies": []}'] * 6,
+            "nonRedundant": [True, False] * 3,
+            "fref": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5],
+            "NO1": [0.1, None, 0.3, 0.4, 0.5, 0.6],
+        }
+    )
+    rows["ROW_KEY"] = rows["cnec_id"] + "_" + rows["time"].astype(str)
+    with CACHE_DB.cursor() as connection:
+        store_df_in_table("JAO", rows, connection)
+        store_coverage("JAO", "", times, connection)
+
+    columns = ["id", "cnecName", "contName", "nonRedundant", "fref", "NO1"]
+    full = fetch_jao_dataframe_timeseries(times[0], times[-1] + pd.Timedelta(hours=1), columns=columns)
+    compact = fetch_jao_dataframe_timeseries(times[0], times[-1] + pd.Timedelta(hours=1), columns=columns, compact=True)
+
+    assert isinstance(compact["cnecName"].dtype, pd.CategoricalDtype)
+    assert compact["NO1"].dtype == "float32" and compact["fref"].dtype == "float32"
+    assert_index_equal(full.index, compact.index)
+    assert compact["cnecName"].astype(object).tolist() == full["cnecName"].tolist()
+    assert_series_equal(full["NO1"].astype("float32"), compact["NO1"])
+
+
+def test_cache_reads_across_october_dst_switch():
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_coverage, store_df_in_table
+    from fbmc_quality.jao_data import fetch_jao_dataframe_timeseries
+
+    # the local day of the October switch has 25 hours
+    oslo = timezone("Europe/Oslo")
+    start, end = oslo.localize(datetime(2023, 10, 29)), oslo.localize(datetime(2023, 10, 30))
+    times = pd.date_range(start, end, freq="H", inclusive="left").tz_convert("UTC")
+    assert len(times) == 25
+
+    rows = pd.DataFrame({"cnec_id": ["a", "b"] * len(times), "time": times.repeat(2)})
+    rows["dateTimeUtc"] = rows["time"]
+    rows["id"] = range(len(rows))
+    rows["cnecName"] = rows["cnec_id"].map({"a": "Line A", "b": "Line B"})
+    rows["contName"] = "BASECASE"
+    rows["nonRedundant"] = True
+    rows["fref"] = range(len(rows))
+    rows["ROW_KEY"] = rows["cnec_id"] + "_" + rows["time"].astype(str)
+    with CACHE_DB.cursor() as connection:
+        store_df_in_table("JAO", rows, connection)
+        store_coverage("JAO", "", times, connection)
+        # a session in a DST observing zone returns the repeated local hour twice
+        connection.execute("SET GLOBAL TimeZone = 'Europe/Oslo'")
+
+    columns = ["id", "cnecName", "contName", "nonRedundant", "fref"]
+    jao_data = fetch_jao_dataframe_timeseries(start, end, columns=columns)
+    assert jao_data is not None
+    read_times = jao_data.index.get_level_values("time")
+
+    assert jao_data.index.is_unique
+    assert read_times.nunique() == 25 and str(read_times.tz) == "UTC"
+    assert_index_equal(read_times.unique().sort_values(), times, check_names=False)
+    assert jao_data.xs("a", level="cnec_id")["fref"].tolist() == list(range(0, len(rows), 2))
+
+
+def test_scanned_cache_matches_fetched_frames():
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import (
+        read_net_positions,
+        store_coverage,
+        store_df_in_table,
+    )
+    from fbmc_quality.jao_data import fetch_jao_dataframe_timeseries
+    from fbmc_quality.linearisation_analysis import lazy_jao_frame, read_jao_cache, scan_net_positions
+
+    times = pd.date_range(datetime(2023, 4, 1, 0), periods=3, freq="H", tz="utc")
+    rows = pd.DataFrame(
+        {
+            "cnec_id": ["a", "b"] * 3,
+            "time": times.repeat(2),
+            "cnecName": ["Line A", "Line B"] * 3,
+            "nonRedundant": [True, False] * 3,
+            "fref": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5],
+            "NO1": [0.1, None, 0.3, 0.4, 0.5, 0.6],
+        }
+    )
+    rows["ROW_KEY"] = rows["cnec_id"] + "_" + rows["time"].astype(str)
+    with CACHE_DB.cursor() as connection:
+        store_df_in_table("JAO", rows, connection)
+        store_coverage("JAO", "", times, connection)
+        connection.execute(
+            "INSERT INTO ENTSOE_NET_POSITION SELECT UNNEST(?), UNNEST(?), UNNEST(?)",
+            [["NO1", "NO2", "NO1"], list(times[[0, 0, 2]].to_pydatetime()), [1.0, -1.0, 3.0]],
+        )
+    CACHE_DB.configure(CACHE_DB.path, read_only=True)
+
+    columns = ["cnecName", "nonRedundant", "fref", "NO1"]
+    end = times[-1] + pd.Timedelta(hours=1)
+    scanned = read_jao_cache(times[0], end, columns).sort("cnec_id", "time").collect()
+    fetched = lazy_jao_frame(fetch_jao_dataframe_timeseries(times[0], end, columns=columns)).sort("cnec_id", "time")
+    assert scanned.equals(fetched.collect())
+
+    net_positions = scan_net_positions("ENTSOE_NET_POSITION", times[0], end).collect().to_pandas().set_index("time")
+    with CACHE_DB.cursor() as connection:
+        expected = read_net_positions("ENTSOE_NET_POSITION", ["NO1", "NO2"], times[0], end, connection)
+    assert_frame_equal(net_positions, expected, check_freq=False, check_index_type=False, check_names=False)
+
+
+def test_materialized_basecase_net_positions_match_dataset_path():
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_coverage, store_df_in_table
+    from fbmc_quality.enums.bidding_zones import BIDDING_ZONE_CNEC_MAP, BiddingZonesEnum
+    from fbmc_quality.jao_data import compute_basecase_net_pos, fetch_jao_dataframe_timeseries
+
+    times = pd.date_range(datetime(2023, 4, 1, 0), periods=4, freq="H", tz="utc")
+    rows = []
+    for bidding_zone in [BiddingZonesEnum.NO1, BiddingZonesEnum.NO2]:
+        for cnec_name, _ in BIDDING_ZONE_CNEC_MAP[bidding_zone]:
+            for hour, time in enumerate(times):
+                # a border CNEC of NO1 is missing in hour 2
+                if cnec_name == "NO5->NO1" and hour == 2:
+                    continue
+                # a border CNEC of NO2 is renamed in hour 2, and only has its new name in hour 3
+                if cnec_name == "NO_NO2_NL->NO2" and hour >= 2:
+                    rows.append(("NL->NO2_new", time, "NL->NO2", 100.0 + hour))
+                    if hour == 3:
+                        continue
+                rows.append((f"{cnec_name}_id", time, cnec_name, float(len(rows))))
+    jao_rows = pd.DataFrame(rows, columns=["cnec_id", "time", "cnecName", "fref"])
+    jao_rows["ROW_KEY"] = jao_rows["cnec_id"] + "_" + jao_rows["time"].astype(str)
+    with CACHE_DB.cursor() as connection:
+        store_df_in_table("JAO", jao_rows, connection)
+        store_coverage("JAO", "", times, connection)
+
+    end = times[-1] + pd.Timedelta(hours=1)
+    bidding_zones = [BiddingZonesEnum.NO1, BiddingZonesEnum.NO2]
+    materialized = compute_basecase_net_pos(times[0], end, bidding_zones)
+    dataset = fetch_jao_dataframe_timeseries(times[0], end)
+    from_dataset = compute_basecase_net_pos(times[0], end, bidding_zones, dataset=dataset)
+
+    assert_frame_equal(materialized, from_dataset, check_freq=False, check_names=False)
+    assert materialized["NO1"].isna().tolist() == [False, False, True, False]
+    no2_rows = jao_rows.loc[jao_rows["cnecName"].isin([name for name, _ in BIDDING_ZONE_CNEC_MAP[bidding_zones[1]]])]
+    expected_no2 = -no2_rows.groupby("time")["fref"].sum()
+    # the old name is preferred in hour 2, the new one is used in hour 3
+    expected_no2.iloc[3] -= 103.0
+    assert materialized["NO2"].tolist() == expected_no2.tolist()
+
+
+def test_observed_net_positions_need_every_border():
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import read_net_positions
+    from fbmc_quality.entsoe_data.fetch_entsoe_data import (
+        cache_flow_data,
+        plan_zone_borders,
+        refresh_entsoe_net_positions,
+    )
+    from fbmc_quality.enums.bidding_zones import BiddingZonesEnum
+
+    times = pd.date_range(datetime(2023, 4, 1, 0), periods=3, freq="H", tz="utc")
+    borders = plan_zone_borders([BiddingZonesEnum.NO1])[BiddingZonesEnum.NO1]
+    with CACHE_DB.cursor() as connection:
+        for position, (area_from, area_to) in enumerate(borders):
+            # the last border is not cached in the last hour
+            border_times = times[:-1] if position == len(borders) - 1 else times
+            flows = pd.Series(float(position + 1), index=border_times)
+            cache_flow_data(connection, flows, area_from, area_to)
+            cache_flow_data(connection, -flows, area_to, area_from)
+
+        refresh_entsoe_net_positions(times[0], times[-1] + pd.Timedelta(hours=1), connection)
+        net_positions = read_net_positions("ENTSOE_NET_POSITION", ["NO1"], times[0], times[-1], connection)
+        stored_hours = connection.execute(
+            "SELECT count(*) FROM ENTSOE_NET_POSITION WHERE zone = 'NO1' AND time >= ?", [times[-1].to_pydatetime()]
+        ).fetchone()
+
+    expected = float(sum(range(1, len(borders) + 1)))
+    assert net_positions["NO1"].tolist() == [expected, expected]
+    assert stored_hours == (0,)
+
+
+def fake_jao_api_rows(hours: pd.DatetimeIndex) -> pd.DataFrame:
+    # the rows of two CNECs per hour, as `get_ptdfs` returns them from the JAO API
+    from fbmc_quality.dataframe_schemas import BiddingZones
+    from fbmc_quality.dataframe_schemas.schemas import JaoData
+
+    schema = JaoData.to_schema()
+    zones = list(BiddingZones.to_schema().columns.keys())
+    rows = pd.DataFrame({"dateTimeUtc": hours.repeat(2).strftime("%Y-%m-%dT%H:%M:%SZ")})
+    rows["id"] = range(len(rows))
+    rows["cnecName"] = ["Line A", "Line B"] * len(hours)
+    for name, column in schema.columns.items():
+        if name in rows.columns or name in zones:
+            continue
+        if column.dtype.type == "string":
+            rows[name] = "x"
+        elif column.dtype.type == "boolean":
+            rows[name] = True
+        else:
+            rows[name] = rows["id"] * 1.5
+    rows["contName"] = None
+    for zone in zones + ["SE3_SWL", "SE4_SWL"]:
+        rows[f"ptdf_{zone}"] = rows["id"] / 100
+    return rows
+
+
+def test_fetched_jao_hours_are_added_to_the_ptdf_store(monkeypatch):
+    from fbmc_quality.dataframe_schemas.cache_db import CACHE_DB
+    from fbmc_quality.dataframe_schemas.cache_db.cache_db_functions import store_coverage, store_df_in_table
+    from fbmc_quality.jao_data import PTDF_STORE, fetch_jao_data, update_ptdf_store
+    from fbmc_quality.jao_data.ptdf_store import pack_jao_data
+
+    async def fake_get_ptdfs(date, session, max_concurrent_pages, hours=1, max_rows_per_window=0):
+        return fake_jao_api_rows(pd.date_range(date, periods=hours, freq="H"))
+
+    monkeypatch.setattr(fetch_jao_data, "get_ptdfs", fake_get_ptdfs)
+    from_time = pd.Timestamp(datetime(2023, 4, 1, 0), tz="utc")
+    fetched_hours = pd.date_range(from_time, periods=6, freq="H", name="time")
+    fetched_end = fetched_hours[-1] + pd.Timedelta(hours=1)
+    fetch_jao_data.cache_jao_data(fetched_hours[0], fetched_end, window_hours=2)
+
+    # every fetched window is added to the store as it is cached
+    assert_index_equal(PTDF_STORE.times, fetched_hours)
+    assert len(list(PTDF_STORE.path.glob("segment_*_times.npy"))) == 3
+    cached = pack_jao_data(fetch_jao_data.fetch_jao_dataframe_timeseries(fetched_hours[0], fetched_end))
+    stored = PTDF_STORE.read(fetched_hours[0], fetched_end)
+    np.testing.assert_array_equal(stored.values, cached.values)
+
+    # hours cached before the store existed are backfilled in chunks, without fetching anything
+    def no_fetch(*args):
+        raise AssertionError("update_ptdf_store fetched from the API")
+
+    monkeypatch.setattr(fetch_jao_data, "_run_jao_fetch", no_fetch)
+    backfilled_hours = pd.date_range(fetched_end, periods=48, freq="H", name="time")
+    rows = pd.DataFrame({"cnec_id": "a", "time": backfilled_hours, "cnecName": "Line A", "fall": 1.0})
+    rows["ROW_KEY"] = rows["cnec_id"] + "_" + rows["time"].astype(str)
+    with CACHE_DB.cursor() as connection:
+        store_df_in_table("JAO", rows, connection)
+        store_coverage("JAO", "", backfilled_hours, connection)
+
+    update_ptdf_store(from_time, backfilled_hours[-1] + pd.Timedelta(hours=2), chunk_size=pd.Timedelta(hours=12))
+    assert_index_equal(PTDF_STORE.times, fetched_hours.append(backfilled_hours))
+    assert len(list(PTDF_STORE.path.glob("segment_*_times.npy"))) == 3 + 4